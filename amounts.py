@@ -0,0 +1,101 @@
+# amounts.py
+
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+RUPEE = 1
+THOUSAND = 1_000
+LAKH = 100_000
+CRORE = 10_000_000
+
+# Unit words that may follow an amount, in rupees
+UNIT_SUFFIXES = {
+    'k': THOUSAND, 'thousand': THOUSAND,
+    'l': LAKH, 'lac': LAKH, 'lacs': LAKH, 'lakh': LAKH, 'lakhs': LAKH,
+    'cr': CRORE, 'crs': CRORE, 'crore': CRORE, 'crores': CRORE
+}
+
+# Rs., Rs, INR, ₹ and the trailing /- of written amounts
+CURRENCY_MARKERS = re.compile(r'(₹|\binr\b|\brs\b\.?|/-)')
+AMOUNT_PATTERN = re.compile(r'(-?(?:\d[\d,]*)?\.?\d+)\s*([a-z]*)\.?')
+
+# Replacements parse_amounts applies to a whole array at once: unit words
+# become an upper-case marker after '|' (the text is lower-cased, so
+# markers cannot collide), then currency markers and grouping go. "crs"
+# is marked before "rs" is dropped, and whole words before single letters.
+ARRAY_REPLACEMENTS = [
+    (',', ''), (' ', ''), ('/-', ''), ('₹', ''), ('inr', ''),
+    ('crores', '|C'), ('crore', '|C'), ('crs', '|C'), ('cr', '|C'),
+    ('lakhs', '|L'), ('lakh', '|L'), ('lacs', '|L'), ('lac', '|L'), ('thousand', '|K'),
+    ('rs.', ''), ('rs', ''), ('l', '|L'), ('k', '|K')
+]
+ARRAY_UNITS = {'C': CRORE, 'L': LAKH, 'K': THOUSAND}
+
+def parse_amount(value, unit=RUPEE):
+    """
+    Paise in a free-text Indian amount, e.g. "Rs. 1,23,456.00", "12.5 lacs", "2 cr".
+
+    Args:
+    value: Text (or a number) as entered or extracted
+    unit (int): Rupees per unit when no suffix is given, e.g. LAKH for "in lacs" fields
+
+    Returns:
+    int: The amount in paise, or None if it is empty or not an amount
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        number, multiplier = Decimal(str(value)), unit
+        if not number.is_finite():
+            # NaN from an empty DataFrame cell, or an overflow
+            return None
+    else:
+        text = CURRENCY_MARKERS.sub(' ', str(value).strip().lower()).strip()
+        match = AMOUNT_PATTERN.fullmatch(text)
+        if not match:
+            return None
+        suffix = match.group(2)
+        if suffix and suffix not in UNIT_SUFFIXES:
+            return None
+        multiplier = UNIT_SUFFIXES.get(suffix, unit)
+        try:
+            number = Decimal(match.group(1).replace(',', ''))
+        except InvalidOperation:
+            return None
+    return int((number * multiplier * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def paise_to_lakhs(paise):
+    """Paise as lakhs of rupees, for display"""
+    return None if paise is None else paise / (LAKH * 100)
+
+def parse_amounts(values, unit=RUPEE):
+    """
+    parse_amount over a whole column or grid of amounts in one call.
+
+    Args:
+    values: List, array or DataFrame values of text amounts, any shape
+    unit (int): Rupees per unit when no suffix is given
+
+    Returns:
+    tuple: (paise, invalid) arrays of the input's shape; paise is float
+    with NaN where a value is empty or not an amount, invalid is True
+    where something was entered that is not an amount
+    """
+    # Imported here: the save path uses this module and should not load numpy
+    import numpy as np
+
+    text = np.char.lower(np.char.strip(np.asarray(values, dtype=object).astype(str)))
+    empty = np.isin(text, ('', 'none', 'nan'))
+    for old, new in ARRAY_REPLACEMENTS:
+        text = np.char.replace(text, old, new)
+    text = np.char.rstrip(text, '.')
+    number, _, suffix = np.char.partition(text, '|').transpose((text.ndim,) + tuple(range(text.ndim)))
+
+    # At most one leading minus and one decimal point around the digits
+    digits = np.char.replace(np.char.replace(number, '-', '', count=1), '.', '', count=1)
+    valid = (~empty & np.char.isdecimal(digits) & (np.char.find(number, '-') <= 0)
+             & np.isin(suffix, ('',) + tuple(ARRAY_UNITS)))
+    multiplier = np.select([suffix == marker for marker in ARRAY_UNITS], list(ARRAY_UNITS.values()), default=unit)
+    rupees = np.where(valid, number, '0').astype(float) * multiplier
+    paise = np.where(valid, np.round(rupees * 100), np.nan)
+    return paise, ~valid & ~empty
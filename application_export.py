@@ -0,0 +1,305 @@
+# application_export.py
+"""
+Streaming CSV / Parquet export of applications for MIS reporting.
+
+Applications are read from a batched cursor with a projection, flattened
+into fixed columns and written one batch (one Parquet row group) at a
+time, so memory stays flat however large the collection grows.
+
+Large Parquet exports are split into part files (out.parquet,
+out.part1.parquet, ...); an interrupted export resumes after the last
+part that was closed, since an unclosed Parquet file has no footer.
+
+Usage:
+    python application_export.py --out mis.csv
+    python application_export.py --format parquet --out mis.parquet --status Approved --from 2024-04-01 --to 2024-05-01
+    python application_export.py --out mis.csv --resume      # continue an interrupted export
+    python application_export.py --summary --out status.csv   # status/branch report from summaries
+"""
+
+import os
+import csv
+import glob
+import json
+import hashlib
+import argparse
+from datetime import datetime, timedelta
+from bson import ObjectId, json_util
+
+EXPORT_BATCH_SIZE = 1000
+# Rows per Parquet part file; resuming restarts at most this many rows
+PARQUET_PART_ROWS = 100000
+MAX_DIRECTORS = 5
+MAX_FACILITIES = 5
+
+EXPORT_PROJECTION = {
+    'application_number': 1,
+    'status': 1,
+    'submission_date': 1,
+    'last_updated': 1,
+    'remarks': 1,
+    'basic_info': 1,
+    'directors': 1,
+    'form_data': 1
+}
+
+BASIC_INFO_FIELDS = [
+    'enterprise_name', 'udyam_number', 'classification', 'date_of_classification',
+    'social_category', 'address', 'state', 'major_activity', 'nic_5_digit',
+    'mobile', 'email', 'date_of_incorporation', 'date_of_commencement',
+    'gst_number', 'pan'
+]
+DIRECTOR_FIELDS = ['name', 'designation', 'dob', 'pan', 'mobile']
+EXISTING_FACILITY_FIELDS = ['limit', 'outstanding', 'bank', 'security']
+PROPOSED_FACILITY_FIELDS = ['amount', 'purpose', 'security']
+FORM_FIELDS = ['constitution', 'loan_city', 'loan_branch']
+
+SUMMARY_COLUMNS = [
+    'application_number', 'enterprise_name', 'status', 'loan_branch', 'state',
+    'classification', 'total_proposed_paise', 'submission_date', 'last_updated'
+]
+
+def export_columns():
+    """Fixed column order shared by every batch"""
+    columns = ['application_number', 'status', 'submission_date', 'last_updated', 'remarks']
+    columns += BASIC_INFO_FIELDS + FORM_FIELDS
+    for i in range(MAX_DIRECTORS):
+        columns += [f'director_{i + 1}_{field}' for field in DIRECTOR_FIELDS]
+    for i in range(MAX_FACILITIES):
+        columns += [f'existing_facility_{i + 1}_{field}' for field in EXISTING_FACILITY_FIELDS]
+    for i in range(MAX_FACILITIES):
+        columns += [f'proposed_facility_{i + 1}_{field}' for field in PROPOSED_FACILITY_FIELDS]
+    return columns
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def flatten_application(app):
+    """Flatten basic_info, directors and facilities into one row"""
+    basic_info = app.get('basic_info') or {}
+    form_data = app.get('form_data') or {}
+    row = {
+        'application_number': app.get('application_number'),
+        'status': app.get('status'),
+        'submission_date': app.get('submission_date'),
+        'last_updated': app.get('last_updated'),
+        'remarks': app.get('remarks')
+    }
+    for field in BASIC_INFO_FIELDS:
+        row[field] = basic_info.get(field)
+    for field in FORM_FIELDS:
+        row[field] = form_data.get(field)
+    directors = app.get('directors') or []
+    for i in range(MAX_DIRECTORS):
+        director = directors[i] if i < len(directors) else {}
+        for field in DIRECTOR_FIELDS:
+            row[f'director_{i + 1}_{field}'] = director.get(field)
+    for i in range(MAX_FACILITIES):
+        for field in EXISTING_FACILITY_FIELDS:
+            row[f'existing_facility_{i + 1}_{field}'] = form_data.get(f'existing_facility_{field}_{i}')
+        for field in PROPOSED_FACILITY_FIELDS:
+            row[f'proposed_facility_{i + 1}_{field}'] = form_data.get(f'proposed_facility_{field}_{i}')
+    return {key: _text(value) for key, value in row.items()}
+
+def flatten_summary(summary):
+    """One row from an application_summaries document"""
+    return {column: _text(summary.get(column)) for column in SUMMARY_COLUMNS}
+
+def build_criteria(statuses=None, date_from=None, date_to=None):
+    """Filter on status and a [date_from, date_to) submission date range"""
+    criteria = {}
+    if statuses:
+        criteria['status'] = {'$in': list(statuses)}
+    date_range = {}
+    if date_from:
+        date_range['$gte'] = date_from
+    if date_to:
+        date_range['$lt'] = date_to
+    if date_range:
+        criteria['submission_date'] = date_range
+    return criteria
+
+def export_key(criteria, export_format, summaries=False):
+    """Hash identifying an export by its filters, format and report type"""
+    content = json_util.dumps({'criteria': criteria, 'format': export_format, 'summaries': summaries},
+                              sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def part_path(path, part):
+    """Path of a Parquet part file; the first part is the output path itself"""
+    if not part:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.part{part}{ext}"
+
+def export_files(path):
+    """The output file and any further part files, in order"""
+    stem, ext = os.path.splitext(path)
+    parts = glob.glob(f"{glob.escape(stem)}.part*{glob.escape(ext)}")
+    numbered = sorted((int(p[len(stem) + 5:len(p) - len(ext)]), p) for p in parts
+                      if p[len(stem) + 5:len(p) - len(ext)].isdigit())
+    return ([path] if os.path.exists(path) else []) + [p for _, p in numbered]
+
+class CsvExportWriter:
+    """Checkpoint position is the byte offset after each flushed batch"""
+
+    def __init__(self, path, columns, offset=None):
+        # On resume, drop anything written after the last checkpoint
+        if offset is not None and os.path.exists(path):
+            with open(path, 'r+b') as handle:
+                handle.truncate(offset)
+            self._file = open(path, 'a', newline='', encoding='utf-8')
+            self._writer = csv.DictWriter(self._file, fieldnames=columns)
+        else:
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.DictWriter(self._file, fieldnames=columns)
+            self._writer.writeheader()
+
+    def write_batch(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+class ParquetExportWriter:
+    """
+    Checkpoint position is the number of part files closed so far.
+
+    write_batch returns None while the current part is still open: its
+    rows are not safe to resume after until the footer is written.
+    """
+
+    def __init__(self, path, columns, offset=None, part_rows=PARQUET_PART_ROWS):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+        self._pa = pa
+        self._pq = pq
+        self._path = path
+        self._columns = columns
+        self._part_rows = part_rows
+        self._schema = pa.schema([(column, pa.string()) for column in columns])
+        self._part = offset or 0
+        # Parts from an earlier export, or the unclosed part of an interrupted one
+        for stale in export_files(path)[self._part:]:
+            os.remove(stale)
+        self._writer = None
+        self._rows_in_part = 0
+
+    def write_batch(self, rows):
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(part_path(self._path, self._part), self._schema)
+        # One row group per batch
+        arrays = [self._pa.array([row[column] for row in rows], type=self._pa.string()) for column in self._columns]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+        self._rows_in_part += len(rows)
+        if self._rows_in_part < self._part_rows:
+            return None
+        self._writer.close()
+        self._writer = None
+        self._rows_in_part = 0
+        self._part += 1
+        return self._part
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        elif self._part == 0:
+            # Nothing matched; still leave a readable, empty file
+            self._pq.write_table(self._schema.empty_table(), self._path)
+
+WRITERS = {'csv': CsvExportWriter, 'parquet': ParquetExportWriter}
+
+def _checkpoint_path(out_path):
+    return f"{out_path}.checkpoint"
+
+def export_applications(database, out_path, export_format='csv', statuses=None,
+                        date_from=None, date_to=None, batch_size=EXPORT_BATCH_SIZE, resume=False,
+                        summaries=False):
+    """
+    Stream applications to a CSV or Parquet file.
+
+    With summaries=True, rows come from the narrow application_summaries
+    collection instead of the full application documents.
+
+    With resume=True, continues after the last batch recorded in the
+    checkpoint file written next to the output. A checkpoint left by an
+    export with other filters, format or report type raises ValueError.
+
+    Returns:
+    int: Number of rows written in this run
+    """
+    if summaries:
+        columns, flatten = SUMMARY_COLUMNS, flatten_summary
+        collection, projection = 'application_summaries', None
+    else:
+        columns, flatten = export_columns(), flatten_application
+        collection, projection = 'applications', EXPORT_PROJECTION
+    criteria = build_criteria(statuses, date_from, date_to)
+    key = export_key(criteria, export_format, summaries)
+    checkpoint_path = _checkpoint_path(out_path)
+    checkpoint = None
+    if resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as handle:
+            checkpoint = json.load(handle)
+        if checkpoint.get('key') != key:
+            raise ValueError(f"{checkpoint_path} belongs to an export with other filters or format; "
+                             f"remove it or export without resuming")
+
+    writer = WRITERS[export_format](out_path, columns, checkpoint['position'] if checkpoint else None)
+    after_id = ObjectId(checkpoint['last_id']) if checkpoint else None
+    rows_written = 0
+    try:
+        for batch in database.iter_application_batches(criteria, projection, batch_size, after_id, collection):
+            position = writer.write_batch([flatten(app) for app in batch])
+            rows_written += len(batch)
+            if position is None:
+                continue
+            # Everything up to this batch is on disk in a readable file
+            with open(checkpoint_path, 'w') as handle:
+                json.dump({
+                    'key': key,
+                    'last_id': str(batch[-1]['_id']),
+                    'position': position,
+                    'rows': (checkpoint or {}).get('rows', 0) + rows_written
+                }, handle)
+    finally:
+        writer.close()
+
+    # A finished export needs no checkpoint
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return rows_written
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export applications for MIS reporting")
+    parser.add_argument("--out", required=True, help="Output file path")
+    parser.add_argument("--format", choices=sorted(WRITERS), default='csv')
+    parser.add_argument("--status", action="append", help="Only this status (repeatable)")
+    parser.add_argument("--from", dest="date_from", type=_parse_date, help="Submitted on or after YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", type=_parse_date, help="Submitted on or before YYYY-MM-DD")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted export")
+    parser.add_argument("--summary", action="store_true", help="Export the narrow summary rows only")
+    args = parser.parse_args()
+
+    from database import get_database
+    date_to = args.date_to + timedelta(days=1) if args.date_to else None
+    rows = export_applications(get_database().wait_until_ready(), args.out, args.format, args.status,
+                               args.date_from, date_to, args.batch_size, args.resume, args.summary)
+    print(f"Exported {rows} applications to {', '.join(export_files(args.out))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# application_numbers.py
+
+import os
+import threading
+from datetime import datetime
+import streamlit as st
+
+# Identifies the branch or deployment issuing the numbers. Embedded stores
+# count on their own, so each branch must set a code of its own there
+BRANCH_CODE = os.environ.get("MSME_BRANCH_CODE", "").upper()
+# Code of the central deployment when none is set
+DEFAULT_BRANCH_CODE = "HO"
+APPLICATION_PREFIX = "MSME"
+# Numbers reserved per counter round trip
+BLOCK_SIZE = int(os.environ.get("APPLICATION_NUMBER_BLOCK", "100"))
+
+_blocks = {}
+_lock = threading.Lock()
+
+class ApplicationNumberUnavailable(RuntimeError):
+    """No block of numbers could be reserved; the database is not reachable"""
+
+def branch_code():
+    """The configured branch code; required with the embedded backend"""
+    if BRANCH_CODE:
+        return BRANCH_CODE
+    from database import DB_BACKEND
+    if DB_BACKEND == 'embedded':
+        raise RuntimeError("MSME_BRANCH_CODE must be set with MSME_DB_BACKEND=embedded: "
+                           "every branch store issues its own application numbers")
+    return DEFAULT_BRANCH_CODE
+
+def _next_sequence(database, branch):
+    """Next number from this process's block, reserving a new block when it runs out"""
+    with _lock:
+        next_value, end = _blocks.get(branch, (0, 0))
+        if next_value >= end:
+            next_value = database.reserve_counter_block(f"application_number:{branch}", BLOCK_SIZE)
+            if next_value is None:
+                raise ApplicationNumberUnavailable("The database is unavailable; no application number could be issued")
+            end = next_value + BLOCK_SIZE
+        _blocks[branch] = (next_value + 1, end)
+        return next_value
+
+def allocate_application_number(database, branch=None, now=None):
+    """
+    Issue a new application number, e.g. MSMEPUN2610190000123.
+
+    Branch, then date, then a per-branch sequence: numbers sort by branch
+    and issue date, and new ones land at the end of the index.
+
+    Raises:
+    ApplicationNumberUnavailable: When a new block is needed and the database cannot be reached
+    """
+    branch = branch or branch_code()
+    sequence = _next_sequence(database, branch)
+    return f"{APPLICATION_PREFIX}{branch}{(now or datetime.now()):%y%m%d}{sequence:07d}"
+
+def ensure_application_number():
+    """
+    The session's application number, allocated on its first save or upload.
+
+    A first save queued while the database was down is saved without a
+    number and given one when the queue drains; the session then picks
+    that number up from the saved application.
+
+    Raises ApplicationNumberUnavailable while the database is down; the
+    number is allocated on a later save or upload instead.
+    """
+    if not st.session_state.get('application_number'):
+        from database import get_database
+        database = get_database()
+        application_id = st.session_state.get('application_id')
+        if application_id:
+            st.session_state.application_number = _saved_number(database, application_id)
+        else:
+            st.session_state.application_number = allocate_application_number(database)
+    return st.session_state.application_number
+
+def _saved_number(database, application_id):
+    """The number a queued first save was given when it reached the database"""
+    if not database.is_ready() or database.pending_write_count():
+        raise ApplicationNumberUnavailable("The application is still queued; its number is issued once it is saved")
+    saved = database.get_application(application_id)
+    if saved and saved.get('application_number'):
+        return saved['application_number']
+    return allocate_application_number(database)
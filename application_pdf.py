@@ -0,0 +1,206 @@
+# application_pdf.py
+"""
+Printable application summary: every section of the form, the status and
+thumbnails of the attached documents, rendered with PyMuPDF.
+
+The PDF is cached beside the documents, keyed by a hash of the saved
+application and its document list, so it is built once per version and
+then streamed as is until something changes.
+"""
+
+import io
+import textwrap
+from datetime import datetime
+from bson import json_util
+from upload_buffers import content_hash
+from amounts import paise_to_lakhs
+
+SUMMARY_PDF_KIND = 'summary_pdf'
+PDF_CONTENT_TYPE = 'application/pdf'
+# Bump when the layout changes so cached PDFs are rebuilt
+LAYOUT_VERSION = 1
+
+PAGE_MARGIN = 50
+LINE_HEIGHT = 14
+FONT_SIZE = 9
+HEADING_SIZE = 12
+LABEL_WIDTH = 170
+THUMBNAIL_SIZE = 140
+THUMBNAILS_PER_ROW = 3
+
+# Form sections, by the field name prefixes they hold; the rest go last
+SECTIONS = [
+    ("Partners/Directors", ('director_',)),
+    ("Existing Credit Facilities", ('existing_facility_', 'existing_bank', 'existing_security')),
+    ("Proposed Credit Facilities", ('proposed_facility_',)),
+    ("Collateral Security and Guarantors", ('collateral_', 'additional_guarantor_')),
+    ("Past Performance (Rs. in lacs)", ('past_performance_',)),
+    ("Suppliers and Customers", ('supplier_', 'customer_')),
+    ("Associate Concerns and Statutory Obligations", ('associate_', 'statutory_'))
+]
+
+def application_version(application, documents):
+    """
+    Hash of everything the summary shows.
+
+    Args:
+    application (dict): The saved application
+    documents (list): Its documents as returned by get_application_documents(..., include_data=False)
+
+    Returns:
+    str: Hex digest that changes whenever the PDF would
+    """
+    content = {
+        'layout': LAYOUT_VERSION,
+        'application': application,
+        'documents': [(doc['file_id'], doc.get('filename'), doc.get('upload_date')) for doc in documents]
+    }
+    return content_hash(json_util.dumps(content, sort_keys=True).encode())
+
+def _label(field):
+    return field.replace('_', ' ').title()
+
+def _format(value):
+    if isinstance(value, datetime):
+        return f"{value:%d/%m/%Y}"
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_format(item) for item in value)
+    return str(value)
+
+class SummaryWriter:
+    """Flows headings, label/value rows and images down A4 pages"""
+
+    def __init__(self):
+        import fitz  # PyMuPDF
+        self.fitz = fitz
+        self.pdf = fitz.open()
+        self.page = None
+        self.y = 0
+        self.new_page()
+
+    def new_page(self):
+        rect = self.fitz.paper_rect("a4")
+        self.page = self.pdf.new_page(width=rect.width, height=rect.height)
+        self.y = PAGE_MARGIN
+
+    def ensure_space(self, height):
+        if self.y + height > self.page.rect.height - PAGE_MARGIN:
+            self.new_page()
+
+    def heading(self, text):
+        self.ensure_space(HEADING_SIZE * 3)
+        self.y += HEADING_SIZE
+        self.page.insert_text((PAGE_MARGIN, self.y), text, fontsize=HEADING_SIZE, fontname="hebo")
+        self.y += LINE_HEIGHT // 2
+        self.page.draw_line((PAGE_MARGIN, self.y), (self.page.rect.width - PAGE_MARGIN, self.y),
+                            color=(0.6, 0.6, 0.6), width=0.5)
+        self.y += LINE_HEIGHT
+
+    def row(self, label, value):
+        width = self.page.rect.width - 2 * PAGE_MARGIN - LABEL_WIDTH
+        lines = textwrap.wrap(_format(value), int(width / (FONT_SIZE * 0.5))) or [""]
+        self.ensure_space(LINE_HEIGHT * len(lines))
+        self.page.insert_text((PAGE_MARGIN, self.y), label, fontsize=FONT_SIZE, fontname="hebo")
+        for line in lines:
+            self.page.insert_text((PAGE_MARGIN + LABEL_WIDTH, self.y), line, fontsize=FONT_SIZE)
+            self.y += LINE_HEIGHT
+
+    def thumbnails(self, items):
+        """(caption, image bytes or None) pairs, a few to a row"""
+        from PIL import Image
+        gap = (self.page.rect.width - 2 * PAGE_MARGIN - THUMBNAILS_PER_ROW * THUMBNAIL_SIZE) / (THUMBNAILS_PER_ROW - 1)
+        for start in range(0, len(items), THUMBNAILS_PER_ROW):
+            self.ensure_space(THUMBNAIL_SIZE + 2 * LINE_HEIGHT)
+            for column, (caption, image) in enumerate(items[start:start + THUMBNAILS_PER_ROW]):
+                x = PAGE_MARGIN + column * (THUMBNAIL_SIZE + gap)
+                box = self.fitz.Rect(x, self.y, x + THUMBNAIL_SIZE, self.y + THUMBNAIL_SIZE)
+                if image:
+                    # Previews are WebP; MuPDF takes PNG everywhere
+                    png = io.BytesIO()
+                    Image.open(io.BytesIO(image)).save(png, format="PNG")
+                    self.page.insert_image(box, stream=png.getvalue(), keep_proportion=True)
+                else:
+                    self.page.draw_rect(box, color=(0.8, 0.8, 0.8), width=0.5)
+                    self.page.insert_text((x + 8, self.y + THUMBNAIL_SIZE / 2), "No preview", fontsize=FONT_SIZE)
+                self.page.insert_text((x, self.y + THUMBNAIL_SIZE + LINE_HEIGHT), caption[:40], fontsize=FONT_SIZE - 1)
+            self.y += THUMBNAIL_SIZE + 2 * LINE_HEIGHT
+
+    def tobytes(self):
+        return self.pdf.tobytes(garbage=3, deflate=True)
+
+def render_application_pdf(application, documents, previews):
+    """
+    Build the summary PDF of an application.
+
+    Args:
+    application (dict): The saved application
+    documents (list): Its documents, without data
+    previews (dict): Thumbnail bytes by document file id
+
+    Returns:
+    bytes: The PDF
+    """
+    writer = SummaryWriter()
+    writer.page.insert_text((PAGE_MARGIN, writer.y + HEADING_SIZE), "MSME Loan Application",
+                            fontsize=HEADING_SIZE + 6, fontname="hebo")
+    writer.y += HEADING_SIZE + 2 * LINE_HEIGHT
+
+    writer.heading("Application")
+    writer.row("Application Number", application.get('application_number', 'N/A'))
+    writer.row("Status", application.get('status', 'N/A'))
+    for field in ('submission_date', 'last_updated'):
+        if application.get(field):
+            writer.row(_label(field), f"{application[field]:%d/%m/%Y %H:%M}"
+                       if isinstance(application[field], datetime) else application[field])
+    proposed = (application.get('typed') or {}).get('amounts', {})
+    total = sum(paise for field, paise in proposed.items() if field.startswith('proposed_facility_amount_'))
+    if total:
+        writer.row("Total Proposed", f"Rs. {paise_to_lakhs(total):,.2f} lacs")
+
+    writer.heading("Basic Information")
+    for field, value in (application.get('basic_info') or {}).items():
+        if value:
+            writer.row(_label(field), value)
+
+    form_data = {k: v for k, v in (application.get('form_data') or {}).items() if v}
+    remaining = dict(form_data)
+    for title, prefixes in SECTIONS:
+        fields = [k for k in form_data if k.startswith(prefixes)]
+        if fields:
+            writer.heading(title)
+            for field in fields:
+                label = field[len('past_performance_'):] if field.startswith('past_performance_') else field
+                writer.row(_label(label), form_data[field])
+                remaining.pop(field, None)
+    if remaining:
+        writer.heading("Other Details")
+        for field, value in remaining.items():
+            writer.row(_label(field), value)
+
+    writer.heading("Attached Documents")
+    if documents:
+        writer.thumbnails([
+            (f"{doc.get('document_type') or 'Document'}: {doc.get('filename', '')}", previews.get(doc['file_id']))
+            for doc in documents
+        ])
+    else:
+        writer.row("", "No documents uploaded")
+    return writer.tobytes()
+
+def get_application_pdf(database, application):
+    """
+    The summary PDF of a saved application, rendered only if this version is not cached.
+
+    Returns:
+    bytes: The PDF
+    """
+    application_number = application['application_number']
+    documents = database.get_application_documents(application_number, include_data=False)
+    version = application_version(application, documents)
+    cached = database.get_rendered_file(application_number, SUMMARY_PDF_KIND, version)
+    if cached:
+        return cached
+    data = render_application_pdf(application, documents, database.get_document_previews(application_number))
+    database.save_rendered_file(application_number, SUMMARY_PDF_KIND, version, data,
+                                f"{application_number}.pdf", PDF_CONTENT_TYPE)
+    return data
@@ -0,0 +1,190 @@
+# application_search.py
+
+import re
+import math
+from pymongo import ASCENDING, TEXT, DESCENDING
+
+# Words that carry no weight when comparing enterprise names
+NAME_STOPWORDS = {
+    'm', 's', 'ms', 'the', 'and', 'pvt', 'private', 'ltd', 'limited',
+    'llp', 'co', 'company', 'firm'
+}
+
+# Candidates pulled per strategy before ranking in Python
+CANDIDATE_LIMIT = 200
+# Share of the query's trigrams a name must contain to be a candidate
+MIN_GRAM_OVERLAP = 0.5
+# Gram matches looked at before overlap is counted, bounding the work per query
+GRAM_SCAN_LIMIT = 2000
+# Minimum fuzzy score for a name match to be shown
+NAME_MATCH_THRESHOLD = 60
+
+# Only the fields needed to list results; never the form_data payload
+RESULT_PROJECTION = {
+    'application_number': 1,
+    'status': 1,
+    'submission_date': 1,
+    'basic_info.enterprise_name': 1,
+    'basic_info.pan': 1,
+    'basic_info.gst_number': 1,
+    'basic_info.udyam_number': 1,
+    'basic_info.mobile': 1,
+    'search.name': 1
+}
+
+def normalize_identifier(value):
+    """Uppercase and strip separators from PAN, GSTIN, Udyam or mobile numbers"""
+    return re.sub(r'[^A-Z0-9]', '', str(value or '').upper())
+
+def normalize_mobile(value):
+    """Last ten digits of a mobile number, dropping +91 and leading zeros"""
+    digits = re.sub(r'\D', '', str(value or ''))
+    return digits[-10:] if len(digits) >= 10 else digits
+
+def normalize_name(value):
+    """Lowercase enterprise or person name without punctuation and legal suffixes"""
+    words = re.sub(r'[^a-z0-9 ]', ' ', str(value or '').lower()).split()
+    return ' '.join(word for word in words if word not in NAME_STOPWORDS)
+
+def name_grams(name):
+    """Character trigrams of each word of a normalized name"""
+    grams = set()
+    for word in name.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return sorted(grams)
+
+def gram_query(grams, min_overlap=MIN_GRAM_OVERLAP):
+    """
+    Plan a trigram lookup that only finds names sharing enough grams.
+
+    A name holding at least `required` of the n query grams must hold one
+    of any n - required + 1 of them, so only those are looked up. Grams
+    inside a word are preferred: word-start and word-end grams such as
+    " sh" or "rs " are shared by far more names.
+
+    Returns:
+    tuple: (grams to look up, minimum number of grams in common)
+    """
+    required = max(1, math.ceil(len(grams) * min_overlap))
+    by_rarity = sorted(grams, key=lambda gram: (gram.startswith(' ') or gram.endswith(' '), gram))
+    return by_rarity[:len(grams) - required + 1], required
+
+def pan_from_gstin(gstin):
+    """PAN embedded in characters 3-12 of a GSTIN"""
+    gstin = normalize_identifier(gstin)
+    return gstin[2:12] if len(gstin) == 15 else None
+
+def build_search_keys(application_data):
+    """
+    Compute the normalized keys stored with an application for search.
+
+    Returns:
+    dict: 'ids' (PAN, GSTIN, Udyam, mobile prefixes), 'name' and 'name_grams'
+    """
+    basic_info = application_data.get('basic_info') or {}
+    form_data = application_data.get('form_data') or {}
+
+    ids = {
+        normalize_identifier(basic_info.get('pan')),
+        normalize_identifier(basic_info.get('gst_number')),
+        pan_from_gstin(basic_info.get('gst_number')),
+        normalize_identifier(basic_info.get('udyam_number')),
+        normalize_mobile(basic_info.get('mobile'))
+    }
+    for key, value in form_data.items():
+        if key.startswith('additional_gst_number_'):
+            ids.update({normalize_identifier(value), pan_from_gstin(value)})
+
+    name = normalize_name(basic_info.get('enterprise_name') or form_data.get('trade_name'))
+    return {
+        'ids': sorted(identifier for identifier in ids if identifier),
+        'name': name,
+        'name_grams': name_grams(name)
+    }
+
+def ensure_search_indexes(db):
+    """Create the text, prefix and n-gram indexes used by search"""
+    db.applications.create_index(
+        [('basic_info.enterprise_name', TEXT), ('form_data.trade_name', TEXT)],
+        name='application_text'
+    )
+    db.applications.create_index([('search.ids', ASCENDING)])
+    db.applications.create_index([('search.name_grams', ASCENDING)])
+
+def search_applications(db, query, page=0, page_size=20, text_search=True):
+    """
+    Ranked, paginated search over applications.
+
+    Matches the query as a prefix of application number, PAN, GSTIN, Udyam
+    or mobile, and as a typo-tolerant enterprise name. Pass text_search=False
+    where the server has no text index (the in-process stand-in).
+
+    Returns:
+    tuple: (results for the page, total number of ranked results)
+    """
+    query = (query or '').strip()
+    if not query:
+        return [], 0
+
+    scored = {}
+
+    def add(doc, score):
+        current = scored.get(doc['_id'])
+        if current is None or current[0] < score:
+            scored[doc['_id']] = (score, doc)
+
+    identifier = normalize_identifier(query)
+    if len(identifier) >= 3:
+        # Anchored prefix regexes are answered from the index
+        prefix = {'$regex': f'^{re.escape(identifier)}'}
+        mobile = normalize_mobile(query)
+        id_query = {'$or': [{'application_number': prefix}, {'search.ids': prefix}]}
+        if mobile and mobile != identifier:
+            id_query['$or'].append({'search.ids': mobile})
+        for doc in db.applications.find(id_query, RESULT_PROJECTION).limit(CANDIDATE_LIMIT):
+            add(doc, identifier_score(identifier, doc))
+
+    name = normalize_name(query)
+    if name:
+        from fuzzywuzzy import fuzz
+
+        # Rank candidates sharing enough trigrams server-side, then score them exactly
+        grams = name_grams(name)
+        probe, required = gram_query(grams)
+        pipeline = [
+            {'$match': {'search.name_grams': {'$in': probe}}},
+            {'$limit': GRAM_SCAN_LIMIT},
+            {'$project': dict(RESULT_PROJECTION, overlap={'$size': {'$setIntersection': ['$search.name_grams', grams]}})},
+            {'$match': {'overlap': {'$gte': required}}},
+            {'$sort': {'overlap': DESCENDING}},
+            {'$limit': CANDIDATE_LIMIT}
+        ]
+        for doc in db.applications.aggregate(pipeline):
+            score = fuzz.token_set_ratio(name, doc.get('search', {}).get('name', ''))
+            if score >= NAME_MATCH_THRESHOLD:
+                add(doc, score)
+
+    if name and text_search:
+        # Whole-word matches from the text index catch names never re-keyed
+        text_query = {'$text': {'$search': query}}
+        projection = dict(RESULT_PROJECTION, text_score={'$meta': 'textScore'})
+        for doc in db.applications.find(text_query, projection).sort(
+                [('text_score', {'$meta': 'textScore'})]).limit(CANDIDATE_LIMIT):
+            add(doc, min(100, 50 + 10 * doc['text_score']))
+
+    return paginate_ranked(scored, page, page_size)
+
+def identifier_score(identifier, doc):
+    """Rank of an identifier prefix match: exact matches above prefixes"""
+    exact = identifier == doc.get('application_number') or identifier in (
+        normalize_identifier(doc.get('basic_info', {}).get(field))
+        for field in ('pan', 'gst_number', 'udyam_number')
+    )
+    return 200 if exact else 150
+
+def paginate_ranked(scored, page, page_size):
+    """One page of {_id: (score, doc)} candidates, best first, and the total"""
+    ranked = [doc for score, doc in sorted(scored.values(), key=lambda item: -item[0])]
+    start = page * page_size
+    return ranked[start:start + page_size], len(ranked)
@@ -0,0 +1,121 @@
+# application_summaries.py
+"""
+Narrow per-application summary rows for status and branch reporting.
+
+Summaries are written in the same code path as application saves and
+updates (see Database.save_application / update_application), keyed by
+the application's _id. Rebuild them from scratch with:
+
+    python application_summaries.py --rebuild
+"""
+
+import argparse
+from datetime import datetime
+from pymongo import ASCENDING, ReplaceOne
+from amounts import parse_amount, LAKH
+from field_types import parse_date
+
+REBUILD_BATCH_SIZE = 1000
+
+# Only the fields a summary is built from
+SUMMARY_SOURCE_PROJECTION = {
+    'application_number': 1,
+    'status': 1,
+    'submission_date': 1,
+    'last_updated': 1,
+    'basic_info.enterprise_name': 1,
+    'basic_info.state': 1,
+    'basic_info.classification': 1,
+    'form_data': 1
+}
+
+def build_summary(application_data):
+    """
+    Summary fields derivable from (possibly partial) application data.
+
+    A status-only update yields just status, remarks and last_updated, so
+    the result can be applied with $set without clobbering other fields.
+    """
+    summary = {}
+    for field in ('application_number', 'status'):
+        if field in application_data:
+            summary[field] = application_data[field]
+    for field in ('submission_date', 'last_updated'):
+        if field in application_data:
+            # Older applications carry isoformat() strings
+            summary[field] = parse_date(application_data[field])
+
+    if 'basic_info' in application_data:
+        basic_info = application_data.get('basic_info') or {}
+        summary['enterprise_name'] = basic_info.get('enterprise_name')
+        summary['state'] = basic_info.get('state')
+        summary['classification'] = basic_info.get('classification')
+
+    if 'form_data' in application_data:
+        form_data = application_data.get('form_data') or {}
+        summary['loan_branch'] = form_data.get('loan_branch')
+        # Facility amounts are entered in lakhs; totals are kept in paise
+        amounts = [
+            parse_amount(value, unit=LAKH) for key, value in form_data.items()
+            if key.startswith('proposed_facility_amount_')
+        ]
+        summary['total_proposed_paise'] = sum(amount for amount in amounts if amount is not None)
+    return summary
+
+def ensure_summary_indexes(db):
+    db.application_summaries.create_index([('application_number', ASCENDING)])
+    db.application_summaries.create_index([('status', ASCENDING), ('loan_branch', ASCENDING)])
+    db.application_summaries.create_index([('loan_branch', ASCENDING), ('submission_date', ASCENDING)])
+    db.application_summaries.create_index([('state', ASCENDING)])
+    db.application_summaries.create_index([('submission_date', ASCENDING)])
+    db.application_summaries.create_index([('total_proposed_paise', ASCENDING)])
+
+def save_summary(db, application_id, application_data):
+    """Upsert the summary for one application"""
+    summary = build_summary(application_data)
+    if summary:
+        db.application_summaries.update_one({'_id': application_id}, {'$set': summary}, upsert=True)
+
+def rebuild_summaries(database, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Regenerate every summary from the applications collection.
+
+    Rows are built into a scratch collection which then replaces the live
+    one in a single rename, so dashboards never see a half-built table.
+
+    Returns:
+    int: Number of summaries written
+    """
+    db = database.db
+    scratch = db.application_summaries_rebuild
+    scratch.drop()
+    written = 0
+    for batch in database.iter_application_batches(projection=SUMMARY_SOURCE_PROJECTION, batch_size=batch_size):
+        scratch.bulk_write([
+            ReplaceOne({'_id': app['_id']}, build_summary(app), upsert=True)
+            for app in batch
+        ], ordered=False)
+        written += len(batch)
+        print(f"{datetime.now().isoformat()} rebuilt {written} summaries")
+    if written:
+        scratch.rename('application_summaries', dropTarget=True)
+    else:
+        db.application_summaries.delete_many({})
+    ensure_summary_indexes(db)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the application_summaries collection")
+    parser.add_argument("--rebuild", action="store_true", help="Regenerate all summaries from applications")
+    parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.rebuild:
+        from database import get_database
+        written = get_database().wait_until_ready().rebuild_summaries(args.batch_size)
+        print(f"Rebuilt {written} application summaries")
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
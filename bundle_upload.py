@@ -0,0 +1,236 @@
+# bundle_upload.py
+"""
+Single "upload all documents" entry point.
+
+Accepts a zip archive or several files at once, routes each file to its
+document type (by content, falling back to the file name), extracts them
+in parallel and hands the results back for auto-filling and storage.
+Files go through the extraction queue when its workers are running, and
+to a local process pool otherwise.
+"""
+
+import os
+import re
+import zipfile
+import mimetypes
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from upload_buffers import upload_buffer, content_hash, BufferReader
+
+SUPPORTED_CONTENT_TYPES = {'application/pdf', 'image/png', 'image/jpeg'}
+
+# Extraction runs in processes: PyMuPDF is not safe to share across threads
+EXTRACTION_WORKERS = int(os.environ.get("BUNDLE_EXTRACTION_WORKERS", "4"))
+
+# Filename hints for each document type, checked in order
+FILENAME_ROUTES = [
+    ("Udyam Certificate", r'udyam|udyog|msme'),
+    ("GST Certificate", r'gst|reg[-_ ]?06'),
+    ("PAN Card", r'(^|[^a-z])pan([^a-z]|$)|pancard'),
+    ("Aadhaar Card", r'aadha+r|adhar|uidai|e-?aadhaar'),
+    ("Bank Statement", r'bank|statement|passbook|a/?c'),
+]
+
+# Document types filled in per director; the nth card goes to director n
+DIRECTOR_DOCUMENT_TYPES = {"PAN Card", "Aadhaar Card"}
+
+_pool = None
+
+class BundledFile:
+    """In-memory stand-in for a Streamlit UploadedFile taken from a bundle"""
+
+    def __init__(self, name, content_type, data, sha256=None):
+        self.name = name
+        self.type = content_type
+        self._data = data
+        self.size = len(data)
+        self._sha256 = sha256
+
+    def getvalue(self):
+        return self._data
+
+    @property
+    def sha256(self):
+        """Digest of the contents, hashed on first use"""
+        if self._sha256 is None:
+            self._sha256 = content_hash(self._data)
+        return self._sha256
+
+def _content_type(name):
+    content_type, _ = mimetypes.guess_type(name)
+    return 'image/jpeg' if content_type == 'image/jpg' else content_type
+
+def expand_uploads(files, digest=None):
+    """
+    Unpack zip archives and return every supported file as a BundledFile.
+
+    Args:
+    files (list): Uploaded files
+    digest (callable): Returns the known SHA-256 of an upload, so files
+        that are not archives are not hashed again
+    """
+    expanded = []
+    for file in files:
+        if file.name.lower().endswith('.zip') or file.type in ('application/zip', 'application/x-zip-compressed'):
+            with zipfile.ZipFile(BufferReader(upload_buffer(file))) as archive:
+                for info in archive.infolist():
+                    name = os.path.basename(info.filename)
+                    if info.is_dir() or not name or name.startswith('.') or '__MACOSX' in info.filename:
+                        continue
+                    content_type = _content_type(name)
+                    if content_type in SUPPORTED_CONTENT_TYPES:
+                        expanded.append(BundledFile(name, content_type, archive.read(info)))
+        elif file.type in SUPPORTED_CONTENT_TYPES:
+            expanded.append(BundledFile(file.name, file.type, bytes(upload_buffer(file)),
+                                        digest(file) if digest else None))
+    return expanded
+
+def route_by_filename(name):
+    """Guess the document type from a file name, or None"""
+    lowered = name.lower()
+    for document_type, pattern in FILENAME_ROUTES:
+        if re.search(pattern, lowered):
+            return document_type
+    return None
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: the Streamlit server is multi-threaded
+        _pool = ProcessPoolExecutor(
+            max_workers=EXTRACTION_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _pool
+
+def _reset_pool(pool):
+    """Drop a pool whose worker died, so the next bundle starts a fresh one"""
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+# Classifier confidence needed to route against the file name
+ROUTE_CONFIDENCE = 0.5
+
+def route_and_extract(name, content_type, data):
+    """Route a bundle file to its document type and extract it; runs in a worker process"""
+    from document_classifier import classify_document, layout_fits
+    from document_extraction import extract_data_from_document
+
+    file = BundledFile(name, content_type, data)
+    document_type = route_by_filename(name)
+    if document_type and layout_fits(upload_buffer(file), content_type, document_type):
+        # Name and shape agree: extract straight away and let the extraction's
+        # own type check catch the rare mislabelled file
+        extracted = extract_data_from_document(file, document_type)
+        if "detected_type" not in extracted:
+            return document_type, extracted
+        document_type = extracted["detected_type"]
+        return document_type, extract_data_from_document(file, document_type, check_type=False)
+
+    detected_type, confidence = classify_document(upload_buffer(file), content_type)
+    if detected_type and (confidence >= ROUTE_CONFIDENCE or document_type is None):
+        document_type = detected_type
+    if document_type is None:
+        return None, None
+    return document_type, extract_data_from_document(file, document_type, check_type=False)
+
+def reindex_director_fields(data, index):
+    """
+    Move director_*_0 fields extracted from a card to director `index`.
+
+    The card's unprefixed name, pan, dob and address are dropped: they
+    would otherwise fill the enterprise's own fields.
+    """
+    return {
+        re.sub(r'^(director_.+)_0$', rf'\g<1>_{index}', key): value
+        for key, value in data.items() if key.startswith('director_')
+    }
+
+def collect_results(files, outcomes):
+    """
+    Pair each file with its (document type, data) outcome.
+
+    Returns:
+    list: One dict per file with 'file', 'document_type', 'sha256', the
+        extracted 'data' (None for files that could not be routed) and,
+        for PAN and Aadhaar cards, the 'director_index' they were filled into
+    """
+    results = []
+    director_counts = {}
+    for file, (document_type, data) in zip(files, outcomes):
+        director_index = None
+        if document_type in DIRECTOR_DOCUMENT_TYPES and data and "error" not in data:
+            # Cards are assigned to directors in upload order
+            director_index = director_counts.get(document_type, 0)
+            director_counts[document_type] = director_index + 1
+            data = reindex_director_fields(data, director_index)
+        results.append({
+            'file': file,
+            'document_type': document_type,
+            'sha256': file.sha256,
+            'data': data,
+            'director_index': director_index
+        })
+    return results
+
+def process_bundle(files):
+    """
+    Route and extract every file of a bundle in parallel, in a local process pool.
+
+    Args:
+    files (list): BundledFile objects from expand_uploads
+
+    Returns:
+    list: As collect_results
+    """
+    pool = _get_pool()
+    try:
+        futures = [pool.submit(route_and_extract, file.name, file.type, file.getvalue()) for file in files]
+    except BrokenProcessPool:
+        # A worker of an earlier bundle died; start over with a new pool
+        _reset_pool(pool)
+        pool = _get_pool()
+        futures = [pool.submit(route_and_extract, file.name, file.type, file.getvalue()) for file in files]
+
+    outcomes = []
+    for file, future in zip(files, futures):
+        try:
+            outcomes.append(future.result())
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                _reset_pool(pool)
+            outcomes.append((route_by_filename(file.name), {"error": f"Extraction failed: {str(e)}"}))
+    return collect_results(files, outcomes)
+
+def queue_bundle(files, retry_failed=False):
+    """
+    Route and extract every file of a bundle through the extraction queue.
+
+    Submitting is idempotent: call again on later reruns to collect the
+    results. retry_failed re-queues files whose earlier jobs failed.
+
+    Returns:
+    tuple: (results as collect_results, or None while any job is unfinished;
+        keys of the unfinished jobs)
+    """
+    from extraction_queue import get_queue, ROUTE_DOCUMENT_TYPE
+    queue = get_queue()
+    jobs = [
+        queue.submit(upload_buffer(file), file.name, file.type, ROUTE_DOCUMENT_TYPE,
+                     sha256=file.sha256, retry_failed=retry_failed)
+        for file in files
+    ]
+    unfinished = [job['job_key'] for job in jobs if job['state'] in ('pending', 'running')]
+    if unfinished:
+        return None, unfinished
+
+    outcomes = []
+    for file, job in zip(files, jobs):
+        if job['state'] == 'done':
+            outcomes.append((job['result']['document_type'], job['result']['data']))
+        else:
+            outcomes.append((route_by_filename(file.name), {"error": f"Extraction failed: {job['error']}"}))
+    return collect_results(files, outcomes), []
@@ -0,0 +1,94 @@
+# circuit_breaker.py
+
+import time
+import threading
+
+class CircuitBreaker:
+    """
+    Fail fast while a dependency is unhealthy.
+
+    closed: calls go through; failure_threshold consecutive failures open it.
+    open: calls are refused until reset_seconds have passed.
+    half_open: one probe call is let through; its success closes the
+    breaker (and calls on_close), its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=15, on_close=None):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.on_close = on_close
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.opens = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def is_closed(self):
+        return self.state == 'closed'
+
+    def allow(self):
+        """Whether a call may go ahead; in half_open only the first caller may"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            reopened = self.state != 'closed'
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+        if reopened and self.on_close:
+            self.on_close()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.opens += 1
+                self._probing = False
+
+    def snapshot(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'opens': self.opens,
+            'open_for_seconds': time.monotonic() - self.opened_at if self.state != 'closed' else 0
+        }
+
+class OperationMetrics:
+    """Thread-safe counters and per-operation latencies"""
+
+    def __init__(self):
+        self.counters = {}
+        self.latencies = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, operation, seconds):
+        with self._lock:
+            count, total, worst = self.latencies.get(operation, (0, 0.0, 0.0))
+            self.latencies[operation] = (count + 1, total + seconds, max(worst, seconds))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'latencies': {
+                    operation: {'calls': count, 'mean_ms': total / count * 1000, 'max_ms': worst * 1000}
+                    for operation, (count, total, worst) in self.latencies.items()
+                }
+            }
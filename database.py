@@ -1,102 +1,583 @@
 import os
-from pymongo import MongoClient, ASCENDING
+import time
+import logging
+import functools
+import threading
+from collections import deque
+import pymongo
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import PyMongoError, ConnectionFailure
 import urllib.parse
 import streamlit as st
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # Older Streamlit releases
+    get_script_run_ctx = None
 from datetime import datetime
-from gridfs import GridFS
-from bson import ObjectId
+from gridfs import GridFS, DEFAULT_CHUNK_SIZE
+from bson import ObjectId, Binary
+from upload_buffers import BufferReader
+from application_search import build_search_keys, ensure_search_indexes, search_applications
+from duplicate_detection import ensure_blocking_indexes, save_blocking_keys, find_related_applications
+from application_summaries import ensure_summary_indexes, save_summary, rebuild_summaries
+from storage_backend import StorageBackend, prepare_document
+from field_types import typed_fields
+from circuit_breaker import CircuitBreaker, OperationMetrics
 
-class Database:
-    def __init__(self):
-        try:
-            # Get connection parameters
-            MONGO_USER = "puspendersharma"
-            MONGO_PASSWORD = "unionbank"
-            MONGO_CLUSTER = "msme-loan-app.a0gwq.mongodb.net"
-            MONGO_DB_NAME = "msme_loan_db"
+logger = logging.getLogger(__name__)
 
-            # URL encode the credentials
-            encoded_username = urllib.parse.quote_plus(MONGO_USER)
-            encoded_password = urllib.parse.quote_plus(MONGO_PASSWORD)
+# Number of GridFS file ids removed per delete_many round trip
+DELETE_BATCH_SIZE = 1000
 
-            # Build the basic connection string
-            basic_uri = (
-                f"mongodb+srv://{encoded_username}:{encoded_password}@{MONGO_CLUSTER}/"
-            )
+# Which MongoDB the app talks to:
+#   atlas  - the production cluster (default)
+#   local  - a mongod at MSME_LOCAL_MONGO_URI, for development and benchmarks
+#   memory - an in-process mongomock stand-in (pip install mongomock)
+#   embedded - SQLite and local files (see embedded_store.py), synced to
+#              the central database by storage_sync.py
+DB_BACKEND = os.environ.get("MSME_DB_BACKEND", "atlas").lower()
+LOCAL_MONGO_URI = os.environ.get("MSME_LOCAL_MONGO_URI", "mongodb://localhost:27017")
+MONGO_DB_NAME = os.environ.get("MSME_DB_NAME", "msme_loan_db")
 
-            # Create MongoClient with specific options
-            self.client = MongoClient(
-                basic_uri,
-                server_api='1',
-                ssl=True,
-                tlsAllowInvalidCertificates=True,  # Only for testing
-                serverSelectionTimeoutMS=10000,
-                connectTimeoutMS=20000,
-                maxPoolSize=50,
-                wtimeout=2500,
-                retryWrites=True,
-                socketTimeoutMS=20000
-            )
+# Seconds to wait before verifying the connection again after a failure
+READINESS_RETRY_SECONDS = 30
+
+# Seconds each kind of operation may take in total, retries included
+LATENCY_BUDGETS = {
+    'read': float(os.environ.get("MSME_DB_READ_BUDGET", "2")),
+    'search': float(os.environ.get("MSME_DB_SEARCH_BUDGET", "3")),
+    'file': float(os.environ.get("MSME_DB_FILE_BUDGET", "15")),
+    'write': float(os.environ.get("MSME_DB_WRITE_BUDGET", "5"))
+}
+# Share of a read's budget given to its first attempt; the rest is for one retry
+FIRST_ATTEMPT_SHARE = 0.6
+# Consecutive timeouts or lost connections that open the breaker
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("MSME_DB_BREAKER_FAILURES", "5"))
+# Seconds the breaker stays open before a probe is let through
+BREAKER_RESET_SECONDS = float(os.environ.get("MSME_DB_BREAKER_RESET", "15"))
+
+class DatabaseUnavailable(RuntimeError):
+    """The client is not connected (yet)"""
+
+def is_transient(error):
+    """Timeouts and lost connections: the cluster's health, not the request's fault"""
+    if isinstance(error, (ConnectionFailure, DatabaseUnavailable)):
+        return True
+    # ExecutionTimeout, WTimeoutError and exceeded pymongo.timeout() budgets
+    return isinstance(error, PyMongoError) and error.timeout
+
+def guarded(operation, fallback=None, retry=None):
+    """
+    Run a method within its latency budget and behind the circuit breaker.
+
+    While the breaker is open the method is not called at all and fallback
+    (a value, or a callable making one) is returned at once. A read that
+    times out or loses its connection is retried once in what is left of
+    its budget; writes are left to pymongo's retryWrites.
+
+    Args:
+    operation (str): Key of LATENCY_BUDGETS
+    fallback: What the method returns when it fails
+    retry (bool): Retry once after a timeout; defaults to all but writes
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.breaker.allow():
+                self.metrics.increment('short_circuited')
+                self._local.transient_failures = self._transient_failures() + 1
+                return fallback() if callable(fallback) else fallback
+
+            budget = LATENCY_BUDGETS[operation]
+            attempts = 2 if (operation != 'write' if retry is None else retry) else 1
+            started = time.monotonic()
+            for attempt in range(attempts):
+                failures = self._transient_failures()
+                remaining = budget - (time.monotonic() - started)
+                with pymongo.timeout(remaining * FIRST_ATTEMPT_SHARE if attempt < attempts - 1 else remaining):
+                    result = method(self, *args, **kwargs)
+                if self._transient_failures() == failures:
+                    self.breaker.record_success()
+                    break
+                if attempt < attempts - 1 and self.breaker.is_closed() and time.monotonic() - started < budget:
+                    self.metrics.increment('retries')
+                    continue
+                self._notify(st.warning, f"{self._local.last_transient}: the database is slow to respond, please try again")
+                break
+            self.metrics.observe(method.__name__, time.monotonic() - started)
+            return result
+        return wrapper
+    return decorator
+
+class QueuedWrite:
+    """Result of a write held back until the database is ready"""
+
+    def __init__(self, inserted_id=None):
+        self.inserted_id = inserted_id
+        self.acknowledged = False
+
+def queued_until_ready(prepare=None):
+    """
+    Queue calls to a write method while the database is not ready or
+    the circuit breaker is not closed.
+
+    Args:
+    prepare (callable): Called with the method's arguments before queuing;
+        returns what the caller gets back in place of the real result
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.is_ready() and self.breaker.is_closed():
+                return method(self, *args, **kwargs)
+            result = prepare(*args, **kwargs) if prepare else QueuedWrite()
+            with self._lock:
+                self._pending_writes.append((method, args, kwargs))
+            self.metrics.increment('queued_writes')
+            if self.readiness['state'] == 'ready' and self.breaker.is_closed():
+                # Became ready while we were queuing; don't wait for the next drain
+                self._drain_pending_writes()
+            else:
+                self._probe_soon()
+            return result
+        return wrapper
+    return decorator
+
+def _prepare_application(application_data):
+    # Fix the _id now; save_application upserts it when the queue drains
+    application_data.setdefault('_id', ObjectId())
+    return QueuedWrite(application_data['_id'])
 
-            # Access the database
-            self.db = self.client[MONGO_DB_NAME]
-            
-            # Initialize GridFS
-            self.fs = GridFS(self.db)
+def _prepare_statuses(applications, *args, **kwargs):
+    return len(applications)
+
+def _prepare_document(file_data, metadata):
+    metadata.setdefault('file_id', ObjectId())
+    if not metadata.get('application_number'):
+        metadata['application_number'] = st.session_state.get('application_number')
+    return metadata['file_id']
+
+class Database(StorageBackend):
+    def __init__(self, backend=None):
+        """
+        Set up the database without blocking.
+
+        The connection is created and verified on a background thread;
+        reads wait for it, writes are queued until it is ready.
+        """
+        self.backend = (backend or DB_BACKEND).lower()
+        self._client = None
+        self._db = None
+        self._fs = None
+        self._connected = threading.Event()
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._pending_writes = deque()
+        # Blocking key refreshes waiting, and applications with one running
+        self._blocking_lock = threading.Lock()
+        self._blocking_pending = {}
+        self._blocking_running = set()
+        self._executor = None
+        self._local = threading.local()
+        self.readiness = {'state': 'connecting', 'error': None, 'checked_at': None}
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS,
+                                      on_close=self._on_breaker_closed)
+        self.metrics = OperationMetrics()
+        self._start_verification()
+
+    def _create_client(self):
+        if self.backend == 'memory':
+            try:
+                import mongomock
+                from mongomock.gridfs import enable_gridfs_integration
+            except ImportError:
+                raise RuntimeError("MSME_DB_BACKEND=memory needs mongomock: pip install mongomock")
+            enable_gridfs_integration()
+            return mongomock.MongoClient()
+
+        if self.backend == 'local':
+            return MongoClient(LOCAL_MONGO_URI, serverSelectionTimeoutMS=5000)
+
+        # Get connection parameters
+        MONGO_USER = "puspendersharma"
+        MONGO_PASSWORD = "unionbank"
+        MONGO_CLUSTER = "msme-loan-app.a0gwq.mongodb.net"
+
+        # URL encode the credentials
+        encoded_username = urllib.parse.quote_plus(MONGO_USER)
+        encoded_password = urllib.parse.quote_plus(MONGO_PASSWORD)
+
+        # Build the basic connection string
+        basic_uri = (
+            f"mongodb+srv://{encoded_username}:{encoded_password}@{MONGO_CLUSTER}/"
+        )
+
+        # Create MongoClient with specific options
+        return MongoClient(
+            basic_uri,
+            server_api='1',
+            ssl=True,
+            tlsAllowInvalidCertificates=True,  # Only for testing
+            # Per-operation budgets (LATENCY_BUDGETS) are usually tighter;
+            # these bound anything that runs outside them
+            serverSelectionTimeoutMS=5000,
+            connectTimeoutMS=5000,
+            maxPoolSize=50,
+            wtimeout=2500,
+            retryWrites=True,
+            socketTimeoutMS=10000
+        )
+
+    def _start_verification(self):
+        self.readiness.update(state='connecting', error=None)
+        threading.Thread(target=self._verify, name="db-verify", daemon=True).start()
+
+    def _verify(self):
+        """Connect, check permissions and indexes, then drain queued writes"""
+        try:
+            if self._client is None:
+                # SRV lookup happens here, off the page render
+                self._client = self._create_client()
+                self._db = self._client[MONGO_DB_NAME]
+                self._fs = GridFS(self._db)
+                self._connected.set()
 
             # Verify connection
-            db_list = self.client.list_database_names()
+            db_list = self._client.list_database_names()
             if MONGO_DB_NAME in db_list:
-                print(f"Successfully connected to {MONGO_DB_NAME}")
+                print(f"Successfully connected to {MONGO_DB_NAME} ({self.backend})")
             else:
                 print(f"Database {MONGO_DB_NAME} does not exist")
 
             # Test write permission
-            test_collection = self.db.test_collection
+            test_collection = self._db.test_collection
             test_doc = {"test": "connection"}
             test_collection.insert_one(test_doc)
             test_collection.delete_one({"test": "connection"})
             print("Database connection and permissions verified successfully!")
 
+            try:
+                self.ensure_indexes()
+            except Exception as e:
+                # Missing indexes slow queries down but must not block the app
+                print(f"Could not create indexes: {str(e)}")
+
+            self.readiness.update(state='ready', error=None, checked_at=time.time())
+            self._drain_pending_writes()
+        except Exception as e:
+            print(f"Detailed error: Database connection error: {str(e)}")
+            self.readiness.update(state='failed', error=str(e), checked_at=time.time())
+            self._connected.set()
+
+    def _drain_pending_writes(self):
+        # One drainer at a time keeps queued writes in submission order
+        with self._drain_lock:
+            # Queued writes belong to other sessions' pages, if any are left
+            self._local.draining = True
+            try:
+                while self.breaker.is_closed():
+                    with self._lock:
+                        if not self._pending_writes:
+                            return
+                        entry = self._pending_writes.popleft()
+                    method, args, kwargs = entry
+                    failures = self._transient_failures()
+                    method(self, *args, **kwargs)
+                    if self._transient_failures() != failures and not self.breaker.is_closed():
+                        # The cluster went away again; keep the write for the next drain
+                        with self._lock:
+                            self._pending_writes.appendleft(entry)
+                        return
+            finally:
+                self._local.draining = False
+
+    # Circuit breaker
+
+    def _transient_failures(self):
+        """Timeouts and refused calls seen so far on this thread"""
+        return getattr(self._local, 'transient_failures', 0)
+
+    def _notify(self, show, message):
+        """Show a message on the page; drained writes and background threads have none, so log it"""
+        outside_page = get_script_run_ctx and get_script_run_ctx(suppress_warning=True) is None
+        if getattr(self._local, 'draining', False) or outside_page:
+            logger.warning(message)
+        else:
+            show(message)
+
+    def _report_error(self, error, message):
+        """Show an error; timeouts and lost connections count against the breaker instead"""
+        if not is_transient(error):
+            self._notify(st.error, f"{message}: {str(error)}")
+            return
+        self._local.transient_failures = self._transient_failures() + 1
+        self._local.last_transient = message
+        self.metrics.increment('timeouts' if getattr(error, 'timeout', False) else 'connection_errors')
+        self.breaker.record_failure()
+        print(f"{message}: {str(error)}")
+
+    def _probe_soon(self):
+        """While the breaker is open, ping the cluster once the reset time has passed"""
+        if self.breaker.is_closed() or not self._connected.is_set():
+            return
+        if self.breaker.allow():
+            self._get_executor().submit(self._probe)
+
+    def _probe(self):
+        try:
+            with pymongo.timeout(LATENCY_BUDGETS['read']):
+                self.client.admin.command('ping')
+            self.breaker.record_success()
+        except Exception as e:
+            self.breaker.record_failure()
+            print(f"Database still unavailable: {str(e)}")
+
+    def _on_breaker_closed(self):
+        # Writes queued while the cluster was unhealthy go out now
+        if self.readiness['state'] == 'ready':
+            self._get_executor().submit(self._drain_pending_writes)
+
+    def health(self):
+        """Circuit breaker state, queued writes and operation metrics"""
+        self._probe_soon()
+        return dict(self.metrics.snapshot(), breaker=self.breaker.snapshot(),
+                    pending_writes=self.pending_write_count())
+
+    def is_ready(self):
+        """Cached readiness; a failed check is retried after a pause"""
+        if (self.readiness['state'] == 'failed'
+                and time.time() - self.readiness['checked_at'] > READINESS_RETRY_SECONDS):
+            self._start_verification()
+        return self.readiness['state'] == 'ready'
+
+    def pending_write_count(self):
+        return len(self._pending_writes)
+
+    def wait_until_ready(self, timeout=30):
+        """Block until the database is verified; for scripts and CLIs"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.readiness['state'] == 'ready':
+                return self
+            if self.readiness['state'] == 'failed':
+                break
+            time.sleep(0.1)
+        raise RuntimeError(f"Database not ready: {self.readiness['error'] or 'timed out'}")
+
+    def _wait_for_client(self):
+        if not self._connected.wait(timeout=30) or self._db is None:
+            raise DatabaseUnavailable(f"Database unavailable: {self.readiness['error'] or 'still connecting'}")
+
+    @property
+    def client(self):
+        self._wait_for_client()
+        return self._client
+
+    @property
+    def db(self):
+        self._wait_for_client()
+        return self._db
+
+    @property
+    def fs(self):
+        self._wait_for_client()
+        return self._fs
+
+    def ensure_indexes(self):
+        """Create the indexes used by application and document lookups"""
+        self.db.applications.create_index([('application_number', ASCENDING)])
+        self.db.fs.files.create_index([('metadata.application_number', ASCENDING)])
+        self.db.fs.files.create_index([('metadata.sidecar_of', ASCENDING)], sparse=True)
+        ensure_search_indexes(self.db)
+        ensure_blocking_indexes(self.db)
+        ensure_summary_indexes(self.db)
+        self.db.status_events.create_index([('application_number', ASCENDING), ('timestamp', ASCENDING)])
+
+    def refresh_blocking_keys(self, application_data):
+        """
+        Recompute duplicate-detection keys off the request thread.
+
+        Refreshes of one application run one after another, never side by
+        side: the latest data waiting for an application replaces any older
+        one, and a single task per application writes them in order.
+        """
+        application_number = application_data.get('application_number')
+        if not application_number:
+            return
+        with self._blocking_lock:
+            self._blocking_pending[application_number] = application_data
+            if application_number in self._blocking_running:
+                # The running task picks the new data up when it finishes
+                return
+            self._blocking_running.add(application_number)
+
+        def run():
+            while True:
+                with self._blocking_lock:
+                    data = self._blocking_pending.pop(application_number, None)
+                    if data is None:
+                        self._blocking_running.discard(application_number)
+                        return
+                try:
+                    save_blocking_keys(self.db, data)
+                except Exception as e:
+                    print(f"Error saving blocking keys: {str(e)}")
+        self._get_executor().submit(run)
+
+    @guarded('read', fallback=list)
+    def get_related_applications(self, application_number):
+        """Applications sharing identifiers or a similar name with this one"""
+        try:
+            return find_related_applications(self.db, application_number)
         except Exception as e:
-            error_msg = f"Database connection error: {str(e)}"
-            print(f"Detailed error: {error_msg}")
-            st.error("Failed to connect to database. Please contact support.")
-            raise e
-            
+            self._report_error(e, "Error checking for related applications")
+            return []
+
+    @queued_until_ready(_prepare_application)
+    @guarded('write')
     def save_application(self, application_data):
         """Save loan application data"""
         try:
+            if not application_data.get('application_number'):
+                # Queued before a number could be reserved; issue it now
+                from application_numbers import allocate_application_number
+                application_data['application_number'] = allocate_application_number(self)
+            application_data['search'] = build_search_keys(application_data)
+            application_data['typed'] = typed_fields(application_data)
+            self.refresh_blocking_keys(dict(application_data))
             if '_id' in application_data:
                 # If updating existing application
                 application_id = application_data.pop('_id')
+                # upsert: a save queued before the database was ready
+                # arrives here with an _id that was never inserted
                 result = self.db.applications.update_one(
                     {'_id': application_id},
-                    {'$set': application_data}
+                    {'$set': application_data},
+                    upsert=True
                 )
-                return result
             else:
                 # If new application
                 result = self.db.applications.insert_one(application_data)
-                return result
+                application_id = result.inserted_id
+            save_summary(self.db, application_id, application_data)
+            return result
         except Exception as e:
-            st.error(f"Error saving application: {str(e)}")
+            self._report_error(e, "Error saving application")
             return None
 
+    @queued_until_ready()
+    @guarded('write')
     def update_application(self, application_id, updated_data):
         """Update existing application"""
         try:
             if isinstance(application_id, str):
                 application_id = ObjectId(application_id)
+            if 'basic_info' in updated_data:
+                # Keep search keys in step with the fields they are built from
+                updated_data['search'] = build_search_keys(updated_data)
+                updated_data['typed'] = typed_fields(updated_data)
+                self.refresh_blocking_keys(dict(updated_data))
             result = self.db.applications.update_one(
                 {'_id': application_id},
                 {'$set': updated_data}
             )
+            save_summary(self.db, application_id, updated_data)
             return result
         except Exception as e:
-            st.error(f"Error updating application: {str(e)}")
+            self._report_error(e, "Error updating application")
+            return None
+
+    @queued_until_ready(_prepare_statuses)
+    @guarded('write', fallback=0)
+    def update_statuses(self, applications, status, remarks="", changed_by="Bank Official"):
+        """
+        Move many applications to a new status in a fixed number of round trips.
+
+        Each transition is appended to the status_events log first; the
+        application and summary rows are then brought in line with one
+        bulk_write each. An application only takes the new status if no
+        later event has already been applied to it.
+
+        Args:
+        applications (list): Dicts with '_id', 'application_number' and current 'status'
+        status (str): The new status
+        remarks (str): Remarks recorded with every transition
+        changed_by (str): Who made the change
+
+        Returns:
+        int: Number of applications updated
+        """
+        try:
+            if not applications:
+                return 0
+            now = datetime.now()
+            self.db.status_events.insert_many([
+                {
+                    'application_id': app['_id'],
+                    'application_number': app.get('application_number'),
+                    'from_status': app.get('status'),
+                    'status': status,
+                    'remarks': remarks,
+                    'changed_by': changed_by,
+                    'timestamp': now
+                }
+                for app in applications
+            ], ordered=False)
+
+            update = {'status': status, 'remarks': remarks, 'last_updated': now, 'status_changed_at': now}
+            stale = {'$or': [{'status_changed_at': {'$exists': False}}, {'status_changed_at': {'$lt': now}}]}
+            result = self.db.applications.bulk_write([
+                UpdateOne(dict(stale, _id=app['_id']), {'$set': update})
+                for app in applications
+            ], ordered=False)
+            self.db.application_summaries.bulk_write([
+                UpdateOne(dict(stale, _id=app['_id']), {'$set': update})
+                for app in applications
+            ], ordered=False)
+            return result.modified_count
+        except Exception as e:
+            self._report_error(e, "Error updating status")
+            return 0
+
+    def reserve_counter_block(self, name, size):
+        """
+        Reserve size consecutive values of a named counter; returns the first.
+
+        Returns None while the database is not ready or the breaker is open:
+        the caller needs the value now, so the write cannot be queued.
+        """
+        if not (self.is_ready() and self.breaker.is_closed()):
+            self._probe_soon()
             return None
+        return self._reserve_counter_block(name, size)
 
+    @guarded('write')
+    def _reserve_counter_block(self, name, size):
+        try:
+            counter = self.db.counters.find_one_and_update(
+                {'_id': name},
+                {'$inc': {'next': size}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return counter['next'] - size + 1
+        except Exception as e:
+            self._report_error(e, "Error issuing an application number")
+            return None
+
+    @guarded('read', fallback=list)
+    def get_status_events(self, application_number):
+        """Status history of an application, newest first"""
+        try:
+            return list(self.db.status_events.find(
+                {'application_number': application_number},
+                {'_id': 0, 'from_status': 1, 'status': 1, 'remarks': 1, 'changed_by': 1, 'timestamp': 1}
+            ).sort('timestamp', DESCENDING))
+        except Exception as e:
+            self._report_error(e, "Error retrieving status history")
+            return []
+
+    @guarded('read')
     def get_application(self, criteria):
         """Retrieve specific application"""
         try:
@@ -104,39 +585,264 @@ class Database:
                 criteria = {'_id': ObjectId(str(criteria))}
             return self.db.applications.find_one(criteria)
         except Exception as e:
-            st.error(f"Error retrieving application: {str(e)}")
+            self._report_error(e, "Error retrieving application")
             return None
 
+    @guarded('read', fallback=list)
+    def get_application_summaries(self, criteria=None, limit=0):
+        """Retrieve rows from the narrow application_summaries collection"""
+        try:
+            return list(self.db.application_summaries.find(criteria or {}).sort('_id', -1).limit(limit))
+        except Exception as e:
+            self._report_error(e, "Error retrieving application summaries")
+            return []
+
+    @guarded('read', fallback=list)
+    def get_status_counts(self, group_by='status'):
+        """Count applications per status (or per branch, state, ...) from the summaries"""
+        try:
+            return list(self.db.application_summaries.aggregate([
+                {'$group': {'_id': f'${group_by}', 'count': {'$sum': 1}, 'total_proposed_paise': {'$sum': '$total_proposed_paise'}}},
+                {'$sort': {'count': -1}}
+            ]))
+        except Exception as e:
+            self._report_error(e, "Error counting applications")
+            return []
+
+    @guarded('search', fallback=list)
     def get_all_applications(self):
         """Retrieve all applications"""
         try:
             return list(self.db.applications.find())
         except Exception as e:
-            st.error(f"Error retrieving applications: {str(e)}")
+            self._report_error(e, "Error retrieving applications")
             return []
 
+    def iter_application_batches(self, criteria=None, projection=None, batch_size=500, after_id=None,
+                                 collection='applications'):
+        """
+        Stream applications in _id order, one list per batch.
+
+        Args:
+        criteria (dict): Filter on the applications collection
+        projection (dict): Fields to return
+        batch_size (int): Documents per batch (and per cursor round trip)
+        after_id (ObjectId): Resume after this _id
+        collection (str): 'applications' or 'application_summaries'
+        """
+        query = dict(criteria or {})
+        if after_id is not None:
+            query['_id'] = {'$gt': after_id}
+        cursor = self.db[collection].find(query, projection).sort('_id', ASCENDING).batch_size(batch_size)
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def rebuild_summaries(self, batch_size=500):
+        return rebuild_summaries(self, batch_size)
+
+    def get_migration_checkpoint(self, name):
+        return self.db.migrations.find_one({'_id': name})
+
+    def save_migration_checkpoint(self, name, fields):
+        self.db.migrations.update_one({'_id': name}, {'$set': fields}, upsert=True)
+
+    def record_migration_batch(self, record):
+        self.db.migration_batches.insert_one(record)
+
+    def apply_migration(self, migrate, documents, dry_run=False):
+        requests = {}
+        for document in documents:
+            for target, ops in migrate(self, document, dry_run).items():
+                requests.setdefault(target, []).extend(ops)
+        if not dry_run:
+            for target, ops in requests.items():
+                # Blocking keys are deleted before they are re-inserted
+                self.db[target].bulk_write(ops, ordered=target == 'blocking_keys')
+        return sum(len(ops) for ops in requests.values())
+
+    @queued_until_ready(_prepare_document)
+    @guarded('file', retry=False)
     def save_document(self, file_data, metadata):
         """Save uploaded document to GridFS"""
         try:
             if not metadata.get('application_number'):
                 metadata['application_number'] = st.session_state.get('application_number')
-                
+            prepared = prepare_document(file_data, metadata)
+
+            # Stream the buffer to GridFS chunk by chunk
             file_id = self.fs.put(
-                file_data,
-                filename=metadata['filename'],
+                BufferReader(prepared['data']),
+                _id=metadata.get('file_id') or ObjectId(),
+                filename=prepared['filename'],
+                metadata=prepared['metadata']
+            )
+
+            for kind, data, filename, content_type in prepared['sidecars']:
+                self.save_sidecar(file_id, kind, data, filename, content_type, metadata['application_number'])
+            return file_id
+        except Exception as e:
+            self._report_error(e, "Error saving document")
+            return None
+
+    def save_documents(self, items):
+        """
+        Save several uploaded documents in one pass.
+
+        The chunks of every document and sidecar go to fs.chunks in one
+        insert_many and their fs.files entries in a second, so a bundle
+        costs two round trips however many files it holds. Files only
+        become visible once their entry is written; chunks left by a
+        failure in between are collected by storage_gc.py.
+
+        Returns:
+        list: The new file ids, None for any that failed
+        """
+        if not (self.is_ready() and self.breaker.is_closed()):
+            # Queued one document at a time until the database is back
+            return super().save_documents(items)
+        return self._insert_documents(items)
+
+    def _gridfs_entries(self, file_id, data, filename, metadata):
+        """The fs.files entry and fs.chunks documents GridFS would write for a file"""
+        data = memoryview(data)
+        chunks = [
+            {'files_id': file_id, 'n': n, 'data': Binary(bytes(data[start:start + DEFAULT_CHUNK_SIZE]))}
+            for n, start in enumerate(range(0, len(data), DEFAULT_CHUNK_SIZE))
+        ]
+        entry = {
+            '_id': file_id,
+            'length': len(data),
+            'chunkSize': DEFAULT_CHUNK_SIZE,
+            'uploadDate': datetime.utcnow(),
+            'filename': filename,
+            'metadata': metadata
+        }
+        return entry, chunks
+
+    @guarded('file', fallback=list, retry=False)
+    def _insert_documents(self, items):
+        try:
+            file_ids, entries, chunks = [], [], []
+            for file_data, metadata in items:
+                if not metadata.get('application_number'):
+                    metadata['application_number'] = st.session_state.get('application_number')
+                prepared = prepare_document(file_data, metadata)
+                file_id = metadata.get('file_id') or ObjectId()
+                file_ids.append(file_id)
+                entry, file_chunks = self._gridfs_entries(file_id, prepared['data'], prepared['filename'],
+                                                          prepared['metadata'])
+                entries.append(entry)
+                chunks += file_chunks
+                for kind, data, filename, content_type in prepared['sidecars']:
+                    entry, file_chunks = self._gridfs_entries(ObjectId(), data, filename, {
+                        'application_number': metadata['application_number'],
+                        'sidecar_of': file_id,
+                        'sidecar_kind': kind,
+                        'upload_date': datetime.now(),
+                        'content_type': content_type
+                    })
+                    entries.append(entry)
+                    chunks += file_chunks
+
+            if chunks:
+                self.db.fs.chunks.insert_many(chunks, ordered=False)
+            if entries:
+                self.db.fs.files.insert_many(entries, ordered=False)
+            return file_ids
+        except Exception as e:
+            self._report_error(e, "Error saving documents")
+            return [None] * len(items)
+
+    @queued_until_ready()
+    @guarded('file', retry=False)
+    def save_sidecar(self, file_id, kind, data, filename, content_type, application_number):
+        """Store a file derived from a document (preview, original) linked by its id"""
+        try:
+            return self.fs.put(
+                BufferReader(data),
+                filename=filename,
                 metadata={
-                    'application_number': metadata['application_number'],
-                    'document_type': metadata['document_type'],
-                    'section': metadata.get('section', 'Other'),
+                    'application_number': application_number,
+                    'sidecar_of': file_id,
+                    'sidecar_kind': kind,
                     'upload_date': datetime.now(),
-                    'content_type': metadata['content_type']
+                    'content_type': content_type
                 }
             )
+        except Exception as e:
+            # A missing sidecar must never fail the upload itself
+            if is_transient(e):
+                self._report_error(e, f"Error saving {kind} for {file_id}")
+            else:
+                print(f"Error saving {kind} for {file_id}: {str(e)}")
+            return None
+
+    @guarded('file', fallback=dict)
+    def get_document_previews(self, application_number):
+        """Get preview thumbnails for an application, keyed by document file id"""
+        try:
+            previews = {}
+            for grid_out in self.fs.find({
+                "metadata.application_number": application_number,
+                "metadata.sidecar_kind": "preview"
+            }):
+                previews[grid_out.metadata['sidecar_of']] = grid_out.read()
+            return previews
+        except Exception as e:
+            self._report_error(e, "Error retrieving previews")
+            return {}
+
+    @guarded('file')
+    def get_rendered_file(self, application_number, kind, version):
+        """Get a file rendered from an application at a given version, if cached"""
+        try:
+            grid_out = self.fs.find_one({
+                "metadata.application_number": application_number,
+                "metadata.sidecar_kind": kind,
+                "metadata.version": version
+            })
+            return grid_out.read() if grid_out else None
+        except Exception as e:
+            self._report_error(e, f"Error retrieving {kind}")
+            return None
+
+    @queued_until_ready()
+    @guarded('file', retry=False)
+    def save_rendered_file(self, application_number, kind, version, data, filename, content_type):
+        """Cache a file rendered from an application, dropping its older versions"""
+        try:
+            file_id = self.fs.put(
+                BufferReader(data),
+                filename=filename,
+                metadata={
+                    'application_number': application_number,
+                    'sidecar_kind': kind,
+                    'version': version,
+                    'upload_date': datetime.now(),
+                    'content_type': content_type
+                }
+            )
+            self.delete_files([doc['_id'] for doc in self.db.fs.files.find({
+                "metadata.application_number": application_number,
+                "metadata.sidecar_kind": kind,
+                "_id": {"$ne": file_id}
+            }, {'_id': 1})])
             return file_id
         except Exception as e:
-            st.error(f"Error saving document: {str(e)}")
+            # The file is rendered again on the next request
+            if is_transient(e):
+                self._report_error(e, f"Error saving {kind} for {application_number}")
+            else:
+                print(f"Error saving {kind} for {application_number}: {str(e)}")
             return None
 
+    @guarded('file')
     def get_document(self, file_id):
         """Retrieve document from GridFS"""
         try:
@@ -144,14 +850,19 @@ class Database:
                 file_id = ObjectId(file_id)
             return self.fs.get(file_id)
         except Exception as e:
-            st.error(f"Error retrieving document: {str(e)}")
+            self._report_error(e, "Error retrieving document")
             return None
 
-    def get_application_documents(self, application_number):
+    @guarded('file', fallback=list)
+    def get_application_documents(self, application_number, include_data=True):
         """Get all documents for an application"""
         try:
             documents = []
-            for grid_out in self.fs.find({"metadata.application_number": application_number}):
+            for grid_out in self.fs.find({
+                "metadata.application_number": application_number,
+                # Sidecars and rendered files are not uploads
+                "metadata.sidecar_kind": {"$exists": False}
+            }):
                 doc_data = {
                     'file_id': grid_out._id,
                     'filename': grid_out.filename,
@@ -159,12 +870,15 @@ class Database:
                     'section': grid_out.metadata.get('section'),
                     'upload_date': grid_out.metadata.get('upload_date'),
                     'content_type': grid_out.metadata.get('content_type'),
-                    'data': grid_out.read()
+                    'length': grid_out.length,
+                    'compression': grid_out.metadata.get('compression')
                 }
+                if include_data:
+                    doc_data['data'] = grid_out.read()
                 documents.append(doc_data)
             return documents
         except Exception as e:
-            st.error(f"Error retrieving documents: {str(e)}")
+            self._report_error(e, "Error retrieving documents")
             return []
 
     def get_documents(self, application_id):
@@ -177,32 +891,95 @@ class Database:
                 return self.get_application_documents(application['application_number'])
             return []
         except Exception as e:
-            st.error(f"Error retrieving documents: {str(e)}")
+            self._report_error(e, "Error retrieving documents")
             return []
 
+    @guarded('search', fallback=list)
     def search_applications(self, criteria):
         """Search applications based on various criteria"""
         try:
             return list(self.db.applications.find(criteria))
         except Exception as e:
-            st.error(f"Error searching applications: {str(e)}")
+            self._report_error(e, "Error searching applications")
             return []
 
+    @guarded('search', fallback=lambda: ([], 0))
+    def search_text(self, query, page=0, page_size=20):
+        """Ranked search by application number, name, PAN, GSTIN, Udyam or mobile"""
+        try:
+            return search_applications(self.db, query, page, page_size,
+                                       text_search=self.backend != 'memory')
+        except Exception as e:
+            self._report_error(e, "Error searching applications")
+            return [], 0
+
+    @guarded('write')
     def delete_application(self, application_id):
-        """Delete an application and its documents"""
+        """
+        Delete an application, its status history and its documents.
+
+        Returns:
+        DeleteResult: deleted_count is 0 if there was no such application;
+            None if the delete failed
+        """
         try:
             if isinstance(application_id, str):
                 application_id = ObjectId(application_id)
-            # Get application number first
-            application = self.get_application({'_id': application_id})
+            # Only the application number is needed, not the whole document
+            application = self.db.applications.find_one({'_id': application_id}, {'application_number': 1})
             if application and 'application_number' in application:
-                # Delete all associated documents
-                for doc in self.get_application_documents(application['application_number']):
-                    self.fs.delete(doc['file_id'])
-                # Delete the application
+                # Delete the application first: if we stop midway, what is
+                # left behind is unowned files the storage sweeper collects
                 result = self.db.applications.delete_one({'_id': application_id})
+                self.db.blocking_keys.delete_many({'application_number': application['application_number']})
+                self.db.application_summaries.delete_one({'_id': application_id})
+                self.db.status_events.delete_many({'application_number': application['application_number']})
+                self.delete_application_files(application['application_number'])
                 return result
-            return None
+            # Nothing to cascade to
+            return self.db.applications.delete_one({'_id': application_id})
         except Exception as e:
-            st.error(f"Error deleting application: {str(e)}")
+            self._report_error(e, "Error deleting application")
             return None
+
+    def delete_application_files(self, application_number):
+        """Delete all documents and sidecars of an application by id only"""
+        file_ids = [
+            doc['_id'] for doc in
+            self.db.fs.files.find({"metadata.application_number": application_number}, {'_id': 1})
+        ]
+        return self.delete_files(file_ids)
+
+    def delete_files(self, file_ids):
+        """
+        Bulk remove GridFS files and their chunks.
+
+        Args:
+        file_ids (list): ObjectIds of fs.files entries
+
+        Returns:
+        int: Number of fs.files entries removed
+        """
+        deleted = 0
+        for start in range(0, len(file_ids), DELETE_BATCH_SIZE):
+            batch = file_ids[start:start + DELETE_BATCH_SIZE]
+            # Chunks go first so an interrupted delete leaves a visible
+            # fs.files entry rather than chunks nothing points at
+            self.db.fs.chunks.delete_many({'files_id': {'$in': batch}})
+            deleted += self.db.fs.files.delete_many({'_id': {'$in': batch}}).deleted_count
+        return deleted
+
+_database = None
+_database_lock = threading.Lock()
+
+def get_database():
+    """The process-wide Database, created on first use and shared across reruns"""
+    global _database
+    with _database_lock:
+        if _database is None:
+            if DB_BACKEND == 'embedded':
+                from embedded_store import EmbeddedDatabase
+                _database = EmbeddedDatabase()
+            else:
+                _database = Database()
+        return _database
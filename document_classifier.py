@@ -0,0 +1,166 @@
+# document_classifier.py
+
+import re
+import logging
+import pytesseract
+import fitz  # PyMuPDF
+from PIL import Image, ImageOps
+from upload_buffers import BufferReader
+
+logger = logging.getLogger(__name__)
+
+# Signals per document type: (regex on upper-cased text, weight)
+DOCUMENT_SIGNALS = {
+    "Udyam Certificate": [
+        (r'UDYAM REGISTRATION', 3),
+        (r'UDYAM-[A-Z]{2}-\d{2}-\d{7}', 4),
+        (r'MICRO,? SMALL AND MEDIUM', 2),
+        (r'NATIONAL INDUSTRY', 1),
+    ],
+    "GST Certificate": [
+        (r'GOODS AND SERVICES TAX', 3),
+        (r'FORM GST REG-?06', 4),
+        (r'\b\d{2}[A-Z]{5}\d{4}[A-Z]\dZ[A-Z\d]\b', 2),
+        (r'LEGAL NAME OF BUSINESS', 2),
+    ],
+    "PAN Card": [
+        (r'INCOME TAX DEPARTMENT', 3),
+        (r'PERMANENT ACCOUNT NUMBER', 4),
+        (r'\b[A-Z]{5}\d{4}[A-Z]\b', 1),
+    ],
+    "Aadhaar Card": [
+        (r'AADHAAR', 3),
+        (r'UNIQUE IDENTIFICATION AUTHORITY', 4),
+        (r'\b\d{4}\s\d{4}\s\d{4}\b', 2),
+        (r'\bVID\b', 1),
+    ],
+    "Bank Statement": [
+        (r'STATEMENT OF ACCOUNT', 3),
+        (r'\bIFSC\b', 2),
+        (r'OPENING BALANCE|CLOSING BALANCE', 2),
+        (r'WITHDRAWAL|DEPOSIT|\bDEBIT\b|\bCREDIT\b', 1),
+    ],
+}
+
+# Score at which a classification is taken at face value
+CONFIDENT_SCORE = 4
+# Header crop for image OCR: top fraction of the page, downscaled to this width
+HEADER_FRACTION = 0.4
+HEADER_WIDTH = 1000
+
+# Layout groups, told apart by an image's proportions alone
+LAYOUT_GROUPS = {
+    "PAN Card": 'card',
+    "Aadhaar Card": 'card',
+    "Udyam Certificate": 'page',
+    "GST Certificate": 'page',
+    "Bank Statement": 'page'
+}
+# Landscape long/short side ratio of an ID-1 card (85.6 x 54 mm) scan
+CARD_RATIO = (1.45, 1.72)
+# Portrait ratio of an A4 or Letter page scan
+PAGE_RATIO = (1.25, 1.5)
+# EXIF orientations that turn the image by 90 degrees
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+def _pdf_header_text(buffer):
+    """Text layer of page 1, or a low resolution OCR of its top when scanned"""
+    pdf = fitz.open(stream=buffer, filetype="pdf")
+    if pdf.page_count == 0:
+        return ""
+    page = pdf[0]
+    text = page.get_text()
+    if text.strip():
+        return text
+    clip = fitz.Rect(0, 0, page.rect.width, page.rect.height * HEADER_FRACTION)
+    zoom = HEADER_WIDTH / page.rect.width
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, colorspace=fitz.csGRAY)
+    image = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    return pytesseract.image_to_string(image, config="--psm 6")
+
+def _image_header_text(buffer):
+    """Low resolution OCR of the top of an image"""
+    image = Image.open(BufferReader(buffer))
+    image.draft("L", (HEADER_WIDTH, HEADER_WIDTH))
+    image = ImageOps.exif_transpose(image).convert("L")
+    if image.width > HEADER_WIDTH:
+        image = image.resize((HEADER_WIDTH, int(image.height * HEADER_WIDTH / image.width)))
+    header = image.crop((0, 0, image.width, int(image.height * HEADER_FRACTION)))
+    return pytesseract.image_to_string(header, config="--psm 6")
+
+def layout_group(buffer, content_type):
+    """
+    'card' or 'page' from an image's proportions, or None when they fit neither.
+
+    Only the image header is read; nothing is decoded.
+    """
+    if not content_type or not content_type.startswith('image'):
+        return None
+    image = Image.open(BufferReader(buffer))
+    width, height = image.size
+    if image.getexif().get(0x0112) in ROTATED_ORIENTATIONS:
+        width, height = height, width
+    ratio = max(width, height) / max(1, min(width, height))
+    if width > height and CARD_RATIO[0] <= ratio <= CARD_RATIO[1]:
+        return 'card'
+    if height > width and PAGE_RATIO[0] <= ratio <= PAGE_RATIO[1]:
+        return 'page'
+    return None
+
+def layout_fits(buffer, content_type, document_type):
+    """Whether an image is shaped like the expected document type; False when unsure"""
+    try:
+        group = layout_group(buffer, content_type)
+    except Exception as e:
+        logger.warning(f"Could not read image size: {str(e)}")
+        return False
+    return group is not None and group == LAYOUT_GROUPS.get(document_type)
+
+def score_text(text):
+    """Signal score of each document type for a piece of text"""
+    upper = text.upper()
+    return {
+        document_type: sum(weight for pattern, weight in signals if re.search(pattern, upper))
+        for document_type, signals in DOCUMENT_SIGNALS.items()
+    }
+
+def classify_document(buffer, content_type):
+    """
+    Fingerprint a document before full extraction.
+
+    Args:
+    buffer (memoryview): The upload buffer
+    content_type (str): MIME type of the upload
+
+    Returns:
+    tuple: (document type or None, confidence between 0 and 1)
+    """
+    try:
+        if content_type == 'application/pdf':
+            text = _pdf_header_text(buffer)
+        elif content_type and content_type.startswith('image'):
+            text = _image_header_text(buffer)
+        else:
+            return None, 0.0
+    except Exception as e:
+        logger.warning(f"Could not classify document: {str(e)}")
+        return None, 0.0
+    return classify_text(text)
+
+def classify_text(text):
+    """
+    Classify a document from text already read from it, e.g. the extraction's OCR.
+
+    Returns:
+    tuple: (document type or None, confidence between 0 and 1)
+    """
+    scores = score_text(text)
+    best_type = max(scores, key=scores.get)
+    best = scores[best_type]
+    if best == 0:
+        return None, 0.0
+    runner_up = max(score for document_type, score in scores.items() if document_type != best_type)
+    # Strong and unambiguous signals give high confidence
+    confidence = min(1.0, best / CONFIDENT_SCORE) * (best - runner_up) / best
+    logger.info(f"Classified document as {best_type} ({confidence:.2f}): {scores}")
+    return best_type, round(confidence, 2)
@@ -0,0 +1,131 @@
+# document_compression.py
+
+import io
+import os
+import time
+import logging
+import fitz  # PyMuPDF
+from PIL import Image, ImageOps
+from upload_buffers import BufferReader
+
+logger = logging.getLogger(__name__)
+
+# Ingest compression can be switched off with DOCUMENT_COMPRESSION=off
+COMPRESSION_ENABLED = os.environ.get("DOCUMENT_COMPRESSION", "on").lower() != "off"
+
+# Photos and scans are resized so that their longest edge fits this size
+IMAGE_MAX_SIZE = int(os.environ.get("DOCUMENT_IMAGE_MAX_SIZE", "2000"))
+IMAGE_QUALITY = int(os.environ.get("DOCUMENT_IMAGE_QUALITY", "75"))
+
+# Images embedded in PDFs above this resolution are downsampled to it
+PDF_IMAGE_TARGET_DPI = int(os.environ.get("DOCUMENT_PDF_IMAGE_DPI", "150"))
+
+# Document types whose original upload must be retained as well,
+# e.g. DOCUMENT_KEEP_ORIGINAL="Sanction Letter,Bank Statement"
+KEEP_ORIGINAL_DOCUMENT_TYPES = {
+    doc_type.strip()
+    for doc_type in os.environ.get("DOCUMENT_KEEP_ORIGINAL", "").split(",")
+    if doc_type.strip()
+}
+
+def keep_original(document_type):
+    """Whether policy requires the original upload to be stored"""
+    return document_type in KEEP_ORIGINAL_DOCUMENT_TYPES
+
+def _encode_jpeg(image):
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
+def compress_image(file_data):
+    """Resize and re-encode a photo or scanned image as JPEG"""
+    image = Image.open(BufferReader(file_data))
+    # Let the JPEG decoder downscale while decoding
+    image.draft("RGB", (IMAGE_MAX_SIZE, IMAGE_MAX_SIZE))
+    # Phone photos carry their rotation in EXIF only
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((IMAGE_MAX_SIZE, IMAGE_MAX_SIZE), Image.LANCZOS)
+    return _encode_jpeg(image), "image/jpeg"
+
+def compress_pdf(file_data):
+    """Downsample embedded images and rewrite a PDF with deflate streams"""
+    pdf = fitz.open(stream=file_data, filetype="pdf")
+    done = set()
+    for page in pdf:
+        for image_info in page.get_images(full=True):
+            xref, smask = image_info[0], image_info[1]
+            # Images with transparency masks are left untouched
+            if xref in done or smask:
+                continue
+            done.add(xref)
+
+            rects = page.get_image_rects(xref)
+            if not rects:
+                continue
+            # Effective resolution of the image as placed on the page
+            width_inches = max(rect.width for rect in rects) / 72
+            extracted = pdf.extract_image(xref)
+            if not extracted or width_inches <= 0:
+                continue
+            dpi = extracted["width"] / width_inches
+            if dpi <= PDF_IMAGE_TARGET_DPI:
+                continue
+
+            image = Image.open(io.BytesIO(extracted["image"])).convert("RGB")
+            scale = PDF_IMAGE_TARGET_DPI / dpi
+            image = image.resize(
+                (max(1, int(image.width * scale)), max(1, int(image.height * scale))),
+                Image.LANCZOS
+            )
+            page.replace_image(xref, stream=_encode_jpeg(image))
+
+    return pdf.tobytes(garbage=3, deflate=True, deflate_images=True, deflate_fonts=True), "application/pdf"
+
+def compress_document(file_data, content_type):
+    """
+    Recompress an uploaded document before it is stored.
+
+    Args:
+    file_data (bytes or memoryview): The uploaded file contents
+    content_type (str): MIME type of the upload
+
+    Returns:
+    tuple: (data, content_type, stats). The input is returned unchanged
+    when compression is disabled, unsupported or would not save space.
+    """
+    original_size = len(file_data)
+    stats = {
+        'method': None,
+        'original_size': original_size,
+        'stored_size': original_size,
+        'ratio': 1.0,
+        'seconds': 0.0
+    }
+    if not COMPRESSION_ENABLED:
+        return file_data, content_type, stats
+
+    start = time.perf_counter()
+    try:
+        if content_type == 'application/pdf':
+            data, new_type = compress_pdf(file_data)
+            stats['method'] = f"pdf-deflate-{PDF_IMAGE_TARGET_DPI}dpi"
+        elif content_type and content_type.startswith('image'):
+            data, new_type = compress_image(file_data)
+            stats['method'] = f"jpeg-q{IMAGE_QUALITY}-{IMAGE_MAX_SIZE}px"
+        else:
+            return file_data, content_type, stats
+    except Exception as e:
+        logger.warning(f"Could not compress document: {str(e)}")
+        return file_data, content_type, stats
+    finally:
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+
+    if len(data) >= original_size:
+        # Already compact; keep the upload as it is
+        stats['method'] = None
+        return file_data, content_type, stats
+
+    stats['stored_size'] = len(data)
+    stats['ratio'] = round(original_size / len(data), 2)
+    logger.info(f"Compressed document {original_size} -> {len(data)} bytes ({stats['ratio']}x) in {stats['seconds']}s")
+    return data, new_type, stats
@@ -1,9 +1,13 @@
 import re
-from datetime import datetime
 import pytesseract
 from PIL import Image
 import io
 import fitz  # PyMuPDF
+from upload_buffers import upload_buffer, BufferReader
+from field_types import parse_date
+from amounts import parse_amounts
+from document_classifier import classify_document, classify_text, layout_fits
+from ocr_profiles import extract_with_profile, OCR_PROFILES
 from fuzzywuzzy import fuzz
 from fuzzywuzzy import process
 import logging
@@ -27,13 +31,16 @@ GST_STATE_CODES = {
 
 }
 
+# Classifications at or above this confidence override the caller's document type
+MISMATCH_CONFIDENCE = 0.6
+
 # Utility functions
-def extract_text_from_image(file):
-    image = Image.open(file)
+def extract_text_from_image(buffer):
+    image = Image.open(BufferReader(buffer))
     return pytesseract.image_to_string(image)
 
-def extract_text_from_pdf(file):
-    pdf = fitz.open(stream=file.read(), filetype="pdf")
+def extract_text_from_pdf(buffer):
+    pdf = fitz.open(stream=buffer, filetype="pdf")
     text = ""
     for page in pdf:
         text += page.get_text()
@@ -60,11 +67,7 @@ def validate_gst(gst):
     return re.match(r'^\d{2}[A-Z]{5}\d{4}[A-Z]{1}\d[Z]{1}[A-Z\d]{1}$', gst) is not None
 
 def validate_date(date_string):
-    try:
-        datetime.strptime(date_string, "%d/%m/%Y")
-        return True
-    except ValueError:
-        return False
+    return parse_date(date_string) is not None
 
 # Extraction functions
 # Extraction functions
@@ -270,9 +273,18 @@ def extract_bank_data(text):
             logger.warning(f"Could not extract {key} from Bank Statement")
 
     # Extract credit facilities
-    credit_facilities = re.findall(r'(Cash Credit|Term Loan|LC/BG)\s*:\s*Rs\.\s*([\d,.]+)', cleaned_text, re.IGNORECASE)
+    credit_facilities = re.findall(
+        r'(Cash Credit|Term Loan|LC/BG)\s*:\s*Rs\.\s*([\d,.]+(?:\s*(?:lakhs?|lacs?|crores?|crs?)\b)?)',
+        cleaned_text, re.IGNORECASE
+    )
     if credit_facilities:
         data['credit_facilities'] = credit_facilities
+        # Limits in paise, the whole column converted at once
+        paise, invalid = parse_amounts([amount for _, amount in credit_facilities])
+        data['credit_facility_paise'] = [None if bad else int(value) for value, bad in zip(paise, invalid)]
+        for (facility, amount), bad in zip(credit_facilities, invalid):
+            if bad:
+                logger.warning(f"Could not read the {facility} amount '{amount}' from Bank Statement")
     else:
         logger.warning("Could not extract credit facilities from Bank Statement")
 
@@ -354,6 +366,7 @@ def map_extracted_data_to_form_fields(data, document_type):
             'account_number': 'account_number',
             'ifsc_code': 'ifsc_code',
             'credit_facilities': 'credit_facilities',
+            'credit_facility_paise': 'credit_facility_paise',
             'security': 'existing_security'
         }
     
@@ -363,29 +376,63 @@ def map_extracted_data_to_form_fields(data, document_type):
     
     return mapped_data
 
-def extract_data_from_document(file, document_type):
+EXTRACTION_FUNCTIONS = {
+    "Udyam Certificate": extract_udyam_data,
+    "GST Certificate": extract_gst_data,
+    "PAN Card": extract_pan_data,
+    "Aadhaar Card": extract_aadhaar_data,
+    "Bank Statement": extract_bank_data
+}
+
+def _type_mismatch(detected_type, confidence, document_type):
+    """The error returned for a document uploaded into the wrong slot, or None"""
+    if detected_type and detected_type != document_type and confidence >= MISMATCH_CONFIDENCE:
+        logger.warning(f"Expected {document_type} but document looks like {detected_type} ({confidence})")
+        return {
+            "error": f"This looks like a {detected_type}, not a {document_type}. Please upload it in the {detected_type} section.",
+            "detected_type": detected_type
+        }
+    return None
+
+def extract_data_from_document(file, document_type, check_type=True):
+    check_type = check_type and document_type in EXTRACTION_FUNCTIONS
     try:
-        if file.type.startswith('image'):
-            text = extract_text_from_image(file)
+        # Decode from the shared upload buffer rather than re-reading the file
+        buffer = upload_buffer(file)
+        is_image = file.type.startswith('image')
+
+        # Catch a document uploaded into the wrong slot before the full OCR and parse.
+        # Images whose full text is OCRed anyway are checked from that text below;
+        # cards read by region are only OCRed up front when their shape is off
+        if check_type and (not is_image or (document_type in OCR_PROFILES
+                                            and not layout_fits(buffer, file.type, document_type))):
+            mismatch = _type_mismatch(*classify_document(buffer, file.type), document_type)
+            if mismatch:
+                return mismatch
+
+        if is_image and document_type in OCR_PROFILES:
+            # Fixed-layout cards: OCR just the regions we need
+            profile_data = extract_with_profile(buffer, document_type)
+            if profile_data:
+                return map_extracted_data_to_form_fields(profile_data, document_type)
+
+        if is_image:
+            text = extract_text_from_image(buffer)
+            if check_type:
+                mismatch = _type_mismatch(*classify_text(text), document_type)
+                if mismatch:
+                    return mismatch
         elif file.type == 'application/pdf':
-            text = extract_text_from_pdf(file)
+            text = extract_text_from_pdf(buffer)
         else:
             return {"error": "Unsupported file format"}
     except Exception as e:
         logger.error(f"Error reading file: {str(e)}")
         return {"error": "Unable to read file"}
 
-    extraction_functions = {
-        "Udyam Certificate": extract_udyam_data,
-        "GST Certificate": extract_gst_data,
-        "PAN Card": extract_pan_data,
-        "Aadhaar Card": extract_aadhaar_data,
-        "Bank Statement": extract_bank_data
-    }
-
-    if document_type in extraction_functions:
+    if document_type in EXTRACTION_FUNCTIONS:
         try:
-            extracted_data = extraction_functions[document_type](text)
+            extracted_data = EXTRACTION_FUNCTIONS[document_type](text)
             logger.info(f"Successfully extracted data from {document_type}")
             
             mapped_data = map_extracted_data_to_form_fields(extracted_data, document_type)
@@ -0,0 +1,52 @@
+# document_previews.py
+
+import io
+import logging
+import fitz  # PyMuPDF
+from PIL import Image
+from upload_buffers import BufferReader
+
+logger = logging.getLogger(__name__)
+
+# Longest edge of a preview thumbnail, in pixels
+PREVIEW_MAX_SIZE = 320
+PREVIEW_FORMAT = "WEBP"
+PREVIEW_CONTENT_TYPE = "image/webp"
+PREVIEW_QUALITY = 70
+
+def render_preview(file_data, content_type):
+    """
+    Render a small thumbnail of the first page of a document.
+
+    Args:
+    file_data (bytes or memoryview): The stored file contents
+    content_type (str): MIME type of the upload
+
+    Returns:
+    bytes: WebP encoded thumbnail, or None if no preview can be made
+    """
+    try:
+        if content_type == 'application/pdf':
+            pdf = fitz.open(stream=file_data, filetype="pdf")
+            if pdf.page_count == 0:
+                return None
+            page = pdf[0]
+            # Rasterise page 1 directly at thumbnail size
+            zoom = PREVIEW_MAX_SIZE / max(page.rect.width, page.rect.height)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        elif content_type and content_type.startswith('image'):
+            image = Image.open(BufferReader(file_data))
+            # Let the JPEG decoder downscale while decoding
+            image.draft("RGB", (PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE))
+            image = image.convert("RGB")
+        else:
+            return None
+
+        image.thumbnail((PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE))
+        output = io.BytesIO()
+        image.save(output, format=PREVIEW_FORMAT, quality=PREVIEW_QUALITY)
+        return output.getvalue()
+    except Exception as e:
+        logger.warning(f"Could not render preview: {str(e)}")
+        return None
@@ -0,0 +1,183 @@
+# duplicate_detection.py
+
+import os
+import re
+import hmac
+import hashlib
+from pymongo import ASCENDING, DeleteMany, InsertOne
+from application_search import normalize_identifier, normalize_mobile, normalize_name, pan_from_gstin
+
+# Words too common in business names to make a useful block
+GENERIC_NAME_WORDS = {
+    'traders', 'trading', 'enterprises', 'enterprise', 'industries', 'industry',
+    'services', 'solutions', 'international', 'india', 'indian', 'agency',
+    'agencies', 'sons', 'brothers', 'group', 'store', 'stores', 'works',
+    'shree', 'shri', 'sri'
+}
+
+# Aadhaar numbers are only ever stored as an HMAC under this key; without
+# it they are left out of blocking altogether
+BLOCKING_KEY_SECRET = os.environ.get("MSME_BLOCKING_KEY_SECRET", "")
+
+# Identifier kinds whose blocking key is a keyed hash, not the value
+HASHED_KINDS = {'aadhaar'}
+
+# Minimum fuzzy score for two names in the same block to be flagged
+NAME_SIMILARITY_THRESHOLD = 85
+
+# Human readable labels for identifier blocks
+KEY_LABELS = {
+    'pan': "PAN",
+    'gstin': "GSTIN",
+    'udyam': "Udyam number",
+    'aadhaar': "Aadhaar",
+    'mobile': "mobile number"
+}
+
+def hash_identifier(value):
+    """HMAC-SHA256 of an identifier, or None when no secret is configured"""
+    if not BLOCKING_KEY_SECRET:
+        return None
+    return hmac.new(BLOCKING_KEY_SECRET.encode(), value.encode(), hashlib.sha256).hexdigest()
+
+def _name_blocks(name):
+    """Four-character prefixes of the distinctive words in a normalized name"""
+    return {
+        f"name:{word[:4]}" for word in name.split()
+        if len(word) >= 3 and word not in GENERIC_NAME_WORDS
+    }
+
+def build_blocking_keys(application_data):
+    """
+    Compute the blocking keys for an application.
+
+    Returns:
+    list: One entry per key with the role it was found under
+        (enterprise, director or guarantor) and the name it belongs to
+    """
+    basic_info = application_data.get('basic_info') or {}
+    form_data = application_data.get('form_data') or {}
+    enterprise_name = normalize_name(basic_info.get('enterprise_name'))
+    entries = []
+
+    def add(kind, value, role, name):
+        if value and kind in HASHED_KINDS:
+            value = hash_identifier(value)
+        if value:
+            entries.append({'key': f"{kind}:{value}", 'role': role, 'name': name})
+
+    add('pan', normalize_identifier(basic_info.get('pan')), 'enterprise', enterprise_name)
+    add('pan', pan_from_gstin(basic_info.get('gst_number')), 'enterprise', enterprise_name)
+    add('gstin', normalize_identifier(basic_info.get('gst_number')), 'enterprise', enterprise_name)
+    add('udyam', normalize_identifier(basic_info.get('udyam_number')), 'enterprise', enterprise_name)
+    add('mobile', normalize_mobile(basic_info.get('mobile')), 'enterprise', enterprise_name)
+    for key in _name_blocks(enterprise_name):
+        entries.append({'key': key, 'role': 'enterprise', 'name': enterprise_name})
+
+    for director in application_data.get('directors') or []:
+        name = normalize_name(director.get('name'))
+        add('pan', normalize_identifier(director.get('pan')), 'director', name)
+        add('aadhaar', re.sub(r'\D', '', str(director.get('aadhaar') or '')), 'director', name)
+
+    i = 0
+    while f'additional_guarantor_name_{i}' in form_data:
+        name = normalize_name(form_data.get(f'additional_guarantor_name_{i}'))
+        add('pan', normalize_identifier(form_data.get(f'additional_guarantor_pan_{i}')), 'guarantor', name)
+        add('aadhaar', re.sub(r'\D', '', str(form_data.get(f'additional_guarantor_aadhaar_{i}') or '')), 'guarantor', name)
+        i += 1
+
+    # The same key may come from the PAN and the GSTIN; keep one of each
+    unique = {}
+    for entry in entries:
+        unique.setdefault((entry['key'], entry['role']), entry)
+    return list(unique.values())
+
+def warn_if_unkeyed():
+    """Say at startup when Aadhaar numbers are left out of blocking"""
+    if not BLOCKING_KEY_SECRET:
+        print("MSME_BLOCKING_KEY_SECRET is not set; Aadhaar numbers are not used to detect duplicates")
+
+def ensure_blocking_indexes(db):
+    warn_if_unkeyed()
+    db.blocking_keys.create_index([('key', ASCENDING), ('application_number', ASCENDING)])
+    db.blocking_keys.create_index([('application_number', ASCENDING)])
+
+def save_blocking_keys(db, application_data):
+    """Replace an application's blocking keys in a single round trip"""
+    application_number = application_data.get('application_number')
+    if not application_number:
+        return
+    requests = [DeleteMany({'application_number': application_number})]
+    requests += [
+        InsertOne(dict(entry, application_number=application_number))
+        for entry in build_blocking_keys(application_data)
+    ]
+    db.blocking_keys.bulk_write(requests, ordered=True)
+
+def find_related_applications(db, application_number):
+    """
+    Find other applications sharing an identifier or a similar name.
+
+    Only applications in the same block are compared, so this never scans
+    the whole collection.
+
+    Returns:
+    list: Flags with the other application number, its status and the reason
+    """
+    own = list(db.blocking_keys.find({'application_number': application_number}))
+    if not own:
+        return []
+    others = db.blocking_keys.find({
+        'key': {'$in': list({entry['key'] for entry in own})},
+        'application_number': {'$ne': application_number}
+    })
+    flags = flag_related(own, others)
+
+    if flags:
+        # Show the other application's status so open duplicates stand out
+        numbers = list({flag['application_number'] for flag in flags})
+        statuses = {
+            app['application_number']: app.get('status')
+            for app in db.applications.find({'application_number': {'$in': numbers}}, {'application_number': 1, 'status': 1})
+        }
+        for flag in flags:
+            flag['status'] = statuses.get(flag['application_number'])
+    return flags
+
+def flag_related(own, others):
+    """
+    Compare an application's blocking keys with other applications' entries
+    under the same keys.
+
+    Returns:
+    list: Flags with the other application number and the reason, sorted
+    """
+    own_by_key = {}
+    for entry in own:
+        own_by_key.setdefault(entry['key'], []).append(entry)
+
+    from fuzzywuzzy import fuzz
+
+    flags = {}
+    for other in others:
+        kind, value = other['key'].split(':', 1)
+        for mine in own_by_key[other['key']]:
+            if kind == 'name':
+                if mine['role'] != 'enterprise' or other['role'] != 'enterprise':
+                    continue
+                score = fuzz.token_set_ratio(mine['name'], other['name'])
+                if score < NAME_SIMILARITY_THRESHOLD:
+                    continue
+                reason = f"Similar enterprise name '{other['name']}' ({score}% match)"
+            else:
+                # Hashed keys are matched but never shown
+                shown = '' if kind in HASHED_KINDS else f" {value}"
+                reason = (
+                    f"{KEY_LABELS.get(kind, kind)}{shown} of this {mine['role']} "
+                    f"appears as {other['role']} in another application"
+                )
+            flags.setdefault((other['application_number'], reason), {
+                'application_number': other['application_number'],
+                'reason': reason
+            })
+    return sorted(flags.values(), key=lambda flag: flag['application_number'])
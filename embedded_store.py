@@ -0,0 +1,785 @@
+# embedded_store.py
+
+import io
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import streamlit as st
+from bson import ObjectId, json_util
+from pymongo.results import InsertOneResult
+from application_search import (
+    build_search_keys, normalize_identifier, normalize_mobile, normalize_name, name_grams, gram_query,
+    identifier_score, paginate_ranked, CANDIDATE_LIMIT, NAME_MATCH_THRESHOLD, GRAM_SCAN_LIMIT
+)
+from duplicate_detection import build_blocking_keys, flag_related, warn_if_unkeyed
+from application_summaries import build_summary
+from field_types import typed_fields, parse_date
+from storage_backend import StorageBackend, prepare_document
+
+# Where the branch keeps its database and document files
+EMBEDDED_DIR = os.environ.get("MSME_EMBEDDED_DIR", "msme_local_store")
+
+# Seconds a writer waits for another writer before giving up
+SQLITE_BUSY_TIMEOUT = 10
+
+# Fields only status transitions change; replicated with a staleness check
+STATUS_FIELDS = ('status', 'remarks', 'status_changed_at')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS applications (
+    id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    synced_at REAL
+);
+CREATE INDEX IF NOT EXISTS applications_number
+    ON applications (json_extract(doc, '$.application_number'));
+CREATE INDEX IF NOT EXISTS applications_unsynced
+    ON applications (updated_at) WHERE synced_at IS NULL OR synced_at < updated_at;
+
+CREATE TABLE IF NOT EXISTS application_summaries (
+    id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summaries_status
+    ON application_summaries (json_extract(doc, '$.status'), json_extract(doc, '$.loan_branch'));
+CREATE INDEX IF NOT EXISTS summaries_branch
+    ON application_summaries (json_extract(doc, '$.loan_branch'));
+CREATE INDEX IF NOT EXISTS summaries_submission_date
+    ON application_summaries (json_extract(doc, '$.submission_date."$date"'));
+CREATE INDEX IF NOT EXISTS summaries_proposed_amount
+    ON application_summaries (json_extract(doc, '$.total_proposed_paise'));
+
+CREATE TABLE IF NOT EXISTS search_keys (
+    application_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS search_keys_key ON search_keys (kind, key);
+CREATE INDEX IF NOT EXISTS search_keys_application ON search_keys (application_id);
+
+CREATE TABLE IF NOT EXISTS blocking_keys (
+    application_number TEXT NOT NULL,
+    key TEXT NOT NULL,
+    role TEXT,
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS blocking_keys_key ON blocking_keys (key, application_number);
+CREATE INDEX IF NOT EXISTS blocking_keys_application ON blocking_keys (application_number);
+
+CREATE TABLE IF NOT EXISTS status_events (
+    id TEXT PRIMARY KEY,
+    application_number TEXT,
+    timestamp TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    synced INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS status_events_application ON status_events (application_number, timestamp);
+CREATE INDEX IF NOT EXISTS status_events_unsynced ON status_events (id) WHERE synced = 0;
+
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    application_number TEXT,
+    sidecar_of TEXT,
+    sidecar_kind TEXT,
+    filename TEXT,
+    length INTEGER,
+    path TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    synced INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS documents_application ON documents (application_number, sidecar_kind);
+CREATE INDEX IF NOT EXISTS documents_sidecar_of ON documents (sidecar_of);
+CREATE INDEX IF NOT EXISTS documents_unsynced ON documents (id) WHERE synced = 0;
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    next INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS deletions (
+    application_id TEXT PRIMARY KEY,
+    deleted_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS migration_batches (
+    migration TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+"""
+
+# Naive datetimes in, naive datetimes out, as the app compares them with datetime.now()
+JSON_OPTIONS = json_util.JSONOptions(tz_aware=False)
+
+def _dumps(doc):
+    return json_util.dumps(doc, json_options=JSON_OPTIONS)
+
+def _loads(text):
+    return json_util.loads(text, json_options=JSON_OPTIONS)
+
+# Comparison operators a criteria dict may use, as in a MongoDB filter
+OPERATORS = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<=', '$ne': '!='}
+
+def _json_field(field, sample=None):
+    """json_extract() of a field as a literal path, so expression indexes apply"""
+    if not re.fullmatch(r'[A-Za-z0-9_.]+', field):
+        raise ValueError(f"Unsupported field name: {field}")
+    if isinstance(sample, datetime):
+        # Dates are stored as {"$date": "<ISO 8601>"}, which sorts as text
+        return f"json_extract(doc, '$.{field}.\"$date\"')"
+    return f"json_extract(doc, '$.{field}')"
+
+def _sql_value(value):
+    if isinstance(value, datetime):
+        return json.loads(_dumps(value))['$date']
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+class StoredFile(io.BytesIO):
+    """A document read back from disk, shaped like a GridFS GridOut"""
+
+    def __init__(self, data, file_id, filename, metadata):
+        super().__init__(data)
+        self._id = file_id
+        self.filename = filename
+        self.metadata = metadata
+        self.length = len(data)
+
+class EmbeddedDatabase(StorageBackend):
+    """
+    Applications in SQLite and documents on the local disk.
+
+    Saves never touch the network; storage_sync.py replicates changed rows
+    and new files to the central database in batches.
+    """
+
+    def __init__(self, directory=EMBEDDED_DIR):
+        self.directory = directory
+        self.files_dir = os.path.join(directory, "documents")
+        os.makedirs(self.files_dir, exist_ok=True)
+        self.path = os.path.join(directory, "msme_loan.sqlite3")
+        self.backend = 'embedded'
+        self.readiness = {'state': 'ready', 'error': None, 'checked_at': time.time()}
+        self._local = threading.local()
+        self._executor = None
+        self._connection().executescript(SCHEMA)
+        warn_if_unkeyed()
+
+    def _connection(self):
+        """One connection per thread; SQLite connections are cheap and not shareable"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            # WAL lets readers carry on while a save is being written
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # Applications
+
+    def _load_application(self, conn, application_id):
+        row = conn.execute("SELECT doc FROM applications WHERE id = ?", (str(application_id),)).fetchone()
+        return _loads(row[0]) if row else None
+
+    def _write_application(self, conn, application):
+        """Store an application with its search keys, blocking keys and summary"""
+        application_id = str(application['_id'])
+        application['search'] = build_search_keys(application)
+        application['typed'] = typed_fields(application)
+        conn.execute(
+            "INSERT INTO applications (id, doc, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET doc = excluded.doc, updated_at = excluded.updated_at",
+            (application_id, _dumps(application), time.time())
+        )
+
+        conn.execute("DELETE FROM search_keys WHERE application_id = ?", (application_id,))
+        conn.executemany(
+            "INSERT INTO search_keys (application_id, kind, key) VALUES (?, ?, ?)",
+            [(application_id, 'id', key) for key in application['search']['ids']]
+            + [(application_id, 'gram', gram) for gram in application['search']['name_grams']]
+        )
+
+        application_number = application.get('application_number')
+        if application_number:
+            conn.execute("DELETE FROM blocking_keys WHERE application_number = ?", (application_number,))
+            conn.executemany(
+                "INSERT INTO blocking_keys (application_number, key, role, name) VALUES (?, ?, ?, ?)",
+                [(application_number, entry['key'], entry['role'], entry['name'])
+                 for entry in build_blocking_keys(application)]
+            )
+
+        self._write_summary(conn, application)
+
+    def _write_summary(self, conn, application):
+        summary = build_summary(application)
+        for field in STATUS_FIELDS:
+            if field in application:
+                summary[field] = application[field]
+        conn.execute(
+            "INSERT OR REPLACE INTO application_summaries (id, doc) VALUES (?, ?)",
+            (str(application['_id']), _dumps(dict(summary, _id=application['_id'])))
+        )
+
+    def _upsert_application(self, application_id, fields):
+        with self._transaction() as conn:
+            application = self._load_application(conn, application_id) or {}
+            application.update(fields)
+            application['_id'] = application_id
+            self._write_application(conn, application)
+        return InsertOneResult(application_id, True)
+
+    def save_application(self, application_data):
+        """Save loan application data"""
+        try:
+            application_id = application_data.pop('_id', None) or ObjectId()
+            return self._upsert_application(application_id, application_data)
+        except Exception as e:
+            st.error(f"Error saving application: {str(e)}")
+            return None
+
+    def update_application(self, application_id, updated_data):
+        """Update existing application"""
+        try:
+            if isinstance(application_id, str):
+                application_id = ObjectId(application_id)
+            return self._upsert_application(application_id, updated_data)
+        except Exception as e:
+            st.error(f"Error updating application: {str(e)}")
+            return None
+
+    def update_statuses(self, applications, status, remarks="", changed_by="Bank Official"):
+        """Record status events and move each application that has no later change"""
+        try:
+            now = datetime.now()
+            updated = 0
+            with self._transaction() as conn:
+                for app in applications:
+                    event = {
+                        '_id': ObjectId(),
+                        'application_id': app['_id'],
+                        'application_number': app.get('application_number'),
+                        'from_status': app.get('status'),
+                        'status': status,
+                        'remarks': remarks,
+                        'changed_by': changed_by,
+                        'timestamp': now
+                    }
+                    conn.execute(
+                        "INSERT INTO status_events (id, application_number, timestamp, doc) VALUES (?, ?, ?, ?)",
+                        (str(event['_id']), event['application_number'], now.isoformat(), _dumps(event))
+                    )
+                    application = self._load_application(conn, app['_id'])
+                    if application is None:
+                        continue
+                    changed_at = application.get('status_changed_at')
+                    if changed_at is not None and changed_at >= now:
+                        continue
+                    application.update(status=status, remarks=remarks, last_updated=now,
+                                       status_changed_at=now)
+                    self._write_application(conn, application)
+                    updated += 1
+            return updated
+        except Exception as e:
+            st.error(f"Error updating status: {str(e)}")
+            return 0
+
+    def reserve_counter_block(self, name, size):
+        """Reserve size consecutive values of a named counter; returns the first"""
+        with self._transaction() as conn:
+            (next_value,) = conn.execute(
+                "INSERT INTO counters (name, next) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET next = next + excluded.next RETURNING next",
+                (name, size)
+            ).fetchone()
+        return next_value - size + 1
+
+    def get_status_events(self, application_number):
+        """Status history of an application, newest first"""
+        try:
+            rows = self._connection().execute(
+                "SELECT doc FROM status_events WHERE application_number = ? ORDER BY timestamp DESC",
+                (application_number,)
+            )
+            return [_loads(doc) for doc, in rows]
+        except Exception as e:
+            st.error(f"Error retrieving status history: {str(e)}")
+            return []
+
+    def _where(self, criteria):
+        """SQL for a MongoDB-style filter of equality, range and $in conditions"""
+        clauses, params = [], []
+        for field, condition in (criteria or {}).items():
+            conditions = condition if isinstance(condition, dict) else {'$eq': condition}
+            for operator, value in conditions.items():
+                sample = value[0] if operator == '$in' and value else value
+                column = "id" if field == '_id' else _json_field(field, sample)
+                if operator == '$in':
+                    clauses.append(f"{column} IN ({','.join('?' * len(value))})")
+                    params += [_sql_value(item) for item in value]
+                elif operator == '$eq':
+                    clauses.append(f"{column} = ?")
+                    params.append(_sql_value(value))
+                else:
+                    clauses.append(f"{column} {OPERATORS[operator]} ?")
+                    params.append(_sql_value(value))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def get_application(self, criteria):
+        """Retrieve specific application"""
+        try:
+            if isinstance(criteria, (ObjectId, str)):
+                criteria = {'_id': criteria}
+            where, params = self._where(criteria)
+            row = self._connection().execute(f"SELECT doc FROM applications{where} LIMIT 1", params).fetchone()
+            return _loads(row[0]) if row else None
+        except Exception as e:
+            st.error(f"Error retrieving application: {str(e)}")
+            return None
+
+    def get_application_summaries(self, criteria=None, limit=0):
+        """Retrieve rows from the application_summaries table"""
+        try:
+            where, params = self._where(criteria)
+            # ObjectId hex strings sort in creation order
+            rows = self._connection().execute(
+                f"SELECT doc FROM application_summaries{where} ORDER BY id DESC LIMIT ?",
+                params + [limit or -1]
+            )
+            return [_loads(doc) for doc, in rows]
+        except Exception as e:
+            st.error(f"Error retrieving application summaries: {str(e)}")
+            return []
+
+    def get_status_counts(self, group_by='status'):
+        """Count applications per status (or per branch, state, ...) from the summaries"""
+        try:
+            rows = self._connection().execute(
+                f"SELECT {_json_field(group_by)} AS value, COUNT(*) AS count, "
+                f"SUM(json_extract(doc, '$.total_proposed_paise')) "
+                f"FROM application_summaries GROUP BY value ORDER BY count DESC"
+            )
+            return [
+                {'_id': value, 'count': count, 'total_proposed_paise': total or 0}
+                for value, count, total in rows
+            ]
+        except Exception as e:
+            st.error(f"Error counting applications: {str(e)}")
+            return []
+
+    def get_related_applications(self, application_number):
+        """Applications sharing identifiers or a similar name with this one"""
+        try:
+            conn = self._connection()
+            columns = ('application_number', 'key', 'role', 'name')
+            own = [dict(zip(columns, row)) for row in conn.execute(
+                "SELECT application_number, key, role, name FROM blocking_keys WHERE application_number = ?",
+                (application_number,)
+            )]
+            if not own:
+                return []
+            keys = list({entry['key'] for entry in own})
+            others = [dict(zip(columns, row)) for row in conn.execute(
+                f"SELECT application_number, key, role, name FROM blocking_keys "
+                f"WHERE key IN ({','.join('?' * len(keys))}) AND application_number != ?",
+                keys + [application_number]
+            )]
+            flags = flag_related(own, others)
+            for flag in flags:
+                row = conn.execute(
+                    "SELECT json_extract(doc, '$.status') FROM applications "
+                    "WHERE json_extract(doc, '$.application_number') = ?",
+                    (flag['application_number'],)
+                ).fetchone()
+                flag['status'] = row[0] if row else None
+            return flags
+        except Exception as e:
+            st.error(f"Error checking for related applications: {str(e)}")
+            return []
+
+    def delete_application(self, application_id):
+        """Delete an application, its status history and its documents; False if there is no such application"""
+        try:
+            with self._transaction() as conn:
+                application = self._load_application(conn, application_id)
+                if application is None:
+                    return False
+                application_id = str(application['_id'])
+                application_number = application.get('application_number')
+                conn.execute("DELETE FROM applications WHERE id = ?", (application_id,))
+                conn.execute("DELETE FROM application_summaries WHERE id = ?", (application_id,))
+                conn.execute("DELETE FROM search_keys WHERE application_id = ?", (application_id,))
+                conn.execute("DELETE FROM blocking_keys WHERE application_number = ?", (application_number,))
+                conn.execute("DELETE FROM status_events WHERE application_number = ?", (application_number,))
+                paths = [path for path, in conn.execute(
+                    "SELECT path FROM documents WHERE application_number = ?", (application_number,))]
+                conn.execute("DELETE FROM documents WHERE application_number = ?", (application_number,))
+                # The sync job deletes the central copy too
+                conn.execute("INSERT OR REPLACE INTO deletions (application_id, deleted_at) VALUES (?, ?)",
+                             (application_id, time.time()))
+            # Only once the rows are gone for good; files are shared by
+            # content, so keep those another document still uses
+            conn = self._connection()
+            for path in set(paths):
+                if not conn.execute("SELECT 1 FROM documents WHERE path = ? LIMIT 1", (path,)).fetchone():
+                    try:
+                        os.remove(os.path.join(self.files_dir, path))
+                    except OSError as e:
+                        # The application is deleted; a file left over only costs disk space
+                        print(f"Could not remove {path}: {str(e)}")
+            return True
+        except Exception as e:
+            st.error(f"Error deleting application: {str(e)}")
+            return None
+
+    # Documents
+
+    def _write_file(self, data):
+        """Store bytes under their content hash; identical files are kept once"""
+        from upload_buffers import content_hash
+        digest = content_hash(data)
+        path = os.path.join(digest[:2], digest[2:4], digest)
+        full_path = os.path.join(self.files_dir, path)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            partial = f"{full_path}.{threading.get_ident()}.part"
+            with open(partial, 'wb') as f:
+                f.write(data)
+            os.replace(partial, full_path)
+        return path, len(data)
+
+    def _insert_document(self, conn, file_id, filename, data, metadata):
+        path, length = self._write_file(data)
+        conn.execute(
+            "INSERT INTO documents (id, application_number, sidecar_of, sidecar_kind, filename, "
+            "length, path, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (str(file_id), metadata.get('application_number'),
+             str(metadata['sidecar_of']) if metadata.get('sidecar_of') else None,
+             metadata.get('sidecar_kind'), filename, length, path, _dumps(metadata))
+        )
+
+    def save_document(self, file_data, metadata):
+        """Save uploaded document to the local document store"""
+        try:
+            if not metadata.get('application_number'):
+                metadata['application_number'] = st.session_state.get('application_number')
+            prepared = prepare_document(file_data, metadata)
+            file_id = metadata.get('file_id') or ObjectId()
+            with self._transaction() as conn:
+                self._insert_document(conn, file_id, prepared['filename'], prepared['data'], prepared['metadata'])
+                for kind, data, filename, content_type in prepared['sidecars']:
+                    self._insert_document(conn, ObjectId(), filename, data, {
+                        'application_number': metadata['application_number'],
+                        'sidecar_of': file_id,
+                        'sidecar_kind': kind,
+                        'upload_date': datetime.now(),
+                        'content_type': content_type
+                    })
+            return file_id
+        except Exception as e:
+            st.error(f"Error saving document: {str(e)}")
+            return None
+
+    def _read_file(self, path):
+        with open(os.path.join(self.files_dir, path), 'rb') as f:
+            return f.read()
+
+    def get_document(self, file_id):
+        """Retrieve document from the local document store"""
+        try:
+            row = self._connection().execute(
+                "SELECT filename, path, metadata FROM documents WHERE id = ?", (str(file_id),)
+            ).fetchone()
+            if row is None:
+                return None
+            filename, path, metadata = row
+            return StoredFile(self._read_file(path), ObjectId(str(file_id)), filename, _loads(metadata))
+        except Exception as e:
+            st.error(f"Error retrieving document: {str(e)}")
+            return None
+
+    def get_application_documents(self, application_number, include_data=True):
+        """Get all documents for an application"""
+        try:
+            documents = []
+            for file_id, filename, length, path, metadata in self._connection().execute(
+                    "SELECT id, filename, length, path, metadata FROM documents "
+                    "WHERE application_number = ? AND sidecar_kind IS NULL", (application_number,)):
+                metadata = _loads(metadata)
+                doc_data = {
+                    'file_id': ObjectId(file_id),
+                    'filename': filename,
+                    'document_type': metadata.get('document_type'),
+                    'section': metadata.get('section'),
+                    'upload_date': metadata.get('upload_date'),
+                    'content_type': metadata.get('content_type'),
+                    'length': length,
+                    'compression': metadata.get('compression')
+                }
+                if include_data:
+                    doc_data['data'] = self._read_file(path)
+                documents.append(doc_data)
+            return documents
+        except Exception as e:
+            st.error(f"Error retrieving documents: {str(e)}")
+            return []
+
+    def get_document_previews(self, application_number):
+        """Get preview thumbnails for an application, keyed by document file id"""
+        try:
+            return {
+                ObjectId(sidecar_of): self._read_file(path)
+                for sidecar_of, path in self._connection().execute(
+                    "SELECT sidecar_of, path FROM documents WHERE application_number = ? AND sidecar_kind = 'preview'",
+                    (application_number,)
+                )
+            }
+        except Exception as e:
+            st.error(f"Error retrieving previews: {str(e)}")
+            return {}
+
+    def get_rendered_file(self, application_number, kind, version):
+        """Get a file rendered from an application at a given version, if cached"""
+        try:
+            for path, metadata in self._connection().execute(
+                    "SELECT path, metadata FROM documents WHERE application_number = ? AND sidecar_kind = ?",
+                    (application_number, kind)):
+                if _loads(metadata).get('version') == version:
+                    return self._read_file(path)
+            return None
+        except Exception as e:
+            st.error(f"Error retrieving {kind}: {str(e)}")
+            return None
+
+    def save_rendered_file(self, application_number, kind, version, data, filename, content_type):
+        """Cache a file rendered from an application, dropping its older versions"""
+        try:
+            file_id = ObjectId()
+            with self._transaction() as conn:
+                old = conn.execute(
+                    "SELECT id, path FROM documents WHERE application_number = ? AND sidecar_kind = ?",
+                    (application_number, kind)
+                ).fetchall()
+                conn.execute("DELETE FROM documents WHERE application_number = ? AND sidecar_kind = ?",
+                             (application_number, kind))
+                self._insert_document(conn, file_id, filename, data, {
+                    'application_number': application_number,
+                    'sidecar_kind': kind,
+                    'version': version,
+                    'upload_date': datetime.now(),
+                    'content_type': content_type
+                })
+                # A cache of this branch's data; the central store renders its own
+                conn.execute("UPDATE documents SET synced = 1 WHERE id = ?", (str(file_id),))
+                for path in {path for _, path in old}:
+                    if not conn.execute("SELECT 1 FROM documents WHERE path = ? LIMIT 1", (path,)).fetchone():
+                        os.remove(os.path.join(self.files_dir, path))
+            return file_id
+        except Exception as e:
+            print(f"Error saving {kind} for {application_number}: {str(e)}")
+            return None
+
+    # Search
+
+    def search_text(self, query, page=0, page_size=20):
+        """Ranked search by application number, name, PAN, GSTIN, Udyam or mobile"""
+        try:
+            query = (query or '').strip()
+            if not query:
+                return [], 0
+            conn = self._connection()
+            scored = {}
+
+            def add(doc, score):
+                doc.pop('form_data', None)
+                current = scored.get(doc['_id'])
+                if current is None or current[0] < score:
+                    scored[doc['_id']] = (score, doc)
+
+            identifier = normalize_identifier(query)
+            if len(identifier) >= 3:
+                # Prefix ranges are answered from the key indexes
+                upper = identifier + '\uffff'
+                mobile = normalize_mobile(query)
+                rows = conn.execute(
+                    "SELECT doc FROM applications WHERE id IN ("
+                    " SELECT application_id FROM search_keys WHERE kind = 'id' AND key >= ? AND key < ?"
+                    " UNION SELECT application_id FROM search_keys WHERE kind = 'id' AND key = ?"
+                    ") OR (json_extract(doc, '$.application_number') >= ? AND json_extract(doc, '$.application_number') < ?) "
+                    "LIMIT ?",
+                    (identifier, upper, mobile or identifier, identifier, upper, CANDIDATE_LIMIT)
+                )
+                for doc, in rows:
+                    doc = _loads(doc)
+                    add(doc, identifier_score(identifier, doc))
+
+            name = normalize_name(query)
+            if name:
+                from fuzzywuzzy import fuzz
+
+                grams = name_grams(name)
+                probe, required = gram_query(grams)
+                rows = conn.execute(
+                    f"SELECT a.doc FROM ("
+                    f" SELECT application_id, COUNT(*) AS overlap FROM search_keys"
+                    f" WHERE kind = 'gram' AND key IN ({','.join('?' * len(grams))})"
+                    f" AND application_id IN ("
+                    f"  SELECT application_id FROM search_keys"
+                    f"  WHERE kind = 'gram' AND key IN ({','.join('?' * len(probe))}) LIMIT ?)"
+                    f" GROUP BY application_id HAVING overlap >= ? ORDER BY overlap DESC LIMIT ?"
+                    f") AS candidates JOIN applications AS a ON a.id = candidates.application_id",
+                    grams + probe + [GRAM_SCAN_LIMIT, required, CANDIDATE_LIMIT]
+                )
+                for doc, in rows:
+                    doc = _loads(doc)
+                    score = fuzz.token_set_ratio(name, doc.get('search', {}).get('name', ''))
+                    if score >= NAME_MATCH_THRESHOLD:
+                        add(doc, score)
+
+            return paginate_ranked(scored, page, page_size)
+        except Exception as e:
+            st.error(f"Error searching applications: {str(e)}")
+            return [], 0
+
+    # Batch jobs
+
+    def iter_application_batches(self, criteria=None, projection=None, batch_size=500, after_id=None,
+                                 collection='applications'):
+        """
+        Stream applications or summaries in _id order, one list per batch.
+
+        Whole documents are returned; projection is accepted for the
+        interface only. Documents are hashed when saved here, so there
+        are no 'fs.files' batches to backfill.
+        """
+        tables = {'applications': 'applications', 'application_summaries': 'application_summaries'}
+        if collection not in tables:
+            return
+        where, params = self._where(criteria)
+        after = str(after_id) if after_id is not None else ''
+        while True:
+            rows = self._connection().execute(
+                f"SELECT id, doc FROM {tables[collection]}{where}{' AND' if where else ' WHERE'} id > ? "
+                f"ORDER BY id LIMIT ?",
+                params + [after, batch_size]
+            ).fetchall()
+            if not rows:
+                return
+            yield [_loads(doc) for _, doc in rows]
+            after = rows[-1][0]
+
+    def rebuild_summaries(self, batch_size=500):
+        """Regenerate every summary in one transaction, so the dashboard never sees a partial table"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM application_summaries")
+            written = 0
+            for doc, in conn.execute("SELECT doc FROM applications").fetchall():
+                self._write_summary(conn, _loads(doc))
+                written += 1
+        return written
+
+    def get_migration_checkpoint(self, name):
+        row = self._connection().execute("SELECT doc FROM migrations WHERE name = ?", (name,)).fetchone()
+        return _loads(row[0]) if row else None
+
+    def save_migration_checkpoint(self, name, fields):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT doc FROM migrations WHERE name = ?", (name,)).fetchone()
+            checkpoint = dict(_loads(row[0]) if row else {'_id': name}, **fields)
+            conn.execute("INSERT OR REPLACE INTO migrations (name, doc) VALUES (?, ?)", (name, _dumps(checkpoint)))
+
+    def record_migration_batch(self, record):
+        self._connection().execute("INSERT INTO migration_batches (migration, doc) VALUES (?, ?)",
+                                   (record['migration'], _dumps(record)))
+
+    def apply_migration(self, migrate, documents, dry_run=False):
+        """
+        Bring a batch of applications up to date.
+
+        Every field the migrations backfill (typed values, search and
+        blocking keys, summaries) is derived again whenever an application
+        is written here, so rewriting each application applies any of them.
+        """
+        if dry_run:
+            return len(documents)
+        with self._transaction() as conn:
+            for application in documents:
+                for field in ('submission_date', 'last_updated'):
+                    if isinstance(application.get(field), str):
+                        application[field] = parse_date(application[field])
+                self._write_application(conn, application)
+        return len(documents)
+
+    # Replication, used by storage_sync.py
+
+    def unsynced_applications(self, limit):
+        """Up to limit (application, updated_at) pairs changed since their last sync"""
+        rows = self._connection().execute(
+            "SELECT doc, updated_at FROM applications WHERE synced_at IS NULL OR synced_at < updated_at "
+            "ORDER BY updated_at LIMIT ?", (limit,)
+        )
+        return [(_loads(doc), updated_at) for doc, updated_at in rows]
+
+    def mark_applications_synced(self, synced):
+        """Mark (application_id, updated_at) pairs synced unless changed again since"""
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE applications SET synced_at = updated_at WHERE id = ? AND updated_at = ?",
+                [(str(application_id), updated_at) for application_id, updated_at in synced]
+            )
+
+    def unsynced_status_events(self, limit):
+        rows = self._connection().execute(
+            "SELECT doc FROM status_events WHERE synced = 0 LIMIT ?", (limit,))
+        return [_loads(doc) for doc, in rows]
+
+    def unsynced_documents(self, limit):
+        """Up to limit documents not yet copied to the central store, sidecars after their parents"""
+        rows = self._connection().execute(
+            "SELECT id, filename, path, metadata FROM documents WHERE synced = 0 "
+            "ORDER BY sidecar_of IS NOT NULL LIMIT ?", (limit,)
+        )
+        return [
+            {'_id': ObjectId(file_id), 'filename': filename, 'path': path, 'metadata': _loads(metadata)}
+            for file_id, filename, path, metadata in rows
+        ]
+
+    def read_document_file(self, document):
+        return self._read_file(document['path'])
+
+    def mark_synced(self, table, ids):
+        """Flag status_events or documents rows as copied to the central store"""
+        assert table in ('status_events', 'documents')
+        with self._transaction() as conn:
+            conn.executemany(f"UPDATE {table} SET synced = 1 WHERE id = ?", [(str(i),) for i in ids])
+
+    def pending_deletions(self):
+        return [ObjectId(application_id) for application_id, in
+                self._connection().execute("SELECT application_id FROM deletions")]
+
+    def clear_deletions(self, application_ids):
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM deletions WHERE application_id = ?",
+                             [(str(application_id),) for application_id in application_ids])
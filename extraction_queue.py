@@ -0,0 +1,327 @@
+# extraction_queue.py
+"""
+Durable queue for document extraction jobs.
+
+The web tier submits an upload and polls for its fields; standalone
+worker processes claim jobs, run OCR and parsing and store the result.
+Jobs live in SQLite, so a dropped browser connection or a restarted web
+server loses nothing, and the two tiers scale separately.
+
+A job moves pending -> running -> done, or back to pending with a delay
+after an error or timeout until its attempts run out, then failed. A
+running job whose worker died is reclaimed, with the same delay, once its
+lease expires. Submitting a failed job again with retry_failed=True puts it
+back in the queue. Uploads are dropped from a job once it finishes, and
+workers prune finished jobs after RETENTION_HOURS.
+
+Usage:
+    python extraction_queue.py --workers 4
+    EXTRACTION_TYPE_LIMITS="Bank Statement=1,Sanction Letter=2" python extraction_queue.py
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from upload_buffers import content_hash
+
+logger = logging.getLogger(__name__)
+
+QUEUE_PATH = os.environ.get("EXTRACTION_QUEUE_PATH", "extraction_queue.sqlite3")
+# Seconds one extraction may run before it is killed and retried
+JOB_TIMEOUT = float(os.environ.get("EXTRACTION_JOB_TIMEOUT", "120"))
+MAX_ATTEMPTS = int(os.environ.get("EXTRACTION_MAX_ATTEMPTS", "3"))
+# Seconds before the first retry; doubles with every attempt
+RETRY_DELAY = 5
+# Seconds between a worker's heartbeats, and after which it counts as gone
+HEARTBEAT_SECONDS = 10
+WORKER_TIMEOUT = 3 * HEARTBEAT_SECONDS
+POLL_SECONDS = 0.5
+# Hours finished jobs (and their results) are kept for pages still polling
+RETENTION_HOURS = float(os.environ.get("EXTRACTION_RETENTION_HOURS", "24"))
+# Seconds between a worker's prunes of finished jobs
+PRUNE_SECONDS = 600
+# Document type of a bundle file the worker must route itself (see bundle_upload.py)
+ROUTE_DOCUMENT_TYPE = "Bundle"
+
+# Running jobs allowed per document type across all workers, e.g.
+# "Bank Statement=1,Sanction Letter=2"; types not listed are unlimited
+TYPE_LIMITS = {
+    name.strip(): int(limit)
+    for name, limit in (
+        item.split('=') for item in os.environ.get("EXTRACTION_TYPE_LIMITS", "").split(',') if '=' in item
+    )
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    job_key TEXT NOT NULL UNIQUE,
+    document_type TEXT NOT NULL,
+    filename TEXT,
+    content_type TEXT NOT NULL,
+    payload BLOB,
+    state TEXT NOT NULL DEFAULT 'pending'
+        CHECK (state IN ('pending', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL DEFAULT 0,
+    lease_expires REAL,
+    worker TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claimable ON jobs (state, run_after);
+CREATE INDEX IF NOT EXISTS jobs_running ON jobs (document_type) WHERE state = 'running';
+
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+"""
+
+JOB_FIELDS = ('id', 'job_key', 'document_type', 'filename', 'content_type', 'state',
+              'attempts', 'result', 'error')
+
+class ExtractionQueue:
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _job(self, row):
+        if row is None:
+            return None
+        job = dict(zip(JOB_FIELDS, row))
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def get(self, job_key):
+        row = self._connection().execute(
+            f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE job_key = ?", (job_key,)
+        ).fetchone()
+        return self._job(row)
+
+    def submit(self, data, filename, content_type, document_type, sha256=None, retry_failed=False):
+        """
+        Queue extraction of an upload, once per content and document type.
+
+        sha256 is the upload's digest when the caller already has it. A
+        job that failed stays failed unless retry_failed is set, so pages
+        polling it do not retry it on every rerun.
+
+        Returns:
+        dict: The job, new or existing, with its state and any result
+        """
+        job_key = f"{sha256 or content_hash(data)}:{document_type}"
+        job = self.get(job_key)
+        now = time.time()
+        if job is not None and job['state'] == 'failed' and retry_failed:
+            # The upload was dropped when the job failed; bring it back with fresh attempts
+            self._connection().execute(
+                "UPDATE jobs SET state = 'pending', payload = ?, attempts = 0, run_after = 0, error = NULL, "
+                "worker = NULL, updated_at = ? WHERE job_key = ? AND state = 'failed'",
+                (bytes(data), now, job_key)
+            )
+            return self.get(job_key)
+        if job is not None:
+            return job
+        self._connection().execute(
+            "INSERT OR IGNORE INTO jobs (job_key, document_type, filename, content_type, payload, "
+            "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_key, document_type, filename, content_type, bytes(data), now, now)
+        )
+        return self.get(job_key)
+
+    def claim(self, worker_id, type_limits=TYPE_LIMITS):
+        """Take the oldest runnable job whose document type has a free slot"""
+        now = time.time()
+        with self._transaction() as conn:
+            # Jobs of workers that died mid-run go back to the queue after the
+            # same backoff as a failed attempt, so a job that kills its worker
+            # does not take down the next one straight away
+            conn.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "payload = CASE WHEN attempts >= ? THEN NULL ELSE payload END, "
+                "run_after = ? + ? * (1 << (attempts - 1)), lease_expires = NULL, "
+                "worker = NULL, error = 'worker lost', updated_at = ? "
+                "WHERE state = 'running' AND lease_expires < ?",
+                (MAX_ATTEMPTS, MAX_ATTEMPTS, now, RETRY_DELAY, now, now)
+            )
+            running = dict(conn.execute(
+                "SELECT document_type, COUNT(*) FROM jobs WHERE state = 'running' GROUP BY document_type"
+            ).fetchall())
+            full = [t for t, limit in type_limits.items() if running.get(t, 0) >= limit]
+            row = conn.execute(
+                f"SELECT id, document_type, filename, content_type, payload, attempts FROM jobs "
+                f"WHERE state = 'pending' AND run_after <= ? "
+                f"{'AND document_type NOT IN (' + ','.join('?' * len(full)) + ')' if full else ''} "
+                f"ORDER BY run_after, id LIMIT 1",
+                [now] + full
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = 'running', worker = ?, attempts = attempts + 1, "
+                "lease_expires = ?, updated_at = ? WHERE id = ?",
+                (worker_id, now + JOB_TIMEOUT + HEARTBEAT_SECONDS, now, row[0])
+            )
+        job = dict(zip(('id', 'document_type', 'filename', 'content_type', 'payload', 'attempts'), row))
+        job['attempts'] += 1
+        return job
+
+    def complete(self, job_id, result):
+        self._connection().execute(
+            "UPDATE jobs SET state = 'done', result = ?, error = NULL, payload = NULL, "
+            "lease_expires = NULL, updated_at = ? WHERE id = ?",
+            (json.dumps(result, default=str), time.time(), job_id)
+        )
+
+    def fail(self, job_id, attempts, error):
+        """Retry with backoff, or give up after MAX_ATTEMPTS"""
+        now = time.time()
+        if attempts < MAX_ATTEMPTS:
+            self._connection().execute(
+                "UPDATE jobs SET state = 'pending', error = ?, run_after = ?, worker = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (error, now + RETRY_DELAY * 2 ** (attempts - 1), now, job_id)
+            )
+        else:
+            self._connection().execute(
+                "UPDATE jobs SET state = 'failed', error = ?, payload = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (error, now, job_id)
+            )
+
+    def prune(self, retention_hours=RETENTION_HOURS):
+        """Delete jobs finished more than retention_hours ago, and workers long gone"""
+        cutoff = time.time() - retention_hours * 3600
+        with self._transaction() as conn:
+            removed = conn.execute(
+                "DELETE FROM jobs WHERE state IN ('done', 'failed') AND updated_at < ?", (cutoff,)
+            ).rowcount
+            conn.execute("DELETE FROM workers WHERE heartbeat < ?", (cutoff,))
+        return removed
+
+    def heartbeat(self, worker_id):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO workers (id, heartbeat) VALUES (?, ?)", (worker_id, time.time())
+        )
+
+    def workers_alive(self):
+        """Whether any worker has checked in recently"""
+        return self._connection().execute(
+            "SELECT 1 FROM workers WHERE heartbeat > ? LIMIT 1", (time.time() - WORKER_TIMEOUT,)
+        ).fetchone() is not None
+
+_queue = None
+
+def get_queue():
+    """The process-wide queue handle"""
+    global _queue
+    if _queue is None:
+        _queue = ExtractionQueue()
+    return _queue
+
+def _extract(document_type, filename, content_type, payload):
+    # Runs in the worker's extraction process
+    from bundle_upload import BundledFile, route_and_extract
+    from document_extraction import extract_data_from_document
+    if document_type == ROUTE_DOCUMENT_TYPE:
+        routed_type, data = route_and_extract(filename, content_type, payload)
+        return {'document_type': routed_type, 'data': data}
+    return extract_data_from_document(BundledFile(filename, content_type, payload), document_type)
+
+def run_worker(path=QUEUE_PATH):
+    """Claim and run jobs until interrupted"""
+    queue = ExtractionQueue(path)
+    worker_id = f"{os.uname().nodename}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    # Extraction runs in a child process so a stuck job can be killed
+    context = multiprocessing.get_context('spawn')
+    pool = context.Pool(1)
+    last_heartbeat = last_prune = 0
+    try:
+        while True:
+            if time.time() - last_heartbeat > HEARTBEAT_SECONDS:
+                queue.heartbeat(worker_id)
+                last_heartbeat = time.time()
+            if time.time() - last_prune > PRUNE_SECONDS:
+                removed = queue.prune()
+                if removed:
+                    logger.info(f"Pruned {removed} finished jobs")
+                last_prune = time.time()
+            job = queue.claim(worker_id)
+            if job is None:
+                time.sleep(POLL_SECONDS)
+                continue
+
+            started = time.time()
+            pending = pool.apply_async(_extract, (job['document_type'], job['filename'],
+                                                  job['content_type'], job['payload']))
+            try:
+                # Keep the heartbeat going through long extractions
+                while True:
+                    try:
+                        result = pending.get(timeout=HEARTBEAT_SECONDS)
+                        break
+                    except multiprocessing.TimeoutError:
+                        if time.time() - started > JOB_TIMEOUT:
+                            raise
+                        queue.heartbeat(worker_id)
+                queue.complete(job['id'], result)
+                logger.info(f"Job {job['id']} ({job['document_type']}) done in {time.time() - started:.1f}s")
+            except multiprocessing.TimeoutError:
+                pool.terminate()
+                pool = context.Pool(1)
+                queue.fail(job['id'], job['attempts'], f"timed out after {JOB_TIMEOUT:.0f}s")
+                logger.warning(f"Job {job['id']} ({job['document_type']}) timed out")
+            except Exception as e:
+                queue.fail(job['id'], job['attempts'], str(e))
+                logger.error(f"Job {job['id']} ({job['document_type']}) failed: {str(e)}")
+    finally:
+        pool.terminate()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run document extraction workers")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes to start")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="Path of the queue database")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=run_worker, args=(args.queue,), name=f"worker-{i}")
+               for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# field_types.py
+
+import re
+from datetime import datetime
+from amounts import parse_amount, LAKH
+
+# Dates are written dd/mm/yyyy on certificates and in the form
+DATE_FORMATS = ["%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d"]
+
+DATE_FIELDS = re.compile(
+    r'^(date_of_\w+|gst_registration_date|director_dob_\d+|additional_guarantor_dob_\d+)$'
+)
+# Amount fields the form asks for in lakhs of rupees
+LAKH_AMOUNT_FIELDS = re.compile(
+    r'^((existing_facility_(limit|outstanding)|proposed_facility_amount|collateral_value|'
+    r'director_networth|additional_guarantor_networth)_\d+|past_performance_\w+)$'
+)
+
+def parse_date(value):
+    """datetime for a dd/mm/yyyy (or ISO) date, or None"""
+    if isinstance(value, datetime):
+        return value
+    value = str(value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    try:
+        # Timestamps saved as isoformat() strings before dates were typed
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+def typed_fields(application_data):
+    """
+    Typed copies of the date and amount fields of an application.
+
+    The text stays where the applicant typed it; these are what range
+    queries, sorting and aggregation use.
+
+    Returns:
+    dict: 'dates' (datetime) and 'amounts' (integer paise) by field name
+    """
+    fields = dict(application_data.get('form_data') or {})
+    fields.update({k: v for k, v in (application_data.get('basic_info') or {}).items() if v})
+    for i, director in enumerate(application_data.get('directors') or []):
+        fields.setdefault(f'director_dob_{i}', director.get('dob'))
+
+    dates, amounts = {}, {}
+    for key, value in fields.items():
+        if DATE_FIELDS.match(key):
+            parsed = parse_date(value)
+            if parsed:
+                dates[key] = parsed
+        elif LAKH_AMOUNT_FIELDS.match(key):
+            paise = parse_amount(value, unit=LAKH)
+            if paise is not None:
+                amounts[key] = paise
+    return {'dates': dates, 'amounts': amounts}
@@ -0,0 +1,310 @@
+# load_test.py
+"""
+Concurrent-session load test for the Streamlit app.
+
+Drives main_final1.py headlessly with Streamlit's AppTest harness. Each
+applicant session fills the basic information section, uploads fixture
+documents, clicks Next through every tab and submits; official sessions
+meanwhile search, open applications and list the dashboard. Every
+session runs in its own process, so CPU and RSS are measured per session.
+
+Concurrency is ramped level by level against a throwaway embedded store
+(MSME_DB_BACKEND=embedded); the report gives rerun latency percentiles
+and throughput per level, and the level where throughput stops growing.
+
+AppTest cannot drive st.file_uploader, so fixture documents are saved
+through the same Database.save_documents call the bundle upload uses and
+recorded in the session's documents, exactly as the uploader would.
+
+Usage:
+    python load_test.py                          # levels 1 2 4 8, one official each
+    python load_test.py --levels 4 8 16 32 --officials 4
+    python load_test.py --fixtures ./sample_docs --latency-budget 1.5
+"""
+
+import os
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main_final1.py")
+
+# Seconds a single rerun may take before AppTest gives up
+RERUN_TIMEOUT = 120
+# A level saturates when throughput grows by less than this over the last one
+SATURATION_GAIN = 0.10
+# ...or when p95 rerun latency exceeds this many seconds
+LATENCY_BUDGET_SECONDS = 2.0
+SEED_APPLICATIONS = 50
+# p95 of a name search against the seeded store, in seconds
+NAME_SEARCH_BUDGET_SECONDS = 0.25
+NAME_SEARCH_ROUNDS = 20
+# Misspelt names the trigram search should still find
+NAME_SEARCH_QUERIES = ["Ganesh Agro", "Lakshmi Tradres", "Sai Enginering", "Balaji Textile", "Om Food"]
+
+BASIC_INFORMATION = {
+    'enterprise_name': "Shree Ganesh Agro Industries",
+    'udyam_number': "UDYAM-MH-26-0012345",
+    'classification': "Micro",
+    'state': "Maharashtra",
+    'major_activity': "Manufacturing",
+    'mobile': "9876543210",
+    'email': "accounts@ganeshagro.example",
+    'gst_number': "27ABCDE1234F1Z5",
+    'pan': "ABCDE1234F",
+    'constitution': "Proprietorship"
+}
+
+OFFICIAL_QUERIES = ["Ganesh", "ABCDE", "Agro Industries", "98765", "Traders"]
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def fixture_documents(directory=None):
+    """(filename, content_type, bytes) of the documents each applicant uploads"""
+    if directory:
+        fixtures = []
+        for name in sorted(os.listdir(directory)):
+            content_type = "application/pdf" if name.lower().endswith(".pdf") else "image/jpeg"
+            with open(os.path.join(directory, name), 'rb') as f:
+                fixtures.append((name, content_type, f.read()))
+        return fixtures
+
+    # Without a fixture directory, make a one-page certificate-like PDF
+    import fitz
+    pdf = fitz.open()
+    page = pdf.new_page()
+    page.insert_text((72, 72), "Goods and Services Tax Registration Certificate\n"
+                               "GSTIN 27ABCDE1234F1Z5\nLegal Name SHREE GANESH AGRO INDUSTRIES")
+    return [("gst_certificate.pdf", "application/pdf", pdf.tobytes())]
+
+class Session:
+    """One scripted user: times every rerun of the app"""
+
+    def __init__(self, role):
+        from streamlit.testing.v1 import AppTest
+        self.role = role
+        self.app = AppTest.from_file(APP_SCRIPT, default_timeout=RERUN_TIMEOUT)
+        self.timings = []
+        self.errors = []
+
+    def rerun(self, step, element=None):
+        start = time.perf_counter()
+        (element or self.app).run()
+        self.timings.append((step, time.perf_counter() - start))
+        if self.app.exception:
+            self.errors.append(f"{step}: {self.app.exception[0].message}")
+
+    def button(self, key=None, label=None):
+        for button in self.app.button:
+            if (key and button.key == key) or (label and button.label == label):
+                return button
+        return None
+
+def run_applicant(session, fixtures):
+    session.rerun("first render")
+    for key, value in BASIC_INFORMATION.items():
+        session.rerun("fill field", session.app.text_input(key=key).input(value))
+
+    from database import get_database
+    from bundle_upload import route_by_filename
+    from application_numbers import allocate_application_number
+    # The uploader would allocate the number on the first upload
+    application_number = (session.app.session_state['application_number']
+                          or allocate_application_number(get_database()))
+    session.app.session_state['application_number'] = application_number
+    items = [
+        (data, {
+            'filename': name,
+            'document_type': route_by_filename(name) or "Other",
+            'section': "Load Test",
+            'content_type': content_type,
+            'application_number': application_number
+        })
+        for name, content_type, data in fixtures
+    ]
+    start = time.perf_counter()
+    file_ids = get_database().save_documents(items)
+    session.timings.append(("upload", time.perf_counter() - start))
+    documents = dict(session.app.session_state['documents'])
+    for (data, metadata), file_id in zip(items, file_ids):
+        if file_id:
+            documents[f"load_test_{file_id}"] = dict(metadata, file_id=file_id)
+    session.app.session_state['documents'] = documents
+
+    while True:
+        next_button = session.button(key="next_button")
+        if next_button is None:
+            break
+        session.rerun("next tab", next_button.click())
+    submit = session.button(key="submit_button")
+    if submit is None:
+        session.errors.append("submit button not reached")
+    else:
+        session.rerun("submit", submit.click())
+
+def run_official(session, rounds):
+    session.rerun("first render")
+    session.rerun("switch view", session.app.sidebar.radio[0].set_value("Bank Official"))
+    search = next(text_input for text_input in session.app.text_input if text_input.label.startswith("Search by"))
+    for i in range(rounds):
+        session.rerun("search", search.input(OFFICIAL_QUERIES[i % len(OFFICIAL_QUERIES)]))
+        view = next((button for button in session.app.button if str(button.key).startswith("view_")), None)
+        if view is not None:
+            session.rerun("view details", view.click())
+        search = next(text_input for text_input in session.app.text_input if text_input.label.startswith("Search by"))
+    show_all = next((checkbox for checkbox in session.app.checkbox if checkbox.label == "Show All Applications"), None)
+    if show_all is not None:
+        session.rerun("list applications", show_all.check())
+
+def run_session(role, fixtures, official_rounds):
+    """Runs in a fresh worker process; returns the session's measurements"""
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    session = Session(role)
+    try:
+        if role == 'applicant':
+            run_applicant(session, fixtures)
+        else:
+            run_official(session, official_rounds)
+    except Exception as e:
+        session.errors.append(f"{type(e).__name__}: {e}")
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        'role': role,
+        'timings': session.timings,
+        'errors': session.errors,
+        'wall_seconds': time.perf_counter() - start,
+        'cpu_seconds': (usage.ru_utime + usage.ru_stime) - (usage_before.ru_utime + usage_before.ru_stime),
+        # ru_maxrss is in kilobytes on Linux
+        'max_rss_mb': usage.ru_maxrss / 1024
+    }
+
+def seed_applications(count):
+    """Give officials something to search before the applicants arrive"""
+    from embedded_store import EmbeddedDatabase
+    database = EmbeddedDatabase()
+    names = ["Ganesh Agro Industries", "Lakshmi Traders", "Sai Engineering Works", "Balaji Textiles", "Om Food Products"]
+    for i in range(count):
+        database.save_application({
+            'application_number': f"MSMELOAD{i:06d}",
+            'status': "Submitted",
+            'basic_info': {
+                'enterprise_name': f"{names[i % len(names)]} {i}",
+                'pan': f"ABCDE{i:04d}F",
+                'mobile': f"98765{i:05d}"
+            },
+            'form_data': {'loan_branch': "Pune Main", 'proposed_facility_amount_0': "500000"}
+        })
+
+def time_name_search(rounds=NAME_SEARCH_ROUNDS):
+    """Time name searches straight against the seeded store; returns (p50, p95, misses)"""
+    from embedded_store import EmbeddedDatabase
+    database = EmbeddedDatabase()
+    timings, misses = [], set()
+    for _ in range(rounds):
+        for query in NAME_SEARCH_QUERIES:
+            start = time.perf_counter()
+            results, total = database.search_text(query)
+            timings.append(time.perf_counter() - start)
+            if not total:
+                misses.add(query)
+    return percentile(timings, 0.50), percentile(timings, 0.95), sorted(misses)
+
+def run_level(applicants, officials, fixtures, official_rounds):
+    context = multiprocessing.get_context('spawn')
+    roles = ['applicant'] * applicants + ['official'] * officials
+    start = time.perf_counter()
+    # One process per session, so each session's CPU and RSS are its own
+    with context.Pool(processes=len(roles), maxtasksperchild=1) as pool:
+        pending = [pool.apply_async(run_session, (role, fixtures, official_rounds)) for role in roles]
+        sessions = [result.get() for result in pending]
+    wall = time.perf_counter() - start
+
+    # First renders include process cold start; report them apart
+    reruns = [seconds for s in sessions for step, seconds in s['timings'] if step != "first render"]
+    first = [seconds for s in sessions for step, seconds in s['timings'] if step == "first render"]
+    return {
+        'applicants': applicants,
+        'officials': officials,
+        'sessions': sessions,
+        'reruns': len(reruns),
+        'throughput': len(reruns) / wall if wall else 0.0,
+        'p50': percentile(reruns, 0.50),
+        'p95': percentile(reruns, 0.95),
+        'p99': percentile(reruns, 0.99),
+        'first_render_p50': percentile(first, 0.50),
+        'cpu_per_session': sum(s['cpu_seconds'] for s in sessions) / len(sessions),
+        'max_rss_mb': max(s['max_rss_mb'] for s in sessions),
+        'errors': [error for s in sessions for error in s['errors']]
+    }
+
+def find_saturation(levels, latency_budget):
+    """The last level before throughput stops growing or p95 breaks the budget"""
+    for previous, level in zip(levels, levels[1:]):
+        if level['throughput'] < previous['throughput'] * (1 + SATURATION_GAIN) or level['p95'] > latency_budget:
+            return previous
+    return None
+
+def print_level(level):
+    print(f"{level['applicants']:>4} applicants + {level['officials']} officials: "
+          f"{level['reruns']} reruns, {level['throughput']:.1f}/s, "
+          f"p50 {level['p50'] * 1000:.0f} ms, p95 {level['p95'] * 1000:.0f} ms, p99 {level['p99'] * 1000:.0f} ms, "
+          f"first render {level['first_render_p50']:.1f} s, "
+          f"CPU {level['cpu_per_session']:.1f} s/session, RSS max {level['max_rss_mb']:.0f} MB")
+    for error in level['errors'][:5]:
+        print(f"      ! {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the app with concurrent headless sessions")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Concurrent applicant sessions to ramp through")
+    parser.add_argument("--officials", type=int, default=1, help="Concurrent official sessions per level")
+    parser.add_argument("--official-rounds", type=int, default=5, help="Searches per official session")
+    parser.add_argument("--fixtures", default=None, help="Directory of documents each applicant uploads")
+    parser.add_argument("--latency-budget", type=float, default=LATENCY_BUDGET_SECONDS,
+                        help="p95 rerun latency (seconds) counted as saturated")
+    parser.add_argument("--seed", type=int, default=SEED_APPLICATIONS, help="Applications seeded before the run")
+    parser.add_argument("--search-budget", type=float, default=NAME_SEARCH_BUDGET_SECONDS,
+                        help="p95 name search time (seconds) the run must stay within")
+    args = parser.parse_args()
+
+    # Worker processes inherit the stand-in store through the environment
+    store = tempfile.mkdtemp(prefix="msme_load_test_")
+    os.environ['MSME_DB_BACKEND'] = 'embedded'
+    os.environ['MSME_EMBEDDED_DIR'] = store
+    os.environ.setdefault('MSME_BRANCH_CODE', "LOAD")
+    seed_applications(args.seed)
+    fixtures = fixture_documents(args.fixtures)
+    print(f"Store {store}, {len(fixtures)} fixture documents per applicant")
+
+    search_p50, search_p95, misses = time_name_search()
+    print(f"Name search over {args.seed} applications: p50 {search_p50 * 1000:.1f} ms, p95 {search_p95 * 1000:.1f} ms")
+    if misses:
+        print(f"      ! no results for {', '.join(misses)}")
+    search_ok = search_p95 <= args.search_budget and not misses
+    if not search_ok:
+        print(f"      ! name search misses its {args.search_budget * 1000:.0f} ms budget or its queries")
+
+    levels = []
+    for applicants in args.levels:
+        level = run_level(applicants, args.officials, fixtures, args.official_rounds)
+        print_level(level)
+        levels.append(level)
+
+    saturated = find_saturation(levels, args.latency_budget)
+    if saturated:
+        print(f"Saturation point: about {saturated['applicants']} concurrent applicants "
+              f"({saturated['throughput']:.1f} reruns/s)")
+    else:
+        print("No saturation within the levels tested")
+    if not search_ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
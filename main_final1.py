@@ -1,22 +1,31 @@
-import streamlit as st
-from database import Database
-import uuid
-from datetime import datetime
-from utils import colorful_document_upload
-from document_extraction import extract_data_from_document
-from sections import (
-    basic_information_section,
-    proprietor_partners_directors_section,
-    credit_facilities_section,
-    collateral_and_guarantor_section,
-    past_performance_and_business_relations_section,
-    associate_concerns_and_statutory_obligations_section,
-    undertakings_and_document_upload_section,
-    review_section
-)
+from startup_profile import startup_step, finish_startup
+from rerun_profile import profile_rerun, tag_rerun, PROFILE_ADMIN_TOGGLE, SESSION_TOGGLE_KEY
+with startup_step("import streamlit"):
+    import streamlit as st
+with startup_step("import database"):
+    from database import get_database
+import os
+import tempfile
+from datetime import datetime, timedelta
+with startup_step("import utils"):
+    from utils import colorful_document_upload, bundle_document_upload, summary_pdf_download, upload_hash
+    from application_numbers import ensure_application_number, ApplicationNumberUnavailable
+    from amounts import parse_amount, paise_to_lakhs, LAKH
+with startup_step("import sections"):
+    from sections import (
+        basic_information_section,
+        proprietor_partners_directors_section,
+        credit_facilities_section,
+        collateral_and_guarantor_section,
+        past_performance_and_business_relations_section,
+        associate_concerns_and_statutory_obligations_section,
+        undertakings_and_document_upload_section,
+        review_section
+    )
 
 # Initialize database
-db = Database()
+with startup_step("init database"):
+    db = get_database()
 
 # Page config
 st.set_page_config(
@@ -25,18 +34,70 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-def generate_application_number():
-    """Generate unique application number"""
-    timestamp = datetime.now().strftime('%Y%m%d%H%M')
-    unique_id = str(uuid.uuid4().hex)[:6]
-    return f"MSME{timestamp}{unique_id}"
+# Statuses an official can move an application to
+OFFICIAL_STATUSES = ["Under Review", "Additional Documents Required", "Approved", "Rejected"]
+
+# Seconds between checks of the extraction queue while jobs are still running
+EXTRACTION_POLL_SECONDS = 1.5
+
+def extract_data_from_document(file, document_type):
+    """
+    Extract form fields from an upload through the extraction queue.
+
+    Returns {"pending": True} until a worker has finished the job; the
+    applicant view polls the queue until then. A failed job offers a
+    button to try again. Without running workers the document is
+    extracted in the request, as before.
+    """
+    from extraction_queue import get_queue
+    from upload_buffers import upload_buffer
+    tag_rerun('document_types', document_type, append=True)
+    queue = get_queue()
+    if not queue.workers_alive():
+        # document_extraction pulls in pytesseract, fitz, OpenCV and PIL;
+        # sessions that never upload a document never pay for them
+        from document_extraction import extract_data_from_document as extract
+        return extract(file, document_type)
+
+    job = queue.submit(upload_buffer(file), file.name, file.type, document_type, sha256=upload_hash(file))
+    if job['state'] == 'done':
+        return job['result']
+    if job['state'] == 'failed':
+        if st.button(f"Try reading {file.name} again", key=f"retry_{job['job_key']}"):
+            queue.submit(upload_buffer(file), file.name, file.type, document_type,
+                         sha256=upload_hash(file), retry_failed=True)
+            st.rerun()
+        return {"error": f"Could not extract data from {document_type}: {job['error']}"}
+    st.session_state.setdefault('pending_extractions', set()).add(job['job_key'])
+    st.session_state.extraction_pending = True
+    return {"pending": True}
+
+@st.fragment(run_every=EXTRACTION_POLL_SECONDS)
+def poll_extractions():
+    """
+    Check the extraction queue in the background of the page.
+
+    Only this fragment reruns on the timer, so polling holds no thread
+    and leaves the form responsive; the whole page reruns once a job
+    this session is waiting for has finished, to fill its fields in.
+    """
+    from extraction_queue import get_queue
+    queue = get_queue()
+    pending = st.session_state.get('pending_extractions', set())
+    finished = {key for key in pending
+                if (queue.get(key) or {}).get('state') not in ('pending', 'running')}
+    if finished:
+        pending -= finished
+        st.rerun()
+    st.caption("Reading uploaded documents...")
 
 def initialize_session_state():
     """Initialize session state variables"""
     if 'current_tab' not in st.session_state:
         st.session_state.current_tab = 0
     if 'application_number' not in st.session_state:
-        st.session_state.application_number = generate_application_number()
+        # Allocated on the first save or upload, not for every visitor
+        st.session_state.application_number = None
     if 'form_data' not in st.session_state:
         st.session_state.form_data = {}
     if 'documents' not in st.session_state:
@@ -67,8 +128,8 @@ def save_application_data():
     """Save all application data to database"""
     try:
         application_data = {
-            'application_number': st.session_state.application_number,
-            'submission_date': datetime.now().isoformat(),
+            'submission_date': datetime.now(),
+            'last_updated': datetime.now(),
             'status': st.session_state.status,
             'basic_info': {
                 'enterprise_name': st.session_state.get('enterprise_name'),
@@ -101,10 +162,19 @@ def save_application_data():
             ],
             'form_data': st.session_state.get('form_data', {})
         }
+        try:
+            application_data['application_number'] = ensure_application_number()
+        except ApplicationNumberUnavailable:
+            # The save is queued; the number is issued when it reaches the database
+            pass
         
         if st.session_state.get('application_id'):
+            # After the first save, status only changes through status events
+            application_data.pop('status')
             result = db.update_application(st.session_state.application_id, application_data)
         else:
+            # submission_date moves with every save; created_at keeps the first one
+            application_data['created_at'] = application_data['submission_date']
             result = db.save_application(application_data)
             st.session_state.application_id = result.inserted_id
         
@@ -118,18 +188,59 @@ def main():
 
     # User/Admin Switch in sidebar
     user_type = st.sidebar.radio("Select User Type", ["Applicant", "Bank Official"])
+    tag_rerun('view', user_type)
     
     if user_type == "Bank Official":
+        if PROFILE_ADMIN_TOGGLE:
+            st.sidebar.checkbox("Profile this session's reruns", key=SESSION_TOGGLE_KEY)
         main_official_view()
     else:
         main_applicant_view()
 
+def render_database_status():
+    """Show in the sidebar while the database is still connecting, unreachable or unhealthy"""
+    health = db.health()
+    if db.is_ready() and health['breaker']['state'] == 'closed':
+        return
+    pending = db.pending_write_count()
+    if db.readiness['state'] == 'failed':
+        st.sidebar.error(f"Database unavailable, {pending} change(s) waiting to be saved")
+    elif db.readiness['state'] == 'ready':
+        st.sidebar.warning(f"Database is not responding; some details may be missing and "
+                           f"{pending} change(s) are queued")
+    else:
+        st.sidebar.warning(f"Connecting to database… {pending} change(s) queued")
+
+def render_database_metrics():
+    """Timeouts, retries and the circuit breaker, for officials"""
+    health = db.health()
+    with st.sidebar.expander("Database health"):
+        breaker = health['breaker']
+        st.write(f"Circuit breaker: **{breaker['state']}**"
+                 + (f" for {breaker['open_for_seconds']:.0f}s" if breaker['state'] != 'closed' else ""))
+        st.write(f"Queued writes: {health['pending_writes']}")
+        counters = health['counters']
+        for name in ('timeouts', 'connection_errors', 'retries', 'short_circuited', 'queued_writes'):
+            st.write(f"{name.replace('_', ' ').capitalize()}: {counters.get(name, 0)}")
+        if breaker.get('opens'):
+            st.write(f"Breaker opened {breaker['opens']} time(s)")
+        if health['latencies']:
+            st.dataframe([
+                {'Operation': operation, 'Calls': stats['calls'],
+                 'Mean (ms)': round(stats['mean_ms']), 'Max (ms)': round(stats['max_ms'])}
+                for operation, stats in sorted(health['latencies'].items())
+            ])
+
 def main_applicant_view():
     st.title("MSME Loan Application")
     
     # Application number and status display in sidebar
-    st.sidebar.success(f"Application Number: {st.session_state.application_number}")
+    st.sidebar.success(f"Application Number: {st.session_state.application_number or 'assigned on first save'}")
     st.sidebar.info(f"Status: {st.session_state.status}")
+    render_database_status()
+
+    with st.expander("📦 Upload all documents at once"):
+        bundle_document_upload(auto_fill_field)
 
     # Define sections
     sections = [
@@ -148,6 +259,7 @@ def main_applicant_view():
     tabs = st.tabs([section[0] for section in sections])
 
     # Handle tab selection
+    tag_rerun('tab', sections[st.session_state.current_tab][0])
     for i, tab in enumerate(tabs):
         with tab:
             if i == st.session_state.current_tab:
@@ -183,6 +295,12 @@ def main_applicant_view():
         else:
             if st.button("Submit Application", type="primary", key="submit_button"):
                 if save_application_data():
+                    db.update_statuses(
+                        [{'_id': st.session_state.application_id,
+                          'application_number': st.session_state.application_number,
+                          'status': st.session_state.status}],
+                        "Submitted", "Submitted by applicant", changed_by="Applicant"
+                    )
                     st.session_state.status = "Submitted"
                     st.balloons()
                     st.success(f"""
@@ -192,92 +310,115 @@ def main_applicant_view():
                     Please save this number for future reference.""")
                     st.info("A confirmation email will be sent to your registered email address.")
 
+    if st.session_state.pop('extraction_pending', False):
+        # The fields fill in when the job is done
+        poll_extractions()
+
 def main_official_view():
     st.title("Bank Official Dashboard")
+    render_database_status()
+    render_database_metrics()
     
     # Search functionality
-    search_col1, search_col2 = st.columns(2)
+    search_col1, search_col2 = st.columns([3, 1])
     with search_col1:
-        search_application = st.text_input("Enter Application Number")
+        search_query = st.text_input("Search by Application Number, Enterprise Name, PAN, GSTIN, Udyam or Mobile")
     with search_col2:
-        if st.button("Search"):
-            if search_application:
-                application_data = db.get_application({"application_number": search_application})
-                if application_data:
-                    display_application_details(application_data)
-                else:
-                    st.error("Application not found")
+        page_size = st.selectbox("Results per page", [10, 20, 50], index=1)
+
+    if search_query:
+        display_search_results(search_query, page_size)
+
+    application_number = st.session_state.get('official_application_number')
+    if application_number:
+        # The lookups are independent, so issue them all at once
+        pending = db.fetch_concurrently({
+            'application': (db.get_application, ({"application_number": application_number},)),
+            'documents': (db.get_application_documents, (application_number, False)),
+            'previews': (db.get_document_previews, (application_number,)),
+            'history': (db.get_status_events, (application_number,)),
+            'related': (db.get_related_applications, (application_number,))
+        })
+        display_application_details(pending)
     
     # Show all applications
     if st.checkbox("Show All Applications"):
         display_all_applications()
 
-def display_application_details(application_data):
-    try:
-        if not application_data:
-            st.error("No application data available")
-            return
+    with st.expander("Export for MIS Reporting"):
+        display_export_form()
+
+def display_search_results(search_query, page_size):
+    """List ranked search results and let the official open one"""
+    if st.session_state.get('official_search_query') != search_query:
+        st.session_state.official_search_query = search_query
+        st.session_state.official_search_page = 0
+    page = st.session_state.get('official_search_page', 0)
 
+    results, total = db.search_text(search_query, page, page_size)
+    if not results:
+        st.info("No matching applications")
+        return
+
+    st.caption(f"{total} matching applications")
+    for app in results:
+        basic_info = app.get('basic_info', {})
+        col1, col2, col3, col4 = st.columns([2, 3, 2, 1])
+        col1.write(app.get('application_number'))
+        col2.write(basic_info.get('enterprise_name') or 'N/A')
+        col3.write(app.get('status') or 'N/A')
+        if col4.button("View", key=f"view_{app['_id']}"):
+            # Remember the selection so the details survive later reruns
+            st.session_state.official_application_number = app.get('application_number')
+
+    pages = (total + page_size - 1) // page_size
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("← Previous Page", disabled=page == 0):
+            st.session_state.official_search_page = page - 1
+            st.rerun()
+    with col2:
+        st.write(f"Page {page + 1} of {pages}")
+    with col3:
+        if st.button("Next Page →", disabled=page + 1 >= pages):
+            st.session_state.official_search_page = page + 1
+            st.rerun()
+
+def display_application_details(pending):
+    """Render application details, filling each part as its query completes"""
+    application_data = None
+    try:
         st.subheader("Application Details")
-        
-        # Basic Information
-        st.write("### Basic Information")
-        basic_info = application_data.get('basic_info', {})
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.write("**Enterprise Details**")
-            st.write(f"Enterprise Name: {basic_info.get('enterprise_name', 'N/A')}")
-            st.write(f"Status: {application_data.get('status', 'N/A')}")
-            st.write(f"Application Number: {application_data.get('application_number', 'N/A')}")
-            st.write(f"GST Number: {basic_info.get('gst_number', 'N/A')}")
-            st.write(f"PAN: {basic_info.get('pan', 'N/A')}")
-        
-        with col2:
-            st.write("**Contact Details**")
-            st.write(f"Mobile: {basic_info.get('mobile', 'N/A')}")
-            st.write(f"Email: {basic_info.get('email', 'N/A')}")
-            st.write(f"Address: {basic_info.get('address', 'N/A')}")
-            st.write(f"State: {basic_info.get('state', 'N/A')}")
-
-        # Documents Section
-        st.write("### Uploaded Documents")
-        documents = db.get_application_documents(application_data.get('application_number'))
-        
-        if documents:
-            for doc in documents:
-                with st.expander(f"📄 {doc.get('document_type', 'Document')}"):
-                    st.write(f"Filename: {doc.get('filename', 'N/A')}")
-                    st.write(f"Upload Date: {doc.get('upload_date', 'N/A')}")
-                    if 'data' in doc:
-                        st.download_button(
-                            label="Download Document",
-                            data=doc['data'],
-                            file_name=doc.get('filename', 'document.pdf'),
-                            mime=doc.get('content_type', 'application/pdf')
-                        )
-        else:
-            st.info("No documents uploaded yet")
 
-        # Status Update
-        st.write("### Update Status")
-        new_status = st.selectbox(
-            "Select New Status",
-            ["Under Review", "Additional Documents Required", "Approved", "Rejected"]
-        )
-        remarks = st.text_area("Add Remarks", height=100)
-        
-        if st.button("Update Status"):
-            update_data = {
-                "status": new_status,
-                "last_updated": datetime.now().isoformat(),
-                "remarks": remarks
-            }
-            if db.update_application(application_data['_id'], update_data):
-                st.success("Status updated successfully!")
-                st.rerun()
-            else:
-                st.error("Failed to update status")
+        # Each part of the page with the query results it needs.
+        # The layout is reserved up front; results may arrive in any order.
+        parts = {
+            'application': (['application'], render_basic_information),
+            'related': (['related'], render_related_applications),
+            'documents': (['documents', 'previews'], render_documents),
+            'history': (['history'], render_status_history)
+        }
+        containers = {name: st.container() for name in parts}
+        status_container = st.container()
+
+        results = {}
+        for name, result in db.iter_completed(pending):
+            results[name] = result
+            if name == 'application':
+                application_data = result
+                if not application_data:
+                    with containers['application']:
+                        st.error("Application not found")
+                    continue
+            for part, (needs, renderer) in list(parts.items()):
+                if all(need in results for need in needs) and results.get('application', True):
+                    with containers[part]:
+                        renderer(*[results[need] for need in needs])
+                    del parts[part]
+
+        if application_data:
+            with status_container:
+                render_status_update(application_data)
 
     except Exception as e:
         st.error(f"Error displaying application details: {str(e)}")
@@ -285,22 +426,244 @@ def display_application_details(application_data):
             st.write(e)
             st.json(application_data)
 
+def render_basic_information(application_data):
+    # Basic Information
+    st.write("### Basic Information")
+    basic_info = application_data.get('basic_info', {})
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**Enterprise Details**")
+        st.write(f"Enterprise Name: {basic_info.get('enterprise_name', 'N/A')}")
+        st.write(f"Status: {application_data.get('status', 'N/A')}")
+        st.write(f"Application Number: {application_data.get('application_number', 'N/A')}")
+        st.write(f"GST Number: {basic_info.get('gst_number', 'N/A')}")
+        st.write(f"PAN: {basic_info.get('pan', 'N/A')}")
+    
+    with col2:
+        st.write("**Contact Details**")
+        st.write(f"Mobile: {basic_info.get('mobile', 'N/A')}")
+        st.write(f"Email: {basic_info.get('email', 'N/A')}")
+        st.write(f"Address: {basic_info.get('address', 'N/A')}")
+        st.write(f"State: {basic_info.get('state', 'N/A')}")
+
+    summary_pdf_download(application_data['application_number'], "official")
+
+def render_related_applications(related):
+    if not related:
+        return
+    st.warning(f"⚠️ {len(related)} possible duplicate or related application flag(s)")
+    for flag in related:
+        st.write(f"- **{flag['application_number']}** ({flag.get('status') or 'N/A'}): {flag['reason']}")
+
+def render_documents(documents, previews):
+    # Documents Section
+    st.write("### Uploaded Documents")
+    
+    if documents:
+        for doc in documents:
+            with st.expander(f"📄 {doc.get('document_type', 'Document')}", expanded=True):
+                col1, col2 = st.columns([1, 2])
+                with col1:
+                    preview = previews.get(doc['file_id'])
+                    if preview:
+                        st.image(preview, use_container_width=True)
+                    else:
+                        st.caption("No preview available")
+                with col2:
+                    st.write(f"Filename: {doc.get('filename', 'N/A')}")
+                    st.write(f"Upload Date: {doc.get('upload_date', 'N/A')}")
+                    st.write(f"Size: {doc.get('length', 0) / 1024:.0f} KB")
+                    compression = doc.get('compression') or {}
+                    if compression.get('method'):
+                        st.caption(f"Compressed {compression['ratio']}x from {compression['original_size'] / 1024:.0f} KB")
+                    # Only fetch the full file when the official asks for it
+                    if st.button("Prepare Download", key=f"prepare_{doc['file_id']}"):
+                        grid_out = db.get_document(doc['file_id'])
+                        if grid_out:
+                            st.download_button(
+                                label="Download Document",
+                                data=grid_out.read(),
+                                file_name=doc.get('filename', 'document.pdf'),
+                                mime=doc.get('content_type', 'application/pdf'),
+                                key=f"download_{doc['file_id']}"
+                            )
+    else:
+        st.info("No documents uploaded yet")
+
+def render_status_history(history):
+    st.write("### Status History")
+    if not history:
+        st.info("No status changes recorded yet")
+        return
+    for event in history:
+        remarks = f" — {event['remarks']}" if event.get('remarks') else ""
+        st.write(
+            f"- {event['timestamp']:%d/%m/%Y %H:%M}: {event.get('from_status') or 'N/A'} → "
+            f"**{event['status']}** by {event.get('changed_by', 'N/A')}{remarks}"
+        )
+
+def render_status_update(application_data):
+    # Status Update
+    st.write("### Update Status")
+    new_status = st.selectbox(
+        "Select New Status",
+        OFFICIAL_STATUSES
+    )
+    remarks = st.text_area("Add Remarks", height=100)
+    
+    if st.button("Update Status"):
+        if db.update_statuses([application_data], new_status, remarks):
+            st.success("Status updated successfully!")
+            st.rerun()
+        else:
+            st.error("Failed to update status")
+
+def render_bulk_status_update(applications):
+    """Approve, reject or request documents for many applications in one action"""
+    st.write("### Bulk Status Update")
+    by_number = {app['application_number']: app for app in applications if app.get('application_number')}
+    selected = st.multiselect(
+        "Select Applications",
+        list(by_number),
+        format_func=lambda number: f"{number} — {by_number[number].get('enterprise_name') or 'N/A'} ({by_number[number].get('status') or 'N/A'})"
+    )
+    col1, col2 = st.columns(2)
+    with col1:
+        new_status = st.selectbox("New Status", OFFICIAL_STATUSES, key="bulk_status")
+    with col2:
+        remarks = st.text_input("Remarks", key="bulk_remarks")
+
+    if st.button("Apply to Selected", disabled=not selected):
+        updated = db.update_statuses([by_number[number] for number in selected], new_status, remarks)
+        st.success(f"Updated {updated} of {len(selected)} applications to {new_status}")
+        st.rerun()
+
+def display_export_form():
+    """Stream a filtered export to a file and offer it for download"""
+    from application_export import export_applications, export_files, export_key, build_criteria
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    report_type = st.radio("Report", ["Summary", "Full application detail"], horizontal=True)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        export_format = st.selectbox("Format", ["csv", "parquet"])
+    with col2:
+        statuses = st.multiselect(
+            "Status",
+            ["Draft", "Submitted", "Under Review", "Additional Documents Required", "Approved", "Rejected"]
+        )
+    with col3:
+        date_range = st.date_input("Submission Date Range", value=[])
+
+    if st.button("Generate Export"):
+        date_from = date_to = None
+        if len(date_range) == 2:
+            date_from = datetime.combine(date_range[0], datetime.min.time())
+            date_to = datetime.combine(date_range[1], datetime.min.time()) + timedelta(days=1)
+        summaries = report_type == "Summary"
+        # One file per session and filters: officials exporting at once never
+        # share a file, and a repeated click resumes this export's checkpoint
+        key = export_key(build_criteria(statuses, date_from, date_to), export_format, summaries)
+        ctx = get_script_run_ctx()
+        session = ctx.session_id if ctx else "local"
+        out_path = os.path.join(tempfile.gettempdir(), f"msme_applications_{session}_{key[:16]}.{export_format}")
+        with st.spinner("Exporting applications..."):
+            rows = export_applications(db, out_path, export_format, statuses, date_from, date_to,
+                                       resume=True, summaries=summaries)
+        st.success(f"Exported {rows} applications")
+
+        files = export_files(out_path)
+        if len(files) > 1:
+            # Large Parquet exports come in parts; hand them over together
+            import zipfile
+            zip_path = f"{os.path.splitext(out_path)[0]}.zip"
+            with zipfile.ZipFile(zip_path, 'w') as archive:
+                for part in files:
+                    archive.write(part, os.path.basename(part).replace(f"_{session}_{key[:16]}", ""))
+            download_path, mime = zip_path, "application/zip"
+        else:
+            download_path = out_path
+            mime = "text/csv" if export_format == "csv" else "application/octet-stream"
+        with open(download_path, 'rb') as export_file:
+            st.download_button(
+                label="Download Export",
+                data=export_file,
+                file_name=os.path.basename(download_path).replace(f"_{session}_{key[:16]}", ""),
+                mime=mime
+            )
+
+def summary_filters():
+    """Submission date and proposed amount range filters, as summary criteria"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        date_range = st.date_input("Submitted between", value=[], key="dashboard_dates")
+    with col2:
+        min_lakhs = st.number_input("Proposed amount from (lacs)", min_value=0.0, value=0.0, key="dashboard_min_amount")
+    with col3:
+        max_lakhs = st.number_input("to (lacs, 0 = no limit)", min_value=0.0, value=0.0, key="dashboard_max_amount")
+
+    # Both ranges are answered from the summary indexes
+    criteria = {}
+    if len(date_range) == 2:
+        criteria['submission_date'] = {
+            '$gte': datetime.combine(date_range[0], datetime.min.time()),
+            '$lt': datetime.combine(date_range[1], datetime.min.time()) + timedelta(days=1)
+        }
+    amount_range = {}
+    if min_lakhs:
+        amount_range['$gte'] = parse_amount(min_lakhs, unit=LAKH)
+    if max_lakhs:
+        amount_range['$lte'] = parse_amount(max_lakhs, unit=LAKH)
+    if amount_range:
+        criteria['total_proposed_paise'] = amount_range
+    return criteria
+
 def display_all_applications():
-    applications = db.get_all_applications()
+    criteria = summary_filters()
+    # Read the narrow summary rows, never the full form_data payloads
+    pending = db.fetch_concurrently({
+        'summaries': (db.get_application_summaries, (criteria,)),
+        'by_status': (db.get_status_counts, ('status',)),
+        'by_branch': (db.get_status_counts, ('loan_branch',))
+    })
+    results = dict(db.iter_completed(pending))
+    applications = results['summaries']
     
     if applications:
         # Create a DataFrame for better visualization
         import pandas as pd
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Applications by Status**")
+            st.dataframe(pd.DataFrame([
+                {'Status': row['_id'] or 'N/A', 'Applications': row['count'], 'Proposed Amount (lacs)': paise_to_lakhs(row['total_proposed_paise'])}
+                for row in results['by_status']
+            ]))
+        with col2:
+            st.write("**Applications by Branch**")
+            st.dataframe(pd.DataFrame([
+                {'Branch': row['_id'] or 'N/A', 'Applications': row['count'], 'Proposed Amount (lacs)': paise_to_lakhs(row['total_proposed_paise'])}
+                for row in results['by_branch']
+            ]))
+
         df = pd.DataFrame([{
             'Application Number': app.get('application_number'),
-            'Enterprise Name': app.get('basic_info', {}).get('enterprise_name'),
+            'Enterprise Name': app.get('enterprise_name'),
             'Status': app.get('status'),
+            'Branch': app.get('loan_branch'),
+            'State': app.get('state'),
+            'Proposed Amount (lacs)': paise_to_lakhs(app.get('total_proposed_paise')),
             'Submission Date': app.get('submission_date')
         } for app in applications])
         
         st.dataframe(df)
+        render_bulk_status_update(applications)
     else:
         st.info("No applications found")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with startup_step("first page render"), profile_rerun():
+        main()
+    finish_startup()
\ No newline at end of file
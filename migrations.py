@@ -0,0 +1,160 @@
+# migrations.py
+"""
+Resumable, rate limited backfills of existing documents.
+
+Each migration walks one collection in _id order, a batch at a time,
+turns every document into bulk_write requests and applies them. Progress
+is checkpointed in the 'migrations' collection after every batch, so an
+interrupted run continues where it stopped; per-batch throughput is kept
+in 'migration_batches'.
+
+Usage:
+    python migrations.py --list
+    python migrations.py application_fields summaries --dry-run
+    python migrations.py application_fields blocking_keys summaries file_hashes --rate 200
+    python migrations.py summaries --restart          # ignore the checkpoint
+"""
+
+import time
+import argparse
+from datetime import datetime
+from pymongo import UpdateOne, DeleteMany, InsertOne
+from database import get_database
+from application_search import build_search_keys
+from duplicate_detection import build_blocking_keys
+from application_summaries import build_summary, SUMMARY_SOURCE_PROJECTION
+from field_types import typed_fields, parse_date
+from upload_buffers import content_hash
+
+MIGRATION_BATCH_SIZE = 500
+# Documents migrated per second; keeps the primary responsive for the app
+MIGRATION_DOCS_PER_SECOND = 500
+
+def migrate_application_fields(database, app, dry_run=False):
+    """Typed dates and amounts, and search keys"""
+    update = {
+        'search': build_search_keys(app),
+        'typed': typed_fields(app)
+    }
+    for field in ('submission_date', 'last_updated'):
+        if isinstance(app.get(field), str):
+            update[field] = parse_date(app[field])
+    return {'applications': [UpdateOne({'_id': app['_id']}, {'$set': update})]}
+
+def migrate_blocking_keys(database, app, dry_run=False):
+    application_number = app.get('application_number')
+    if not application_number:
+        return {}
+    return {'blocking_keys': [DeleteMany({'application_number': application_number})] + [
+        InsertOne(dict(entry, application_number=application_number))
+        for entry in build_blocking_keys(app)
+    ]}
+
+def migrate_summaries(database, app, dry_run=False):
+    return {'application_summaries': [
+        UpdateOne({'_id': app['_id']}, {'$set': build_summary(app)}, upsert=True)
+    ]}
+
+def migrate_file_hashes(database, grid_file, dry_run=False):
+    """Content hash of GridFS files stored before uploads were hashed"""
+    # A dry run only counts the files; reading every one would cost as much as the migration
+    sha256 = None if dry_run else content_hash(database.fs.get(grid_file['_id']).read())
+    return {'fs.files': [UpdateOne({'_id': grid_file['_id']}, {'$set': {'metadata.sha256': sha256}})]}
+
+# name -> (collection, filter, projection, function turning a document into requests);
+# the functions are called with (database, document, dry_run)
+MIGRATIONS = {
+    'application_fields': ('applications', {}, {'form_data': 1, 'basic_info': 1, 'directors': 1,
+                                                'submission_date': 1, 'last_updated': 1}, migrate_application_fields),
+    'blocking_keys': ('applications', {}, {'application_number': 1, 'basic_info': 1, 'directors': 1,
+                                           'form_data': 1}, migrate_blocking_keys),
+    # Same rebuild again, replacing plaintext Aadhaar keys with their HMAC
+    'hashed_aadhaar_keys': ('applications', {}, {'application_number': 1, 'basic_info': 1, 'directors': 1,
+                                                 'form_data': 1}, migrate_blocking_keys),
+    'summaries': ('applications', {}, SUMMARY_SOURCE_PROJECTION, migrate_summaries),
+    'file_hashes': ('fs.files', {'metadata.sha256': {'$exists': False}}, {'_id': 1}, migrate_file_hashes)
+}
+
+def run_migration(database, name, batch_size=MIGRATION_BATCH_SIZE, docs_per_second=MIGRATION_DOCS_PER_SECOND,
+                  dry_run=False, restart=False):
+    """
+    Run one migration from its checkpoint.
+
+    Returns:
+    dict: Documents seen and write requests made (or that would be, in a dry run)
+    """
+    collection, criteria, projection, migrate = MIGRATIONS[name]
+    checkpoint = None if restart else database.get_migration_checkpoint(name)
+    if checkpoint and checkpoint.get('done') and not dry_run:
+        print(f"{name}: already complete ({checkpoint['documents']} documents)")
+        return {'documents': 0, 'requests': 0}
+    after_id = checkpoint.get('last_id') if checkpoint else None
+    totals = {'documents': checkpoint.get('documents', 0) if checkpoint else 0, 'requests': 0}
+    if after_id:
+        print(f"{name}: resuming after {after_id}")
+
+    for number, batch in enumerate(database.iter_application_batches(
+            criteria, projection, batch_size, after_id, collection), 1):
+        began = time.monotonic()
+        request_count = database.apply_migration(migrate, batch, dry_run)
+
+        seconds = time.monotonic() - began
+        totals['documents'] += len(batch)
+        totals['requests'] += request_count
+        rate = len(batch) / seconds if seconds else float('inf')
+        print(f"{name} batch {number}: {len(batch)} documents, {request_count} writes, "
+              f"{seconds:.2f}s ({rate:.0f} docs/s){' [dry run]' if dry_run else ''}")
+
+        if not dry_run:
+            database.record_migration_batch({
+                'migration': name, 'batch': number, 'first_id': batch[0]['_id'], 'last_id': batch[-1]['_id'],
+                'documents': len(batch), 'writes': request_count, 'seconds': seconds,
+                'docs_per_second': rate, 'finished_at': datetime.now()
+            })
+            database.save_migration_checkpoint(name, {
+                'last_id': batch[-1]['_id'], 'documents': totals['documents'],
+                'updated_at': datetime.now(), 'done': False
+            })
+
+        # Hold the batch to the configured rate
+        pause = len(batch) / docs_per_second - (time.monotonic() - began)
+        if pause > 0:
+            time.sleep(pause)
+
+    if not dry_run:
+        database.save_migration_checkpoint(name, {'done': True, 'updated_at': datetime.now()})
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill existing documents in resumable batches")
+    parser.add_argument("migrations", nargs="*", help="Migrations to run, in order")
+    parser.add_argument("--list", action="store_true", help="List migrations and their progress")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=MIGRATION_DOCS_PER_SECOND,
+                        help="Maximum documents migrated per second")
+    parser.add_argument("--dry-run", action="store_true", help="Count the writes without making them")
+    parser.add_argument("--restart", action="store_true", help="Start from the beginning, ignoring checkpoints")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.migrations if name not in MIGRATIONS]
+    if unknown:
+        parser.error(f"unknown migration(s): {', '.join(unknown)}; choose from {', '.join(MIGRATIONS)}")
+
+    # MSME_DB_BACKEND picks the store, as for the app
+    database = get_database().wait_until_ready()
+    if args.list or not args.migrations:
+        for name, (collection, *_) in MIGRATIONS.items():
+            checkpoint = database.get_migration_checkpoint(name) or {}
+            state = 'done' if checkpoint.get('done') else (
+                f"at {checkpoint['last_id']}" if checkpoint.get('last_id') else 'not started')
+            print(f"{name:<20}{collection:<14}{checkpoint.get('documents', 0):>10} documents  {state}")
+        return
+
+    for name in args.migrations:
+        started = time.monotonic()
+        totals = run_migration(database, name, args.batch_size, args.rate, args.dry_run, args.restart)
+        print(f"{name}: {totals['documents']} documents, {totals['requests']} writes "
+              f"in {time.monotonic() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# ocr_profiles.py
+
+import re
+import logging
+import numpy as np
+import cv2
+import pytesseract
+
+logger = logging.getLogger(__name__)
+
+# Cards are warped to the ID-1 aspect ratio (85.6 x 54 mm) at roughly 300 dpi
+CARD_SIZE = (1012, 638)
+
+UPPER = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+DIGITS = "0123456789"
+
+# Regions are (left, top, right, bottom) fractions of the normalised card.
+# Each region has its own page segmentation mode and character whitelist,
+# and a pattern its text must match to be accepted.
+OCR_PROFILES = {
+    "PAN Card": {
+        'pan': {
+            'region': (0.03, 0.24, 0.62, 0.40),
+            'config': f"--psm 7 -c tessedit_char_whitelist={UPPER}{DIGITS}",
+            'pattern': r'[A-Z]{5}[0-9]{4}[A-Z]'
+        },
+        'name': {
+            'region': (0.03, 0.40, 0.75, 0.52),
+            'config': f"--psm 7 -c tessedit_char_whitelist=\"{UPPER} .\"",
+            'pattern': r'[A-Z][A-Z .]{2,}'
+        },
+        'dob': {
+            'region': (0.03, 0.66, 0.50, 0.80),
+            'config': f"--psm 7 -c tessedit_char_whitelist={DIGITS}/",
+            'pattern': r'\d{2}/\d{2}/\d{4}'
+        }
+    },
+    "Aadhaar Card": {
+        'name': {
+            'region': (0.30, 0.24, 0.97, 0.36),
+            'config': "--psm 7",
+            'pattern': r'[A-Za-z][A-Za-z .]{2,}'
+        },
+        'dob': {
+            'region': (0.30, 0.36, 0.97, 0.47),
+            'config': "--psm 7",
+            'pattern': r'\d{2}/\d{2}/\d{4}'
+        },
+        'aadhaar': {
+            'region': (0.22, 0.76, 0.80, 0.90),
+            'config': f"--psm 7 -c tessedit_char_whitelist=\"{DIGITS} \"",
+            'pattern': r'\d{4}\s?\d{4}\s?\d{4}'
+        }
+    }
+}
+
+# The field that must be read for a profile result to be trusted
+KEY_FIELDS = {"PAN Card": 'pan', "Aadhaar Card": 'aadhaar'}
+
+def _order_corners(points):
+    """Top-left, top-right, bottom-right, bottom-left"""
+    points = points.reshape(4, 2).astype("float32")
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([
+        points[np.argmin(sums)], points[np.argmin(diffs)],
+        points[np.argmax(sums)], points[np.argmax(diffs)]
+    ], dtype="float32")
+
+def normalise_card(image):
+    """
+    Find the card in a photo and warp it flat to CARD_SIZE.
+
+    Falls back to resizing the whole image when no card outline is found,
+    which covers scans and photos already cropped to the card.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    # Find the outline on a small copy; it is only used for the corners
+    scale = 800 / max(gray.shape)
+    small = cv2.resize(gray, None, fx=scale, fy=scale) if scale < 1 else gray
+    scale = min(scale, 1)
+    edges = cv2.Canny(cv2.GaussianBlur(small, (5, 5), 0), 50, 150)
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = 0.2 * small.shape[0] * small.shape[1]
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+        if cv2.contourArea(contour) < min_area:
+            break
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) == 4:
+            corners = _order_corners(approx) / scale
+            width, height = CARD_SIZE
+            target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype="float32")
+            matrix = cv2.getPerspectiveTransform(corners, target)
+            return cv2.warpPerspective(gray, matrix, CARD_SIZE)
+
+    return cv2.resize(gray, CARD_SIZE, interpolation=cv2.INTER_AREA)
+
+def _read_region(card, region, config):
+    left, top, right, bottom = region
+    width, height = CARD_SIZE
+    crop = card[int(top * height):int(bottom * height), int(left * width):int(right * width)]
+    # Binarise so Tesseract sees clean text on a white background
+    _, crop = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return pytesseract.image_to_string(crop, config=config).strip()
+
+def extract_with_profile(buffer, document_type):
+    """
+    OCR only the name, date of birth and number regions of a card photo.
+
+    Args:
+    buffer (memoryview): The upload buffer
+    document_type (str): A key of OCR_PROFILES
+
+    Returns:
+    dict: The fields read, or None if the card's number could not be read
+        (the caller then falls back to full-frame OCR)
+    """
+    profile = OCR_PROFILES.get(document_type)
+    if profile is None:
+        return None
+    try:
+        image = cv2.imdecode(np.frombuffer(buffer, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        card = normalise_card(image)
+
+        data = {}
+        for field, spec in profile.items():
+            text = _read_region(card, spec['region'], spec['config'])
+            match = re.search(spec['pattern'], text)
+            if match:
+                data[field] = match.group(0).strip()
+    except Exception as e:
+        logger.warning(f"Region OCR failed for {document_type}: {str(e)}")
+        return None
+
+    if KEY_FIELDS[document_type] not in data:
+        logger.info(f"Region OCR could not read the {document_type} number; using full-frame OCR")
+        return None
+    if 'aadhaar' in data:
+        data['aadhaar'] = data['aadhaar'].replace(" ", "")
+    logger.info(f"Region OCR extracted {document_type} data: {data}")
+    return data
@@ -0,0 +1,223 @@
+# rerun_profile.py
+"""
+Opt-in CPU and memory profiling of sampled Streamlit reruns.
+
+main_final1.py runs main() inside profile_rerun(). When profiling is on,
+a sample of reruns is run under cProfile and tracemalloc, and each writes
+a .pstats file, a tracemalloc snapshot and a .json file of tags (session,
+view, active tab, document types extracted, timings) to PROFILE_DIR. The
+directory keeps the newest PROFILE_KEEP samples. With profiling off the
+hook does nothing at all.
+
+Turn it on for every session with MSME_PROFILE_RERUNS=1 (sampling at
+MSME_PROFILE_SAMPLE_RATE), or set MSME_PROFILE_ADMIN=1 to give the
+Bank Official sidebar a switch that profiles every rerun of that session.
+
+Run as a script to aggregate the samples:
+
+    python rerun_profile.py                       # top functions and allocation sites
+    python rerun_profile.py --tab "Credit Facilities" --top 30
+    python rerun_profile.py --document-type "Bank Statement"
+"""
+
+import os
+import json
+import time
+import random
+import cProfile
+import argparse
+import threading
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # Older Streamlit releases
+    get_script_run_ctx = None
+
+PROFILE_RERUNS = os.environ.get("MSME_PROFILE_RERUNS", "") == "1"
+# Show the per-session switch in the Bank Official sidebar
+PROFILE_ADMIN_TOGGLE = os.environ.get("MSME_PROFILE_ADMIN", "") == "1"
+# Fraction of reruns profiled when MSME_PROFILE_RERUNS is on
+SAMPLE_RATE = float(os.environ.get("MSME_PROFILE_SAMPLE_RATE", "0.05"))
+PROFILE_DIR = os.environ.get("MSME_PROFILE_DIR", "profiles")
+# Samples kept; the oldest are removed as new ones are written
+PROFILE_KEEP = int(os.environ.get("MSME_PROFILE_KEEP", "200"))
+# Stack depth recorded for each allocation
+TRACEMALLOC_FRAMES = 10
+# Session state key of the admin switch
+SESSION_TOGGLE_KEY = "profile_reruns"
+
+SAMPLE_SUFFIXES = ('.pstats', '.tracemalloc', '.json')
+
+_active = threading.local()
+# tracemalloc is process wide; it runs while any sampled rerun does
+_tracing = 0
+_tracing_lock = threading.Lock()
+
+def _session_id():
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    return ctx.session_id if ctx else f"thread-{threading.get_ident()}"
+
+def _should_profile():
+    if not PROFILE_RERUNS and not PROFILE_ADMIN_TOGGLE:
+        return False
+    import streamlit as st
+    if PROFILE_ADMIN_TOGGLE and st.session_state.get(SESSION_TOGGLE_KEY):
+        return True
+    return PROFILE_RERUNS and random.random() < SAMPLE_RATE
+
+def tag_rerun(name, value, append=False):
+    """Label the rerun being profiled, if any; append collects values in a list"""
+    tags = getattr(_active, 'tags', None)
+    if tags is None:
+        return
+    if append:
+        if value not in tags.setdefault(name, []):
+            tags[name].append(value)
+    else:
+        tags[name] = value
+
+def _start_tracing():
+    global _tracing
+    with _tracing_lock:
+        if _tracing == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tracing += 1
+
+def _stop_tracing():
+    global _tracing
+    with _tracing_lock:
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        _tracing -= 1
+        if _tracing == 0:
+            tracemalloc.stop()
+    return snapshot, peak
+
+@contextmanager
+def profile_rerun():
+    """Profile this rerun if profiling is on and it is sampled"""
+    if not _should_profile():
+        yield
+        return
+
+    tags = {'session': _session_id()}
+    _active.tags = tags
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one profiler at a time; another rerun has it
+        profiler = None
+    _start_tracing()
+    started, cpu_started = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        # st.rerun() and st.stop() end a rerun with an exception; keep the sample
+        if profiler:
+            profiler.disable()
+        snapshot, peak = _stop_tracing()
+        _active.tags = None
+        tags.update({
+            'started_at': datetime.now().isoformat(),
+            'wall_seconds': time.perf_counter() - started,
+            'cpu_seconds': time.thread_time() - cpu_started,
+            'peak_traced_bytes': peak,
+            'cprofile': profiler is not None
+        })
+        try:
+            write_sample(profiler, snapshot, tags)
+        except Exception as e:
+            # A full disk must not break the page
+            print(f"Error writing rerun profile: {str(e)}")
+
+def write_sample(profiler, snapshot, tags, directory=PROFILE_DIR, keep=PROFILE_KEEP):
+    """Write one sample's files and drop the oldest samples beyond keep"""
+    os.makedirs(directory, exist_ok=True)
+    name = f"{datetime.now():%Y%m%dT%H%M%S%f}_{tags['session'][:8]}"
+    base = os.path.join(directory, name)
+    if profiler:
+        profiler.dump_stats(f"{base}.pstats")
+    snapshot.dump(f"{base}.tracemalloc")
+    with open(f"{base}.json", 'w') as f:
+        json.dump(tags, f, indent=2, default=str)
+
+    # Names start with the timestamp, so they sort oldest first
+    samples = sorted({os.path.splitext(entry)[0] for entry in os.listdir(directory)
+                      if entry.endswith(SAMPLE_SUFFIXES)})
+    for old in samples[:max(0, len(samples) - keep)]:
+        for suffix in SAMPLE_SUFFIXES:
+            path = os.path.join(directory, old + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+def load_samples(directory=PROFILE_DIR, tab=None, document_type=None):
+    """Tags of the samples in a directory, with their file base paths, filtered by tab or document type"""
+    samples = []
+    for entry in sorted(os.listdir(directory)):
+        if not entry.endswith('.json'):
+            continue
+        with open(os.path.join(directory, entry)) as f:
+            tags = json.load(f)
+        if tab and tags.get('tab') != tab:
+            continue
+        if document_type and document_type not in tags.get('document_types', []):
+            continue
+        tags['base'] = os.path.join(directory, os.path.splitext(entry)[0])
+        samples.append(tags)
+    return samples
+
+def top_allocation_sites(samples, limit):
+    """Allocation sites summed over the samples' snapshots: (site, bytes, blocks, samples)"""
+    sites = {}
+    for sample in samples:
+        snapshot = tracemalloc.Snapshot.load(f"{sample['base']}.tracemalloc")
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")
+        ])
+        for stat in snapshot.statistics('lineno'):
+            site = str(stat.traceback[0])
+            size, count, seen = sites.get(site, (0, 0, 0))
+            sites[site] = (size + stat.size, count + stat.count, seen + 1)
+    ranked = sorted(sites.items(), key=lambda item: -item[1][0])[:limit]
+    return [(site, size, count, seen) for site, (size, count, seen) in ranked]
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate sampled rerun profiles")
+    parser.add_argument("--dir", default=PROFILE_DIR, help="Directory of profile samples")
+    parser.add_argument("--top", type=int, default=20, help="Functions and allocation sites to list")
+    parser.add_argument("--tab", default=None, help="Only samples taken on this tab")
+    parser.add_argument("--document-type", default=None, help="Only samples that extracted this document type")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key, e.g. cumulative or tottime")
+    args = parser.parse_args()
+
+    samples = load_samples(args.dir, args.tab, args.document_type)
+    if not samples:
+        print(f"No matching samples in {args.dir}")
+        return
+
+    print(f"{len(samples)} samples")
+    by_tab = {}
+    for sample in samples:
+        by_tab.setdefault(sample.get('tab') or sample.get('view') or 'N/A', []).append(sample)
+    for tab, tab_samples in sorted(by_tab.items()):
+        wall = sorted(s['wall_seconds'] for s in tab_samples)
+        print(f"  {tab:<48}{len(tab_samples):>5} reruns, median {wall[len(wall) // 2] * 1000:7.0f} ms, "
+              f"max {wall[-1] * 1000:7.0f} ms, peak {max(s['peak_traced_bytes'] for s in tab_samples) / 2**20:6.1f} MB")
+
+    import pstats
+    profiles = [f"{s['base']}.pstats" for s in samples if os.path.exists(f"{s['base']}.pstats")]
+    if profiles:
+        print(f"\nTop functions across {len(profiles)} profiles ({args.sort}):")
+        pstats.Stats(*profiles).strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+    print("Top allocation sites still held at the end of the rerun:")
+    for site, size, count, seen in top_allocation_sites(samples, args.top):
+        print(f"  {size / 1024:10.0f} KiB {count:>9} blocks in {seen:>4} samples  {site}")
+
+if __name__ == "__main__":
+    main()
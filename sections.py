@@ -1,7 +1,26 @@
 # sections.py
 
 import streamlit as st
-import pandas as pd
+from amounts import parse_amounts, paise_to_lakhs, LAKH
+from utils import summary_pdf_download
+
+def check_amount_fields(fields, unit=LAKH):
+    """
+    Parse a group of amount fields in one call and warn about entries that are not amounts.
+
+    Args:
+    fields (dict): Field label -> session state key
+    unit (int): Rupees per unit when no suffix is typed
+
+    Returns:
+    list: Paise per field, None where empty or invalid
+    """
+    paise, invalid = parse_amounts([st.session_state.get(key, "") for key in fields.values()], unit)
+    bad = [label for label, flag in zip(fields, invalid) if flag]
+    if bad:
+        st.warning(f"Not a valid amount: {', '.join(bad)}. Enter figures like 12.5 or 1,23,456, "
+                   f"optionally with lacs or cr")
+    return [None if value != value else int(value) for value in paise]
 
 def basic_information_section(auto_fill_field, create_input_field, colorful_document_upload, extract_data_from_document):
     st.subheader("Basic Information")
@@ -12,7 +31,9 @@ def basic_information_section(auto_fill_field, create_input_field, colorful_docu
         if udyam_file:
             with st.spinner("Extracting data from Udyam Certificate..."):
                 extracted_data = extract_data_from_document(udyam_file, "Udyam Certificate")
-                if "error" not in extracted_data:
+                if extracted_data.get("pending"):
+                    st.info("Reading the Udyam Certificate; the form fills in when it is done")
+                elif "error" not in extracted_data:
                     for key, value in extracted_data.items():
                         auto_fill_field(key, value, "Udyam Certificate")
                     st.success("Udyam Certificate data extracted and filled successfully")
@@ -24,7 +45,9 @@ def basic_information_section(auto_fill_field, create_input_field, colorful_docu
         if gst_file:
             with st.spinner("Extracting data from GST Certificate..."):
                 extracted_data = extract_data_from_document(gst_file, "GST Certificate")
-                if "error" not in extracted_data:
+                if extracted_data.get("pending"):
+                    st.info("Reading the GST Certificate; the form fills in when it is done")
+                elif "error" not in extracted_data:
                     for key, value in extracted_data.items():
                         auto_fill_field(key, value, "GST Certificate")
                     st.success("GST Certificate data extracted and filled successfully")
@@ -106,7 +129,8 @@ def proprietor_partners_directors_section(auto_fill_field, create_input_field, c
                 auto_fill_field(f"director_{key}_0", value, "GST Certificate")
     else:
         st.write("Partners/Directors Information")
-        num_directors = max(1, len(gst_data.get('directors', [])))
+        # Cards from a bundle upload may have filled in more directors than GST lists
+        num_directors = max(1, len(gst_data.get('directors', [])), st.session_state.get('num_directors', 1))
 
     for i in range(num_directors):
         with st.expander(f"{'Proprietor' if constitution == 'Proprietorship' else 'Partner/Director'} {i+1}"):
@@ -136,7 +160,9 @@ def proprietor_partners_directors_section(auto_fill_field, create_input_field, c
                 pan_file = colorful_document_upload(f"Upload PAN Card", f"pan_upload_{i}", "#9b59b6")
                 if pan_file:
                     pan_data = extract_data_from_document(pan_file, "PAN Card")
-                    if "error" not in pan_data:
+                    if pan_data.get("pending"):
+                        st.info("Reading the PAN Card; the form fills in when it is done")
+                    elif "error" not in pan_data:
                         for key, value in pan_data.items():
                             auto_fill_field(f"director_{key}_{i}", value, "PAN Card")
                         st.success(f"PAN Card data extracted and filled successfully")
@@ -147,15 +173,20 @@ def proprietor_partners_directors_section(auto_fill_field, create_input_field, c
                 aadhaar_file = colorful_document_upload(f"Upload Aadhaar Card", f"aadhaar_upload_{i}", "#34495e")
                 if aadhaar_file:
                     aadhaar_data = extract_data_from_document(aadhaar_file, "Aadhaar Card")
-                    if "error" not in aadhaar_data:
+                    if aadhaar_data.get("pending"):
+                        st.info("Reading the Aadhaar Card; the form fills in when it is done")
+                    elif "error" not in aadhaar_data:
                         for key, value in aadhaar_data.items():
                             auto_fill_field(f"director_{key}_{i}", value, "Aadhaar Card")
                         st.success(f"Aadhaar Card data extracted and filled successfully")
                     else:
                         st.error(aadhaar_data["error"])
 
+    check_amount_fields({f"Net Worth of Partner/Director {i+1}": f"director_networth_{i}" for i in range(num_directors)})
+
+    st.session_state.num_directors = num_directors
     if st.button("Add Another Partner/Director", key="add_director") and constitution != 'Proprietorship':
-        num_directors += 1
+        st.session_state.num_directors = num_directors + 1
         st.experimental_rerun()
 
     #if st.button("Save Progress", key="save_proprietor_partners_directors"):
@@ -203,7 +234,9 @@ def credit_facilities_section(auto_fill_field, create_input_field, colorful_docu
         if sanction_letter:
             with st.spinner("Extracting data from Sanction Letter..."):
                 sanction_data = extract_data_from_document(sanction_letter, "Sanction Letter")
-                if "error" not in sanction_data:
+                if sanction_data.get("pending"):
+                    st.info("Reading the Sanction Letter; the form fills in when it is done")
+                elif "error" not in sanction_data:
                     for key, value in sanction_data.items():
                         auto_fill_field(key, value, "Sanction Letter")
                     st.success("Sanction Letter data extracted and filled successfully")
@@ -231,6 +264,11 @@ def credit_facilities_section(auto_fill_field, create_input_field, colorful_docu
                 create_input_field("Bank", f"existing_facility_bank_{i}")
             create_input_field("Security", f"existing_facility_security_{i}")
             st.write("---")
+        existing_fields = {}
+        for i in range(num_facilities):
+            existing_fields[f"Limit of facility {i+1}"] = f"existing_facility_limit_{i}"
+            existing_fields[f"Outstanding of facility {i+1}"] = f"existing_facility_outstanding_{i}"
+        check_amount_fields(existing_fields)
 
     # Proposed Credit Facilities
     st.subheader("Proposed Credit Facilities")
@@ -246,6 +284,10 @@ def credit_facilities_section(auto_fill_field, create_input_field, colorful_docu
             create_input_field(f"Purpose", f"proposed_facility_purpose_{i}")
         create_input_field(f"Security", f"proposed_facility_security_{i}")
         st.write("---")
+    proposed = check_amount_fields({f"Amount of proposed facility {i+1}": f"proposed_facility_amount_{i}"
+                                    for i in range(num_proposed_facilities)})
+    if any(proposed):
+        st.write(f"Total proposed: Rs. {paise_to_lakhs(sum(p for p in proposed if p)):,.2f} lacs")
 
     #if st.button("Save Progress", key="credit_facilities_save_progress"):
         #save_progress("credit_facilities", {
@@ -309,6 +351,8 @@ def collateral_and_guarantor_section(auto_fill_field, create_input_field, colorf
         st.success("Progress saved successfully!")
 
 def past_performance_and_business_relations_section(auto_fill_field, create_input_field, colorful_document_upload, extract_data_from_document):
+    import pandas as pd
+
     st.subheader("Past Performance and Business Relations")
 
     col1, col2 = st.columns(2)
@@ -322,8 +366,18 @@ def past_performance_and_business_relations_section(auto_fill_field, create_inpu
         for param in parameters:
             for year in years:
                 df.at[param, year] = st.text_input(f"{param} - {year}", key=f"{param}_{year}")
-
-        st.table(df)
+                if df.at[param, year]:
+                    field = f"past_performance_{param}_{year}".lower().replace(" ", "_").replace("-", "_")
+                    st.session_state.form_data[field] = df.at[param, year]
+
+        # The whole grid converts in one call; figures are in lacs unless a suffix says otherwise
+        paise, invalid = parse_amounts(df.to_numpy(), unit=LAKH)
+        bad = [f"{param} - {year}" for p, param in enumerate(parameters)
+               for y, year in enumerate(years) if invalid[p, y]]
+        if bad:
+            st.warning(f"Not a valid amount: {', '.join(bad)}")
+        st.caption("Rs. in lacs")
+        st.table(pd.DataFrame(paise / (LAKH * 100), index=parameters, columns=years))
 
     with col2:
         st.write("### Suppliers and Customers")
@@ -361,6 +415,8 @@ def past_performance_and_business_relations_section(auto_fill_field, create_inpu
         #st.success("Progress saved successfully!")
 
 def associate_concerns_and_statutory_obligations_section(auto_fill_field, create_input_field, colorful_document_upload, extract_data_from_document):
+    import pandas as pd
+
     st.subheader("Associate Concerns and Statutory Obligations")
 
     col1, col2 = st.columns(2)
@@ -469,12 +525,10 @@ def review_section(auto_fill_field, create_input_field, colorful_document_upload
         ("Statutory Obligations", ["statutory_registration_shop_act", "statutory_registration_msme", "statutory_gst_return", "statutory_income_tax_return"]),
     ]
 
+    # One markdown block per section rather than a widget per field
     for section_name, fields in sections:
-        st.write(f"### {section_name}")
-        for field in fields:
-            value = st.session_state.get(field, "")
-            st.write(f"**{field.replace('_', ' ').title()}:** {value}")
-        st.write("---")
+        lines = [f"**{field.replace('_', ' ').title()}:** {st.session_state.get(field, '')}" for field in fields]
+        st.markdown(f"### {section_name}\n\n" + "  \n".join(lines) + "\n\n---")
 
     st.write("### Undertakings")
     st.write("You have agreed to the following undertakings:")
@@ -485,6 +539,10 @@ def review_section(auto_fill_field, create_input_field, colorful_document_upload
     for doc in st.session_state.get("uploaded_documents", []):
         st.write(f"- {doc}")
 
+    if st.session_state.get('application_number'):
+        st.write("### Printable Summary")
+        summary_pdf_download(st.session_state.application_number, "applicant")
+
     st.write("Please ensure all information is correct before submitting your application.")
     if st.button("Edit Application"):
         st.session_state.page = 0  # Return to the first page for editing
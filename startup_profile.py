@@ -0,0 +1,113 @@
+# startup_profile.py
+"""
+Cold-start timing for the Streamlit app.
+
+main_final1.py wraps each import and init step in startup_step(); the
+first run in a server process logs a per-step report. Later reruns record
+nothing.
+
+Run as a script to check the cold-start import budget, e.g. in CI:
+
+    python startup_profile.py                 # uses COLD_START_BUDGET (seconds)
+    python startup_profile.py --budget 1.5
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+import subprocess
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+COLD_START_BUDGET_SECONDS = float(os.environ.get("COLD_START_BUDGET", "2.5"))
+
+# Modules that must not be loaded just to render the first page
+HEAVY_MODULES = ['fitz', 'pytesseract', 'cv2', 'PIL', 'pandas', 'fuzzywuzzy', 'numpy']
+
+# What main_final1.py imports at module level
+APP_MODULES = ['database', 'utils', 'sections']
+
+_timings = []
+_reported = False
+
+@contextmanager
+def startup_step(name):
+    """Time one import or init step of the first run in this process"""
+    if _reported:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings.append((name, time.perf_counter() - start))
+
+def finish_startup():
+    """Log the cold-start report once per process; returns the timings"""
+    global _reported
+    if _reported:
+        return None
+    _reported = True
+    total = sum(seconds for _, seconds in _timings)
+    lines = [f"  {name:<24}{seconds * 1000:8.0f} ms" for name, seconds in _timings]
+    logger.warning("Cold start took %.0f ms\n%s", total * 1000, "\n".join(lines))
+    return list(_timings)
+
+def measure_cold_start(modules=APP_MODULES):
+    """
+    Import the app modules in a fresh interpreter.
+
+    Returns:
+    tuple: (total seconds, {top-level module: cumulative seconds},
+        heavy modules the app loaded beyond what Streamlit itself needs)
+    """
+    # Heavy modules Streamlit loads for itself are not the app's doing
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import streamlit\n"
+        "baseline = set(sys.modules)\n"
+        f"import {', '.join(modules)}\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules and m not in baseline))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+    )
+    total_line, heavy_line = result.stdout.splitlines()[-2:]
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    per_module = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+\s+\|\s+(\d+)\s+\|(\s*)(\S+)', line)
+        if match and len(match.group(2)) == 1:
+            per_module[match.group(3)] = int(match.group(1)) / 1e6
+    return float(total_line), per_module, [module for module in heavy_line.split(',') if module]
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the app's cold-start import budget")
+    parser.add_argument("--budget", type=float, default=COLD_START_BUDGET_SECONDS, help="Seconds")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    total, per_module, heavy = measure_cold_start()
+    for module, seconds in sorted(per_module.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{module:<32}{seconds * 1000:8.0f} ms")
+    print(f"Cold start imports: {total:.2f}s (budget {args.budget:.2f}s)")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules loaded at startup: {', '.join(heavy)}")
+        failed = True
+    if total > args.budget:
+        print("FAIL: cold start over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
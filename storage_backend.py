@@ -0,0 +1,260 @@
+# storage_backend.py
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # Older Streamlit releases
+    add_script_run_ctx = get_script_run_ctx = None
+try:
+    from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+except ImportError:
+    SCRIPT_RUN_CONTEXT_ATTR_NAME = "streamlit_script_run_ctx"
+from upload_buffers import content_hash
+
+# Worker threads used to issue independent queries at the same time
+QUERY_WORKERS = 8
+
+def prepare_document(file_data, metadata):
+    """
+    Compress an upload and render its sidecars, ready to be stored.
+
+    Args:
+    file_data: The upload buffer
+    metadata (dict): filename, content_type, document_type, application_number, section
+
+    Returns:
+    dict: 'data', 'filename' and stored 'metadata' of the document, and
+        'sidecars' as (kind, data, filename, content_type) tuples
+    """
+    # Imaging libraries load on the first upload, not at startup
+    from document_compression import compress_document, keep_original
+    from document_previews import render_preview, PREVIEW_CONTENT_TYPE
+
+    # file_data is the shared upload buffer; hash it before anything else
+    sha256 = content_hash(file_data)
+
+    # Recompress photos and scans before they are stored
+    stored_data, content_type, compression = compress_document(file_data, metadata['content_type'])
+    filename = metadata['filename']
+    if content_type != metadata['content_type']:
+        filename = f"{os.path.splitext(filename)[0]}.jpg"
+
+    sidecars = []
+    if compression['method'] and keep_original(metadata['document_type']):
+        sidecars.append(('original', file_data, metadata['filename'], metadata['content_type']))
+    preview = render_preview(stored_data, content_type)
+    if preview:
+        sidecars.append(('preview', preview, f"preview_{filename}.webp", PREVIEW_CONTENT_TYPE))
+
+    return {
+        'data': stored_data,
+        'filename': filename,
+        'metadata': {
+            'application_number': metadata['application_number'],
+            'document_type': metadata['document_type'],
+            'section': metadata.get('section', 'Other'),
+            'upload_date': datetime.now(),
+            'content_type': content_type,
+            'sha256': sha256,
+            'compression': compression
+        },
+        'sidecars': sidecars
+    }
+
+class StorageBackend(ABC):
+    """
+    What the app needs from a store of applications, documents and search.
+
+    Database (MongoDB/GridFS) and EmbeddedDatabase (SQLite and local files)
+    implement every abstract method. Reads return [] or None on failure after reporting the
+    error with st.error, as the Mongo implementation always has.
+    """
+
+    _executor = None
+    _executor_lock = threading.Lock()
+    readiness = {'state': 'ready', 'error': None, 'checked_at': None}
+
+    # Readiness
+
+    def is_ready(self):
+        return True
+
+    def pending_write_count(self):
+        return 0
+
+    def wait_until_ready(self, timeout=30):
+        return self
+
+    def health(self):
+        """Circuit breaker state, queued writes and operation metrics"""
+        return {'breaker': {'state': 'closed'}, 'pending_writes': self.pending_write_count(),
+                'counters': {}, 'latencies': {}}
+
+    # Applications
+
+    @abstractmethod
+    def save_application(self, application_data):
+        """Insert or update an application; returns a result with inserted_id"""
+
+    @abstractmethod
+    def update_application(self, application_id, updated_data):
+        """Set fields of an existing application"""
+
+    @abstractmethod
+    def update_statuses(self, applications, status, remarks="", changed_by="Bank Official"):
+        """Move applications to a new status; returns the number updated"""
+
+    @abstractmethod
+    def get_application(self, criteria):
+        """An application by _id or by a {field: value} filter"""
+
+    @abstractmethod
+    def get_application_summaries(self, criteria=None, limit=0):
+        """Summary rows matching criteria, at most limit of them (0 for all)"""
+
+    @abstractmethod
+    def get_status_counts(self, group_by='status'):
+        """[{'_id': value, 'count': n, 'total_proposed_paise': x}], largest first"""
+
+    @abstractmethod
+    def get_status_events(self, application_number):
+        """Status history of an application, newest first"""
+
+    @abstractmethod
+    def get_related_applications(self, application_number):
+        """Flags for other applications sharing an identifier or a similar name"""
+
+    @abstractmethod
+    def delete_application(self, application_id):
+        """Delete an application, its status history and its documents; None if the delete failed"""
+
+    @abstractmethod
+    def reserve_counter_block(self, name, size):
+        """Reserve size consecutive values of a named counter; returns the first, or None on failure"""
+
+    # Batch jobs: exports, summary rebuilds and migrations
+
+    @abstractmethod
+    def iter_application_batches(self, criteria=None, projection=None, batch_size=500, after_id=None,
+                                 collection='applications'):
+        """Stream applications (or summaries) matching criteria in _id order, one list per batch"""
+
+    @abstractmethod
+    def rebuild_summaries(self, batch_size=500):
+        """Regenerate every application summary; returns the number written"""
+
+    @abstractmethod
+    def get_migration_checkpoint(self, name):
+        """Progress of a migration: last_id, documents and done, or None if never run"""
+
+    @abstractmethod
+    def save_migration_checkpoint(self, name, fields):
+        """Merge fields into a migration's checkpoint"""
+
+    @abstractmethod
+    def record_migration_batch(self, record):
+        """Keep the timing of one migrated batch"""
+
+    @abstractmethod
+    def apply_migration(self, migrate, documents, dry_run=False):
+        """Migrate a batch with a migrations.py function; returns the number of writes"""
+
+    # Documents
+
+    @abstractmethod
+    def save_document(self, file_data, metadata):
+        """Store an uploaded file with its sidecars; returns its file id"""
+
+    def save_documents(self, items):
+        """
+        Save several uploaded documents in one pass.
+
+        Args:
+        items (list): (file_data, metadata) pairs as taken by save_document
+
+        Returns:
+        list: The new file ids, None for any that failed
+        """
+        return [self.save_document(file_data, metadata) for file_data, metadata in items]
+
+    @abstractmethod
+    def get_document(self, file_id):
+        """A readable file object with filename, length and metadata"""
+
+    @abstractmethod
+    def get_application_documents(self, application_number, include_data=True):
+        """Documents of an application, with their data unless include_data is False"""
+
+    @abstractmethod
+    def get_document_previews(self, application_number):
+        """Preview thumbnail bytes by document file id"""
+
+    @abstractmethod
+    def get_rendered_file(self, application_number, kind, version):
+        """Bytes of a file rendered from an application (e.g. its summary PDF) at a version, or None"""
+
+    @abstractmethod
+    def save_rendered_file(self, application_number, kind, version, data, filename, content_type):
+        """Store a rendered file, replacing earlier versions of the same kind"""
+
+    # Search
+
+    @abstractmethod
+    def search_text(self, query, page=0, page_size=20):
+        """Ranked search; returns (results for the page, total)"""
+
+    # Concurrent queries
+
+    def _get_executor(self):
+        """Thread pool shared by concurrent queries"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=QUERY_WORKERS,
+                    thread_name_prefix="db-query"
+                )
+            return self._executor
+
+    def fetch_concurrently(self, calls):
+        """
+        Issue independent queries at the same time.
+
+        Args:
+        calls (dict): Maps a result name to a (method, args) tuple,
+            e.g. {'documents': (db.get_application_documents, ('MSME...',))}
+
+        Returns:
+        dict: Maps each result name to a Future for its query
+        """
+        executor = self._get_executor()
+        ctx = get_script_run_ctx() if get_script_run_ctx else None
+
+        def run(method, args):
+            if ctx is None:
+                return method(*args)
+            # Let st.error calls made by the query reach the page, then
+            # detach: pool threads also run background tasks for other sessions
+            thread = threading.current_thread()
+            previous = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+            add_script_run_ctx(ctx=ctx)
+            try:
+                return method(*args)
+            finally:
+                setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+
+        return {
+            name: executor.submit(run, method, args)
+            for name, (method, args) in calls.items()
+        }
+
+    @staticmethod
+    def iter_completed(futures):
+        """Yield (name, result) pairs in the order the queries finish"""
+        names = {future: name for name, future in futures.items()}
+        for future in as_completed(names):
+            yield names[future], future.result()
@@ -0,0 +1,199 @@
+# storage_gc.py
+"""
+Sweeper for GridFS blobs that nothing refers to any more.
+
+Finds files whose application was never saved or has been deleted,
+sidecars whose document is gone, repeated uploads of the same file and
+chunks left behind by interrupted deletes. Reports the reclaimable bytes
+and, with --purge, removes them in rate limited batches.
+
+Usage:
+    python storage_gc.py                        # report only
+    python storage_gc.py --purge                # report and delete
+    python storage_gc.py --purge --every 60     # keep sweeping every hour
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from database import Database
+
+# Uploads younger than this may belong to a draft that is not saved yet
+GRACE_PERIOD_HOURS = 24
+# Chunks are written before their fs.files entry; younger ones may be an upload in progress
+CHUNK_GRACE_PERIOD_HOURS = 1
+SCAN_BATCH_SIZE = 500
+PURGE_FILES_PER_SECOND = 100
+GRIDFS_CHUNK_SIZE = 255 * 1024
+
+FILE_PROJECTION = {
+    '_id': 1,
+    'length': 1,
+    'uploadDate': 1,
+    'metadata.application_number': 1,
+    'metadata.sidecar_of': 1
+}
+
+def iter_file_batches(db, batch_size=SCAN_BATCH_SIZE):
+    """Yield fs.files entries in _id order, one batch at a time"""
+    query = {}
+    while True:
+        batch = list(db.fs.files.find(query, FILE_PROJECTION).sort('_id', 1).limit(batch_size))
+        if not batch:
+            return
+        yield batch
+        query = {'_id': {'$gt': batch[-1]['_id']}}
+
+def find_orphaned_files(db, grace_hours=GRACE_PERIOD_HOURS, batch_size=SCAN_BATCH_SIZE):
+    """Yield files whose application or parent document no longer exists"""
+    # GridFS records uploadDate in UTC
+    cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    for batch in iter_file_batches(db, batch_size):
+        numbers = {(f.get('metadata') or {}).get('application_number') for f in batch} - {None}
+        saved = {
+            app['application_number'] for app in
+            db.applications.find({'application_number': {'$in': list(numbers)}}, {'application_number': 1})
+        }
+        parents = {(f.get('metadata') or {}).get('sidecar_of') for f in batch} - {None}
+        existing_parents = {
+            doc['_id'] for doc in
+            db.fs.files.find({'_id': {'$in': list(parents)}}, {'_id': 1})
+        }
+
+        for file_doc in batch:
+            if file_doc['uploadDate'] > cutoff:
+                continue
+            metadata = file_doc.get('metadata') or {}
+            if metadata.get('application_number') not in saved:
+                reason = "no application"
+            elif metadata.get('sidecar_of') and metadata['sidecar_of'] not in existing_parents:
+                reason = "parent document deleted"
+            else:
+                continue
+            yield {'_id': file_doc['_id'], 'length': file_doc.get('length', 0), 'reason': reason}
+
+def find_duplicate_files(db, batch_size=SCAN_BATCH_SIZE):
+    """Yield repeated uploads of the same content to the same document slot, keeping the oldest"""
+    pipeline = [
+        {'$match': {'metadata.sha256': {'$exists': True}, 'metadata.sidecar_of': {'$exists': False}}},
+        {'$sort': {'_id': 1}},
+        {'$group': {
+            '_id': {
+                'application_number': '$metadata.application_number',
+                'document_type': '$metadata.document_type',
+                'sha256': '$metadata.sha256'
+            },
+            'ids': {'$push': '$_id'},
+            'length': {'$first': '$length'},
+            'count': {'$sum': 1}
+        }},
+        {'$match': {'count': {'$gt': 1}}}
+    ]
+    for group in db.fs.files.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size):
+        duplicate_ids = group['ids'][1:]
+        for file_id in duplicate_ids:
+            yield {'_id': file_id, 'length': group['length'], 'reason': "duplicate upload"}
+        # Sidecars of the removed copies go with them
+        for sidecar in db.fs.files.find({'metadata.sidecar_of': {'$in': duplicate_ids}}, {'_id': 1, 'length': 1}):
+            yield {'_id': sidecar['_id'], 'length': sidecar.get('length', 0), 'reason': "duplicate upload"}
+
+def find_orphaned_chunks(db, grace_hours=CHUNK_GRACE_PERIOD_HOURS, batch_size=SCAN_BATCH_SIZE):
+    """Yield files_id values older than the grace period that have chunks but no fs.files entry"""
+    # files_id is an ObjectId, so its generation time dates the upload
+    cutoff = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(hours=grace_hours))
+    # Sorting on files_id first lets the server walk the chunks index
+    pipeline = [
+        {'$match': {'files_id': {'$lt': cutoff}}},
+        {'$sort': {'files_id': 1}},
+        {'$group': {'_id': '$files_id'}}
+    ]
+    batch = []
+    for group in db.fs.chunks.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size):
+        batch.append(group['_id'])
+        if len(batch) >= batch_size:
+            yield from _missing_files(db, batch)
+            batch = []
+    if batch:
+        yield from _missing_files(db, batch)
+
+def _missing_files(db, files_ids):
+    existing = {doc['_id'] for doc in db.fs.files.find({'_id': {'$in': files_ids}}, {'_id': 1})}
+    for files_id in files_ids:
+        if files_id not in existing:
+            chunks = db.fs.chunks.count_documents({'files_id': files_id})
+            yield {'_id': files_id, 'length': chunks * GRIDFS_CHUNK_SIZE, 'reason': "orphaned chunks"}
+
+def sweep(database, purge=False, grace_hours=GRACE_PERIOD_HOURS,
+          batch_size=SCAN_BATCH_SIZE, files_per_second=PURGE_FILES_PER_SECOND,
+          chunk_grace_hours=CHUNK_GRACE_PERIOD_HOURS):
+    """
+    Find unreferenced blobs and optionally purge them.
+
+    Returns:
+    dict: Counts and reclaimable bytes per reason, plus the number purged
+    """
+    db = database.db
+    report = {}
+    candidates = {}
+    for finder in (
+        lambda: find_orphaned_files(db, grace_hours, batch_size),
+        lambda: find_duplicate_files(db, batch_size),
+        lambda: find_orphaned_chunks(db, chunk_grace_hours, batch_size)
+    ):
+        for item in finder():
+            if item['_id'] in candidates:
+                continue
+            candidates[item['_id']] = item
+            entry = report.setdefault(item['reason'], {'files': 0, 'bytes': 0})
+            entry['files'] += 1
+            entry['bytes'] += item['length']
+
+    report['purged'] = 0
+    if purge and candidates:
+        file_ids = list(candidates)
+        for start in range(0, len(file_ids), batch_size):
+            batch = file_ids[start:start + batch_size]
+            began = time.monotonic()
+            report['purged'] += database.delete_files(batch)
+            # Stay under the configured delete rate to protect live traffic
+            pause = len(batch) / files_per_second - (time.monotonic() - began)
+            if pause > 0:
+                time.sleep(pause)
+    return report
+
+def print_report(report):
+    total = 0
+    for reason, entry in report.items():
+        if reason == 'purged':
+            continue
+        total += entry['bytes']
+        print(f"{reason}: {entry['files']} files, {entry['bytes'] / (1024 * 1024):.1f} MB")
+    print(f"Reclaimable: {total / (1024 * 1024):.1f} MB")
+    print(f"Purged: {report['purged']} files")
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and purge unreferenced GridFS blobs")
+    parser.add_argument("--purge", action="store_true", help="Delete what is found (default: report only)")
+    parser.add_argument("--grace-hours", type=float, default=GRACE_PERIOD_HOURS,
+                        help="Ignore uploads younger than this many hours")
+    parser.add_argument("--chunk-grace-hours", type=float, default=CHUNK_GRACE_PERIOD_HOURS,
+                        help="Ignore chunks of uploads started less than this many hours ago")
+    parser.add_argument("--batch-size", type=int, default=SCAN_BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=PURGE_FILES_PER_SECOND,
+                        help="Maximum files deleted per second")
+    parser.add_argument("--every", type=float, default=None,
+                        help="Repeat the sweep every N minutes")
+    args = parser.parse_args()
+
+    database = Database().wait_until_ready()
+    while True:
+        print(f"Sweep started at {datetime.now().isoformat()}")
+        print_report(sweep(database, args.purge, args.grace_hours, args.batch_size, args.rate,
+                           args.chunk_grace_hours))
+        if args.every is None:
+            break
+        time.sleep(args.every * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# storage_sync.py
+"""
+Replicate a branch's embedded store to the central database.
+
+Copies applications changed since their last sync, new status events and
+new documents (with their sidecars) in batches, then replays local
+deletions. Rows are only marked synced once the central write succeeded,
+so an interrupted run simply resends the rest next time.
+
+Usage:
+    python storage_sync.py                  # one pass
+    python storage_sync.py --every 5        # keep syncing every 5 minutes
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime
+from pymongo import UpdateOne, DeleteMany, InsertOne
+from database import Database
+from upload_buffers import BufferReader
+from duplicate_detection import build_blocking_keys
+from application_summaries import build_summary
+from embedded_store import EmbeddedDatabase, STATUS_FIELDS
+
+# Backend of the central store the branch replicates to
+CENTRAL_BACKEND = os.environ.get("MSME_CENTRAL_BACKEND", "atlas")
+SYNC_BATCH_SIZE = 200
+
+def _application_requests(application):
+    """
+    Central writes for one application.
+
+    Status fields are only inserted with a new application, or applied when
+    the local change is newer, so an official's decision made centrally is
+    not undone by an older branch copy.
+    """
+    application_id = application['_id']
+    fields = {k: v for k, v in application.items() if k != '_id' and k not in STATUS_FIELDS}
+    status = {k: application[k] for k in STATUS_FIELDS if k in application}
+    summary = build_summary(application)
+    summary_status = {k: summary.pop(k) for k in STATUS_FIELDS if k in summary}
+
+    def upsert(set_fields, insert_fields):
+        # MongoDB rejects empty update operators
+        update = {'$set': set_fields}
+        if insert_fields:
+            update['$setOnInsert'] = insert_fields
+        return UpdateOne({'_id': application_id}, update, upsert=True)
+
+    requests = {
+        'applications': [upsert(fields, status)],
+        'application_summaries': [upsert(summary, summary_status)]
+    }
+    changed_at = status.get('status_changed_at')
+    if changed_at is not None:
+        stale = {'_id': application_id, '$or': [
+            {'status_changed_at': {'$exists': False}},
+            {'status_changed_at': {'$lt': changed_at}}
+        ]}
+        requests['applications'].append(UpdateOne(stale, {'$set': status}))
+        requests['application_summaries'].append(UpdateOne(stale, {'$set': dict(summary_status, **status)}))
+    return requests
+
+def sync_applications(local, db, batch_size=SYNC_BATCH_SIZE):
+    synced = 0
+    while True:
+        batch = local.unsynced_applications(batch_size)
+        if not batch:
+            return synced
+        requests = {'applications': [], 'application_summaries': [], 'blocking_keys': []}
+        for application, updated_at in batch:
+            for collection, ops in _application_requests(application).items():
+                requests[collection] += ops
+            application_number = application.get('application_number')
+            if application_number:
+                requests['blocking_keys'].append(DeleteMany({'application_number': application_number}))
+                requests['blocking_keys'] += [
+                    InsertOne(dict(entry, application_number=application_number))
+                    for entry in build_blocking_keys(application)
+                ]
+        for collection, ops in requests.items():
+            if ops:
+                # Blocking keys must be deleted before they are re-inserted
+                db[collection].bulk_write(ops, ordered=collection == 'blocking_keys')
+        local.mark_applications_synced([(application['_id'], updated_at) for application, updated_at in batch])
+        synced += len(batch)
+
+def sync_status_events(local, db, batch_size=SYNC_BATCH_SIZE):
+    synced = 0
+    while True:
+        events = local.unsynced_status_events(batch_size)
+        if not events:
+            return synced
+        db.status_events.bulk_write([
+            UpdateOne({'_id': event['_id']}, {'$setOnInsert': event}, upsert=True)
+            for event in events
+        ], ordered=False)
+        local.mark_synced('status_events', [event['_id'] for event in events])
+        synced += len(events)
+
+def sync_documents(local, central, batch_size=SYNC_BATCH_SIZE):
+    synced = 0
+    while True:
+        documents = local.unsynced_documents(batch_size)
+        if not documents:
+            return synced
+        ids = [document['_id'] for document in documents]
+        present = {doc['_id'] for doc in central.db.fs.files.find({'_id': {'$in': ids}}, {'_id': 1})}
+        for document in documents:
+            if document['_id'] not in present:
+                central.fs.put(BufferReader(local.read_document_file(document)), _id=document['_id'],
+                               filename=document['filename'], metadata=document['metadata'])
+        local.mark_synced('documents', ids)
+        synced += len(documents)
+
+def sync_deletions(local, central):
+    # delete_application returns None when it failed or the breaker is open;
+    # those deletions stay pending for the next run
+    deleted = [application_id for application_id in local.pending_deletions()
+               if central.delete_application(application_id) is not None]
+    local.clear_deletions(deleted)
+    return len(deleted)
+
+def sync(local, central, batch_size=SYNC_BATCH_SIZE):
+    """One replication pass; returns the number of rows copied per kind"""
+    return {
+        'applications': sync_applications(local, central.db, batch_size),
+        'status_events': sync_status_events(local, central.db, batch_size),
+        'documents': sync_documents(local, central, batch_size),
+        'deletions': sync_deletions(local, central)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replicate the embedded store to the central database")
+    parser.add_argument("--batch-size", type=int, default=SYNC_BATCH_SIZE)
+    parser.add_argument("--every", type=float, default=None,
+                        help="Repeat the sync every N minutes")
+    args = parser.parse_args()
+
+    local = EmbeddedDatabase()
+    central = Database(backend=CENTRAL_BACKEND).wait_until_ready()
+    while True:
+        began = time.monotonic()
+        try:
+            counts = sync(local, central, args.batch_size)
+            summary = ", ".join(f"{count} {kind}" for kind, count in counts.items())
+            print(f"{datetime.now().isoformat()} synced {summary} in {time.monotonic() - began:.1f}s")
+        except Exception as e:
+            # The WAN drops; unsynced rows stay flagged and go next time
+            print(f"{datetime.now().isoformat()} sync failed: {str(e)}")
+        if args.every is None:
+            break
+        time.sleep(args.every * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import os
+import sys
+import pytest
+
+# The modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def memory_database():
+    """A Database on its own in-process mongomock store"""
+    pytest.importorskip("mongomock")
+    from database import Database
+    return Database('memory').wait_until_ready()
+
+@pytest.fixture
+def embedded_database(tmp_path):
+    """An EmbeddedDatabase in a temporary directory"""
+    from embedded_store import EmbeddedDatabase
+    return EmbeddedDatabase(str(tmp_path / "embedded"))
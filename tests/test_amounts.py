@@ -0,0 +1,34 @@
+import pytest
+from amounts import parse_amount, parse_amounts, paise_to_lakhs, LAKH
+
+@pytest.mark.parametrize("text, paise", [
+    ("Rs. 1,23,456.00", 12345600),
+    ("₹ 500/-", 50000),
+    ("INR 2,500", 250000),
+    ("12.5 lacs", 125000000),
+    ("2 cr", 2000000000),
+    ("3k", 300000),
+    ("-100", -10000),
+])
+def test_parse_amount(text, paise):
+    assert parse_amount(text) == paise
+
+@pytest.mark.parametrize("value", [None, "", "abc", "12 dozen", True, float('nan'), float('inf')])
+def test_parse_amount_rejects(value):
+    assert parse_amount(value) is None
+
+def test_parse_amount_unit_applies_without_suffix():
+    assert parse_amount("12.5", unit=LAKH) == 125000000
+    assert parse_amount(12.5, unit=LAKH) == 125000000
+    # An explicit suffix wins over the field's unit
+    assert parse_amount("1 cr", unit=LAKH) == 1000000000
+    assert paise_to_lakhs(125000000) == 12.5
+
+def test_parse_amounts_matches_parse_amount():
+    values = ["Rs. 1,23,456.00", "12.5 lacs", "2 cr", "", "abc", "3k"]
+    paise, invalid = parse_amounts(values)
+    assert list(invalid) == [False, False, False, False, True, False]
+    for value, parsed in zip(values, paise):
+        expected = parse_amount(value)
+        assert (parsed != parsed) if expected is None else parsed == expected
+
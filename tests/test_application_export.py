@@ -0,0 +1,108 @@
+import os
+import csv
+import json
+import functools
+import pytest
+from bson import ObjectId
+import application_export
+from application_export import export_applications, export_files, export_key, build_criteria
+
+@pytest.fixture
+def applications(memory_database):
+    """Fill the database with count applications, numbered in _id order"""
+    def fill(count):
+        if count:
+            memory_database.db.applications.insert_many([
+                {'_id': ObjectId(), 'application_number': f"MSMEHO{i:07d}",
+                 'status': 'Approved' if i % 3 == 0 else 'Submitted'}
+                for i in range(count)
+            ])
+        return memory_database
+    return fill
+
+class Interrupted(Exception):
+    pass
+
+def interrupt_after(monkeypatch, writer_class, batches):
+    """Make writer_class raise on its batches + 1'th write, as a killed export would stop"""
+    original = writer_class.write_batch
+    calls = []
+
+    def write_batch(self, rows):
+        calls.append(len(rows))
+        if len(calls) > batches:
+            raise Interrupted()
+        return original(self, rows)
+    monkeypatch.setattr(writer_class, 'write_batch', write_batch)
+    return lambda: monkeypatch.setattr(writer_class, 'write_batch', original)
+
+def csv_numbers(path):
+    with open(path, newline='', encoding='utf-8') as handle:
+        return [row['application_number'] for row in csv.DictReader(handle)]
+
+def test_csv_export(tmp_path, applications):
+    out = str(tmp_path / "mis.csv")
+    assert export_applications(applications(7), out, batch_size=3) == 7
+    assert csv_numbers(out) == [f"MSMEHO{i:07d}" for i in range(7)]
+    assert not os.path.exists(f"{out}.checkpoint")
+
+def test_csv_resume_after_interruption(tmp_path, monkeypatch, applications):
+    database = applications(10)
+    out = str(tmp_path / "mis.csv")
+    restore = interrupt_after(monkeypatch, application_export.CsvExportWriter, 2)
+    with pytest.raises(Interrupted):
+        export_applications(database, out, batch_size=3)
+    with open(f"{out}.checkpoint") as handle:
+        assert json.load(handle)['rows'] == 6
+
+    restore()
+    assert export_applications(database, out, batch_size=3, resume=True) == 4
+    assert csv_numbers(out) == [f"MSMEHO{i:07d}" for i in range(10)]
+    assert not os.path.exists(f"{out}.checkpoint")
+
+def test_resume_refuses_checkpoint_of_other_export(tmp_path, monkeypatch, applications):
+    database = applications(10)
+    out = str(tmp_path / "mis.csv")
+    interrupt_after(monkeypatch, application_export.CsvExportWriter, 1)
+    with pytest.raises(Interrupted):
+        export_applications(database, out, batch_size=3)
+    with pytest.raises(ValueError):
+        export_applications(database, out, batch_size=3, resume=True, statuses=['Approved'])
+
+def test_status_filter(tmp_path, applications):
+    out = str(tmp_path / "approved.csv")
+    assert export_applications(applications(7), out, statuses=['Approved'], batch_size=2) == 3
+    assert csv_numbers(out) == [f"MSMEHO{i:07d}" for i in (0, 3, 6)]
+
+def test_export_key():
+    criteria = build_criteria(statuses=['Approved'])
+    assert export_key(criteria, 'csv') == export_key(build_criteria(statuses=['Approved']), 'csv')
+    assert export_key(criteria, 'csv') != export_key(criteria, 'parquet')
+    assert export_key(criteria, 'csv') != export_key(criteria, 'csv', summaries=True)
+    assert export_key(criteria, 'csv') != export_key(build_criteria(), 'csv')
+
+def test_parquet_parts_resume(tmp_path, monkeypatch, applications):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setitem(application_export.WRITERS, 'parquet',
+                        functools.partial(application_export.ParquetExportWriter, part_rows=10))
+    database = applications(25)
+    out = str(tmp_path / "mis.parquet")
+    # Batches of 5: the first part closes after two batches, the crash is in the second part
+    restore = interrupt_after(monkeypatch, application_export.ParquetExportWriter, 3)
+    with pytest.raises(Interrupted):
+        export_applications(database, out, 'parquet', batch_size=5)
+    with open(f"{out}.checkpoint") as handle:
+        assert json.load(handle)['position'] == 1
+
+    restore()
+    assert export_applications(database, out, 'parquet', batch_size=5, resume=True) == 15
+    files = export_files(out)
+    assert len(files) == 3
+    numbers = [n for path in files for n in pq.read_table(path).column('application_number').to_pylist()]
+    assert numbers == [f"MSMEHO{i:07d}" for i in range(25)]
+
+def test_parquet_empty_export(tmp_path, applications):
+    pq = pytest.importorskip("pyarrow.parquet")
+    out = str(tmp_path / "empty.parquet")
+    assert export_applications(applications(0), out, 'parquet') == 0
+    assert pq.read_table(out).num_rows == 0
@@ -0,0 +1,70 @@
+from datetime import datetime
+import pytest
+import streamlit as st
+import application_numbers
+from application_numbers import allocate_application_number, ensure_application_number, ApplicationNumberUnavailable
+
+NOW = datetime(2026, 10, 19)
+
+@pytest.fixture(autouse=True)
+def fresh_blocks(monkeypatch):
+    monkeypatch.setattr(application_numbers, '_blocks', {})
+    monkeypatch.setattr(application_numbers, 'BLOCK_SIZE', 3)
+
+@pytest.fixture
+def session(memory_database, monkeypatch):
+    import database
+    monkeypatch.setattr(database, 'get_database', lambda: memory_database)
+    monkeypatch.setattr(application_numbers, 'BRANCH_CODE', "PUN")
+    for key in ('application_number', 'application_id'):
+        st.session_state.pop(key, None)
+    yield st.session_state
+    for key in ('application_number', 'application_id'):
+        st.session_state.pop(key, None)
+
+def connecting(database, monkeypatch):
+    monkeypatch.setitem(database.readiness, 'state', 'connecting')
+
+def test_numbers_come_from_reserved_blocks(memory_database):
+    numbers = [allocate_application_number(memory_database, 'PUN', NOW) for _ in range(4)]
+    assert numbers == [f"MSMEPUN261019{n:07d}" for n in (1, 2, 3, 4)]
+    # Four numbers from blocks of three: two round trips
+    assert memory_database.db.counters.find_one({'_id': 'application_number:PUN'})['next'] == 6
+
+def test_branches_count_separately(memory_database):
+    assert allocate_application_number(memory_database, 'PUN', NOW).endswith('0000001')
+    assert allocate_application_number(memory_database, 'NGP', NOW) == "MSMENGP2610190000001"
+
+def test_rest_of_block_is_issued_while_connecting(memory_database, monkeypatch):
+    allocate_application_number(memory_database, 'PUN', NOW)
+    connecting(memory_database, monkeypatch)
+    assert allocate_application_number(memory_database, 'PUN', NOW).endswith('0000002')
+    assert allocate_application_number(memory_database, 'PUN', NOW).endswith('0000003')
+    with pytest.raises(ApplicationNumberUnavailable):
+        allocate_application_number(memory_database, 'PUN', NOW)
+
+def test_first_save_while_connecting_is_numbered_when_drained(memory_database, session, monkeypatch):
+    connecting(memory_database, monkeypatch)
+    with pytest.raises(ApplicationNumberUnavailable):
+        ensure_application_number()
+    result = memory_database.save_application({'status': 'Submitted', 'basic_info': {}, 'form_data': {}})
+    session.application_id = result.inserted_id
+    assert memory_database.pending_write_count() == 1
+    with pytest.raises(ApplicationNumberUnavailable):
+        ensure_application_number()
+
+    memory_database.readiness['state'] = 'ready'
+    memory_database._drain_pending_writes()
+    saved = memory_database.get_application(result.inserted_id)
+    assert saved['application_number'].startswith("MSMEPUN")
+    # The session picks up the number the queued save was given
+    assert ensure_application_number() == saved['application_number']
+
+def test_branch_code_required_on_embedded(monkeypatch):
+    import database
+    monkeypatch.setattr(application_numbers, 'BRANCH_CODE', "")
+    monkeypatch.setattr(database, 'DB_BACKEND', 'embedded')
+    with pytest.raises(RuntimeError):
+        application_numbers.branch_code()
+    monkeypatch.setattr(database, 'DB_BACKEND', 'atlas')
+    assert application_numbers.branch_code() == application_numbers.DEFAULT_BRANCH_CODE
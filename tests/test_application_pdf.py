@@ -0,0 +1,55 @@
+from datetime import datetime
+import pytest
+import application_pdf
+from application_pdf import application_version, get_application_pdf, SUMMARY_PDF_KIND
+
+APPLICATION = {
+    'application_number': "MSMEHO0000001",
+    'status': 'Submitted',
+    'basic_info': {'enterprise_name': "Balaji Traders"},
+    'form_data': {'loan_branch': "Pune Camp", 'proposed_facility_amount_0': "25"}
+}
+DOCUMENT = {'file_id': 1, 'filename': "pan.png", 'upload_date': datetime(2026, 10, 1, 10, 30)}
+
+@pytest.fixture
+def renders(monkeypatch):
+    rendered = []
+    def render(application, documents, previews):
+        rendered.append(application['status'])
+        return f"PDF {application['status']} {len(documents)}".encode()
+    monkeypatch.setattr(application_pdf, 'render_application_pdf', render)
+    return rendered
+
+def test_version_follows_content():
+    version = application_version(APPLICATION, [DOCUMENT])
+    assert application_version(dict(APPLICATION), [dict(DOCUMENT)]) == version
+    assert application_version(dict(APPLICATION, status='Approved'), [DOCUMENT]) != version
+    assert application_version(APPLICATION, []) != version
+    assert application_version(APPLICATION, [dict(DOCUMENT, filename="pan-card.png")]) != version
+
+def test_version_changes_with_layout(monkeypatch):
+    version = application_version(APPLICATION, [])
+    monkeypatch.setattr(application_pdf, 'LAYOUT_VERSION', application_pdf.LAYOUT_VERSION + 1)
+    assert application_version(APPLICATION, []) != version
+
+def test_pdf_rendered_once_per_version(memory_database, renders):
+    assert get_application_pdf(memory_database, APPLICATION) == b"PDF Submitted 0"
+    assert get_application_pdf(memory_database, APPLICATION) == b"PDF Submitted 0"
+    assert renders == ['Submitted']
+
+    approved = dict(APPLICATION, status='Approved')
+    assert get_application_pdf(memory_database, approved) == b"PDF Approved 0"
+    assert renders == ['Submitted', 'Approved']
+    # Only the latest version is kept
+    cached = memory_database.db.fs.files.find({'metadata.sidecar_kind': SUMMARY_PDF_KIND})
+    assert [entry['metadata']['version'] for entry in cached] == [application_version(approved, [])]
+
+def test_rendered_file_queued_while_connecting(memory_database, monkeypatch):
+    monkeypatch.setitem(memory_database.readiness, 'state', 'connecting')
+    memory_database.save_rendered_file("MSMEHO0000001", SUMMARY_PDF_KIND, "v1", b"PDF", "a.pdf", 'application/pdf')
+    assert memory_database.pending_write_count() == 1
+    assert memory_database.db.fs.files.count_documents({}) == 0
+
+    memory_database.readiness['state'] = 'ready'
+    memory_database._drain_pending_writes()
+    assert memory_database.get_rendered_file("MSMEHO0000001", SUMMARY_PDF_KIND, "v1") == b"PDF"
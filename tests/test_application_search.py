@@ -0,0 +1,78 @@
+import pytest
+from application_search import (
+    name_grams, gram_query, normalize_name, normalize_mobile, pan_from_gstin,
+    build_search_keys, search_applications, paginate_ranked
+)
+
+APPLICATIONS = [
+    ("MSMEHO2610190000001", "Shree Balaji Traders Pvt Ltd", "ABCDE1234F", "9876543210"),
+    ("MSMEHO2610190000002", "Balaji Steel Works", "ABCDE1299X", "9123456780"),
+    ("MSMEHO2610190000003", "Krishna Textiles", "PQRSX6789L", "9000000001"),
+]
+
+@pytest.fixture
+def db(memory_database, monkeypatch):
+    db = memory_database.db
+    for number, name, pan, mobile in APPLICATIONS:
+        application = {'application_number': number,
+                       'basic_info': {'enterprise_name': name, 'pan': pan, 'mobile': mobile}}
+        application['search'] = build_search_keys(application)
+        db.applications.insert_one(application)
+
+    def aggregate(pipeline):
+        # mongomock has no $setIntersection; count the overlap the same way here
+        probe = pipeline[0]['$match']['search.name_grams']['$in']
+        grams = pipeline[2]['$project']['overlap']['$size']['$setIntersection'][1]
+        required = pipeline[3]['$match']['overlap']['$gte']
+        for doc in db.applications.find({'search.name_grams': {'$in': probe}}):
+            if len(set(doc['search']['name_grams']) & set(grams)) >= required:
+                yield doc
+    monkeypatch.setattr(db.applications, 'aggregate', aggregate)
+    return db
+
+def numbers(results):
+    return [doc['application_number'] for doc in results[0]]
+
+def test_normalization():
+    assert normalize_name("M/s. Shree Balaji Traders Pvt. Ltd.") == "shree balaji traders"
+    assert normalize_mobile("+91 098765 43210") == "9876543210"
+    assert pan_from_gstin("27abcde1234f1z5") == "ABCDE1234F"
+    assert pan_from_gstin("27ABCDE") is None
+
+def test_name_grams():
+    assert name_grams("ram") == [" ra", "am ", "ram"]
+    assert name_grams("") == []
+
+def test_gram_query_probes_enough_grams():
+    grams = name_grams("balaji traders")
+    probe, required = gram_query(grams, min_overlap=0.5)
+    assert required == -(-len(grams) // 2)
+    assert len(probe) == len(grams) - required + 1
+    # Word-interior grams are looked up before word-start and word-end ones
+    is_edge = [gram.startswith(' ') or gram.endswith(' ') for gram in probe]
+    assert is_edge == sorted(is_edge)
+    # A name sharing `required` grams cannot miss every probe gram
+    assert len(set(grams) - set(probe)) < required
+
+def test_exact_identifier_ranks_above_prefix(db):
+    results = search_applications(db, "ABCDE12", text_search=False)
+    assert sorted(numbers(results)) == ["MSMEHO2610190000001", "MSMEHO2610190000002"]
+    assert numbers(search_applications(db, "abcde1299x", text_search=False))[0] == "MSMEHO2610190000002"
+    assert numbers(search_applications(db, "MSMEHO2610190000003", text_search=False)) == ["MSMEHO2610190000003"]
+
+def test_mobile_with_country_code(db):
+    assert numbers(search_applications(db, "+91 91234 56780", text_search=False)) == ["MSMEHO2610190000002"]
+
+def test_name_search_tolerates_typos(db):
+    results = search_applications(db, "balaji tradrs", text_search=False)
+    assert numbers(results)[0] == "MSMEHO2610190000001"
+    assert "MSMEHO2610190000003" not in numbers(results)
+
+def test_unrelated_name_finds_nothing(db):
+    assert search_applications(db, "zzyzx quorum", text_search=False) == ([], 0)
+
+def test_paginate_ranked():
+    scored = {i: (score, {'_id': i}) for i, score in enumerate([60, 200, 150, 90])}
+    page, total = paginate_ranked(scored, page=0, page_size=2)
+    assert [doc['_id'] for doc in page] == [1, 2] and total == 4
+    assert [doc['_id'] for doc in paginate_ranked(scored, page=1, page_size=2)[0]] == [3, 0]
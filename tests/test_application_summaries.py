@@ -0,0 +1,73 @@
+from datetime import datetime
+from application_summaries import build_summary, save_summary
+
+APPLICATION = {
+    'application_number': "MSMEHO0000001",
+    'status': 'Submitted',
+    'submission_date': datetime(2026, 10, 1, 10, 30),
+    'basic_info': {'enterprise_name': "Balaji Traders", 'state': "Maharashtra", 'classification': "Micro"},
+    'form_data': {
+        'loan_branch': "Pune Camp",
+        'proposed_facility_amount_0': "25",
+        'proposed_facility_amount_1': "1.5 cr",
+        'proposed_facility_amount_2': "to be decided",
+        'proposed_facility_purpose_0': "Working capital"
+    }
+}
+
+def test_full_summary():
+    assert build_summary(APPLICATION) == {
+        'application_number': "MSMEHO0000001",
+        'status': 'Submitted',
+        'submission_date': datetime(2026, 10, 1, 10, 30),
+        'enterprise_name': "Balaji Traders",
+        'state': "Maharashtra",
+        'classification': "Micro",
+        'loan_branch': "Pune Camp",
+        # 25 lakh + 1.5 crore; text that is not an amount is left out
+        'total_proposed_paise': (25 * 100_000 + 15_000_000) * 100
+    }
+
+def test_status_only_update_touches_status_fields():
+    summary = build_summary({'status': 'Approved', 'last_updated': datetime(2026, 10, 2)})
+    assert summary == {'status': 'Approved', 'last_updated': datetime(2026, 10, 2)}
+
+def test_missing_sections_are_not_summarized():
+    summary = build_summary({'application_number': "MSMEHO0000001", 'basic_info': None})
+    assert summary == {'application_number': "MSMEHO0000001", 'enterprise_name': None,
+                       'state': None, 'classification': None}
+    assert build_summary({'form_data': {}}) == {'loan_branch': None, 'total_proposed_paise': 0}
+
+def test_string_dates_are_parsed():
+    summary = build_summary({'submission_date': "2026-10-01T10:30:00", 'last_updated': "not a date"})
+    assert summary == {'submission_date': datetime(2026, 10, 1, 10, 30), 'last_updated': None}
+
+def test_partial_save_keeps_other_fields(memory_database):
+    db = memory_database.db
+    save_summary(db, 1, APPLICATION)
+    save_summary(db, 1, {'status': 'Approved'})
+    save_summary(db, 1, {})
+    summary = db.application_summaries.find_one({'_id': 1})
+    assert summary['status'] == 'Approved'
+    assert summary['loan_branch'] == "Pune Camp" and summary['enterprise_name'] == "Balaji Traders"
+
+def test_saves_and_updates_keep_summary_in_step(memory_database):
+    result = memory_database.save_application(dict(APPLICATION))
+    application_id = result.inserted_id
+    memory_database.update_application(str(application_id), {
+        'basic_info': dict(APPLICATION['basic_info'], enterprise_name="Balaji Traders LLP"),
+        'form_data': {'loan_branch': "Pune Camp", 'proposed_facility_amount_0': "10"}
+    })
+    summary = memory_database.db.application_summaries.find_one({'_id': application_id})
+    assert summary['enterprise_name'] == "Balaji Traders LLP"
+    assert summary['total_proposed_paise'] == 10 * 100_000 * 100
+    assert summary['status'] == 'Submitted'
+
+def test_rebuild_matches_incremental_summaries(memory_database):
+    db = memory_database.db
+    for i in range(5):
+        memory_database.save_application(dict(APPLICATION, application_number=f"MSMEHO{i:07d}"))
+    incremental = {doc['_id']: doc for doc in db.application_summaries.find({})}
+    db.application_summaries.update_many({}, {'$set': {'status': 'stale'}})
+    assert memory_database.rebuild_summaries(batch_size=2) == 5
+    assert {doc['_id']: doc for doc in db.application_summaries.find({})} == incremental
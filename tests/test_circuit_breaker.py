@@ -0,0 +1,57 @@
+from circuit_breaker import CircuitBreaker, OperationMetrics
+
+def test_opens_after_threshold_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.is_closed() and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.snapshot()['opens'] == 1
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.is_closed()
+
+def test_half_open_admits_one_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+
+def test_probe_success_closes_and_calls_on_close():
+    closed = []
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0, on_close=lambda: closed.append(True))
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.is_closed() and closed == [True]
+    # Successes while already closed do not call it again
+    breaker.record_success()
+    assert closed == [True]
+
+def test_probe_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=0)
+    for _ in range(5):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.snapshot()['opens'] == 2
+
+def test_operation_metrics_snapshot():
+    metrics = OperationMetrics()
+    metrics.increment('queued_writes')
+    metrics.increment('queued_writes', 2)
+    metrics.observe('save', 0.1)
+    metrics.observe('save', 0.3)
+    snapshot = metrics.snapshot()
+    assert snapshot['counters'] == {'queued_writes': 3}
+    assert snapshot['latencies']['save']['calls'] == 2
+    assert round(snapshot['latencies']['save']['mean_ms']) == 200
+    assert round(snapshot['latencies']['save']['max_ms']) == 300
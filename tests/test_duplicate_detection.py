@@ -0,0 +1,63 @@
+import pytest
+import duplicate_detection
+from duplicate_detection import build_blocking_keys, hash_identifier, save_blocking_keys, find_related_applications
+
+APPLICATION = {
+    'application_number': "MSMEHO0000001",
+    'basic_info': {
+        'enterprise_name': "Shree Balaji Traders Pvt Ltd",
+        'pan': "abcde1234f",
+        'gst_number': "27ABCDE1234F1Z5",
+        'mobile': "+91 98765 43210"
+    },
+    'directors': [{'name': "R. Sharma", 'pan': "PQRSX6789L", 'aadhaar': "1234 5678 9012"}]
+}
+
+@pytest.fixture
+def secret(monkeypatch):
+    monkeypatch.setattr(duplicate_detection, 'BLOCKING_KEY_SECRET', "secret")
+
+def keys(application):
+    return {entry['key'] for entry in build_blocking_keys(application)}
+
+def test_blocking_keys_skip_generic_words():
+    found = keys(APPLICATION)
+    assert 'name:bala' in found
+    assert not {'name:shre', 'name:trad'} & found
+    assert {'pan:ABCDE1234F', 'gstin:27ABCDE1234F1Z5', 'mobile:9876543210', 'pan:PQRSX6789L'} <= found
+
+def test_pan_from_gstin_is_not_repeated():
+    enterprise_pans = [entry for entry in build_blocking_keys(APPLICATION)
+                       if entry['key'] == 'pan:ABCDE1234F' and entry['role'] == 'enterprise']
+    assert len(enterprise_pans) == 1
+
+def test_aadhaar_left_out_without_secret(monkeypatch):
+    monkeypatch.setattr(duplicate_detection, 'BLOCKING_KEY_SECRET', "")
+    assert hash_identifier("123456789012") is None
+    assert not any(key.startswith('aadhaar:') for key in keys(APPLICATION))
+
+def test_aadhaar_stored_as_hmac(secret, monkeypatch):
+    aadhaar = [key for key in keys(APPLICATION) if key.startswith('aadhaar:')]
+    assert aadhaar == [f"aadhaar:{hash_identifier('123456789012')}"]
+    assert '123456789012' not in aadhaar[0]
+    monkeypatch.setattr(duplicate_detection, 'BLOCKING_KEY_SECRET', "other")
+    assert f"aadhaar:{hash_identifier('123456789012')}" != aadhaar[0]
+
+def test_related_applications(memory_database, secret):
+    db = memory_database.db
+    same_director = {
+        'application_number': "MSMEHO0000002",
+        'basic_info': {'enterprise_name': "Krishna Textiles"},
+        'directors': [{'name': "Ramesh Sharma", 'aadhaar': "123456789012"}]
+    }
+    similar_name = {'application_number': "MSMEHO0000003", 'basic_info': {'enterprise_name': "Balaji Traders"}}
+    unrelated = {'application_number': "MSMEHO0000004", 'basic_info': {'enterprise_name': "Balasore Mills"}}
+    for application in (APPLICATION, same_director, similar_name, unrelated):
+        db.applications.insert_one(dict(application, status='Submitted'))
+        save_blocking_keys(db, application)
+
+    flags = {flag['application_number']: flag['reason'] for flag in find_related_applications(db, "MSMEHO0000001")}
+    assert set(flags) == {"MSMEHO0000002", "MSMEHO0000003"}
+    # The Aadhaar match is reported without the number
+    assert "Aadhaar" in flags["MSMEHO0000002"] and "1234" not in flags["MSMEHO0000002"]
+    assert "Similar enterprise name" in flags["MSMEHO0000003"]
@@ -0,0 +1,107 @@
+import io
+import os
+from datetime import datetime
+import pytest
+from bson import ObjectId
+
+def application(number, name, pan, **fields):
+    return dict({
+        'application_number': number,
+        'status': 'Submitted',
+        'submission_date': datetime(2026, 10, 1, 10, 30),
+        'basic_info': {'enterprise_name': name, 'pan': pan},
+        'form_data': {'loan_branch': "Pune Camp", 'proposed_facility_amount_0': "25"}
+    }, **fields)
+
+def png(color):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 40), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def save_png(database, number, color):
+    return database.save_document(png(color), {
+        'filename': "pan.png", 'content_type': 'image/png', 'document_type': "PAN Card",
+        'application_number': number, 'section': "Directors"
+    })
+
+def test_save_and_update_round_trip(embedded_database):
+    application_id = embedded_database.save_application(
+        application("MSMEHO0000001", "Balaji Traders", "ABCDE1234F")).inserted_id
+    saved = embedded_database.get_application(str(application_id))
+    assert saved['_id'] == application_id
+    assert saved['submission_date'] == datetime(2026, 10, 1, 10, 30)
+    assert saved['typed']['amounts'] == {'proposed_facility_amount_0': 25 * 100_000 * 100}
+
+    embedded_database.update_application(str(application_id), {'form_data': {'loan_branch': "Nagpur"}})
+    saved = embedded_database.get_application({'application_number': "MSMEHO0000001"})
+    assert saved['form_data'] == {'loan_branch': "Nagpur"}
+    assert saved['basic_info']['enterprise_name'] == "Balaji Traders"
+    [summary] = embedded_database.get_application_summaries()
+    assert summary['loan_branch'] == "Nagpur" and summary['total_proposed_paise'] == 0
+
+def test_summaries_filter_and_count(embedded_database):
+    for i in range(4):
+        embedded_database.save_application(application(f"MSMEHO{i:07d}", f"Enterprise {i}", f"ABCDE{i:04d}F",
+                                                       status='Approved' if i % 2 else 'Submitted'))
+    counts = {row['_id']: (row['count'], row['total_proposed_paise']) for row in embedded_database.get_status_counts()}
+    assert counts == {'Approved': (2, 2 * 25 * 100_000 * 100), 'Submitted': (2, 2 * 25 * 100_000 * 100)}
+    approved = embedded_database.get_application_summaries({'status': {'$in': ['Approved']}})
+    assert sorted(row['application_number'] for row in approved) == ["MSMEHO0000001", "MSMEHO0000003"]
+    recent = embedded_database.get_application_summaries({'submission_date': {'$gte': datetime(2026, 10, 1)}})
+    assert len(recent) == 4
+
+def test_search(embedded_database):
+    embedded_database.save_application(application("MSMEHO0000001", "Shree Balaji Traders", "ABCDE1234F"))
+    embedded_database.save_application(application("MSMEHO0000002", "Krishna Textiles", "PQRSX6789L"))
+    results, total = embedded_database.search_text("balaji tradrs")
+    assert total == 1 and results[0]['application_number'] == "MSMEHO0000001"
+    results, _ = embedded_database.search_text("pqrsx")
+    assert [doc['application_number'] for doc in results] == ["MSMEHO0000002"]
+    assert embedded_database.search_text("zzyzx quorum") == ([], 0)
+
+def test_status_transitions(embedded_database):
+    embedded_database.save_application(application("MSMEHO0000001", "Balaji Traders", "ABCDE1234F"))
+    current = embedded_database.get_application({'application_number': "MSMEHO0000001"})
+    assert embedded_database.update_statuses([current], 'Approved', "Sanctioned") == 1
+    assert embedded_database.get_application(current['_id'])['status'] == 'Approved'
+    assert embedded_database.get_application_summaries()[0]['status'] == 'Approved'
+    [event] = embedded_database.get_status_events("MSMEHO0000001")
+    assert (event['from_status'], event['status'], event['remarks']) == ('Submitted', 'Approved', "Sanctioned")
+
+def test_documents_round_trip(embedded_database):
+    file_id = save_png(embedded_database, "MSMEHO0000001", "red")
+    stored = embedded_database.get_document(file_id)
+    assert stored.metadata['document_type'] == "PAN Card"
+    [document] = embedded_database.get_application_documents("MSMEHO0000001")
+    assert document['file_id'] == file_id and document['data'] == stored.read()
+    assert file_id in embedded_database.get_document_previews("MSMEHO0000001")
+
+def test_delete_keeps_files_another_application_uses(embedded_database):
+    first = embedded_database.save_application(application("MSMEHO0000001", "Balaji Traders", "ABCDE1234F"))
+    save_png(embedded_database, "MSMEHO0000001", "red")
+    save_png(embedded_database, "MSMEHO0000001", "blue")
+    shared = save_png(embedded_database, "MSMEHO0000002", "red")
+    current = embedded_database.get_application(first.inserted_id)
+    embedded_database.update_statuses([current], 'Rejected')
+
+    assert embedded_database.delete_application(str(first.inserted_id)) is True
+    assert embedded_database.get_application(first.inserted_id) is None
+    assert embedded_database.get_application_documents("MSMEHO0000001") == []
+    assert embedded_database.get_status_events("MSMEHO0000001") == []
+    assert embedded_database.pending_deletions() == [first.inserted_id]
+    # The red image is still used by the other application; the blue one is gone
+    assert embedded_database.get_document(shared).read() == embedded_database.get_application_documents(
+        "MSMEHO0000002")[0]['data']
+    paths = {path for path, in embedded_database._connection().execute("SELECT path FROM documents")}
+    stored = {os.path.relpath(os.path.join(root, name), embedded_database.files_dir)
+              for root, _, names in os.walk(embedded_database.files_dir) for name in names}
+    assert stored == paths
+
+def test_delete_missing_application(embedded_database):
+    assert embedded_database.delete_application(str(ObjectId())) is False
+
+def test_counter_blocks(embedded_database):
+    assert embedded_database.reserve_counter_block("application_number:PUN", 100) == 1
+    assert embedded_database.reserve_counter_block("application_number:PUN", 100) == 101
+    assert embedded_database.reserve_counter_block("application_number:NGP", 100) == 1
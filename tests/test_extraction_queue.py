@@ -0,0 +1,105 @@
+import time
+import pytest
+import extraction_queue
+from extraction_queue import ExtractionQueue, MAX_ATTEMPTS, RETRY_DELAY
+
+@pytest.fixture
+def queue(tmp_path):
+    return ExtractionQueue(str(tmp_path / "queue.sqlite3"))
+
+def set_job(queue, job_key, **fields):
+    assignments = ', '.join(f"{field} = ?" for field in fields)
+    queue._connection().execute(f"UPDATE jobs SET {assignments} WHERE job_key = ?",
+                                list(fields.values()) + [job_key])
+
+def test_submit_is_idempotent_per_content_and_type(queue):
+    first = queue.submit(b"pdf", "a.pdf", "application/pdf", "PAN Card")
+    assert first['state'] == 'pending'
+    assert queue.submit(b"pdf", "b.pdf", "application/pdf", "PAN Card")['id'] == first['id']
+    assert queue.submit(b"pdf", "a.pdf", "application/pdf", "Udyam Certificate")['id'] != first['id']
+
+def test_claim_takes_oldest_job_once(queue):
+    first = queue.submit(b"one", "1.pdf", "application/pdf", "PAN Card")
+    second = queue.submit(b"two", "2.pdf", "application/pdf", "PAN Card")
+    job = queue.claim("w1", {})
+    assert job['id'] == first['id'] and job['payload'] == b"one" and job['attempts'] == 1
+    assert queue.claim("w2", {})['id'] == second['id']
+    assert queue.claim("w3", {}) is None
+
+def test_claim_respects_type_limits(queue):
+    queue.submit(b"one", "1.pdf", "application/pdf", "Bank Statement")
+    queue.submit(b"two", "2.pdf", "application/pdf", "Bank Statement")
+    other = queue.submit(b"three", "3.pdf", "application/pdf", "PAN Card")
+    limits = {'Bank Statement': 1}
+    assert queue.claim("w1", limits)['document_type'] == 'Bank Statement'
+    # The second statement waits; the PAN card goes ahead of it
+    assert queue.claim("w2", limits)['id'] == other['id']
+    assert queue.claim("w3", limits) is None
+
+def test_complete_stores_result_and_drops_payload(queue):
+    submitted = queue.submit(b"one", "1.pdf", "application/pdf", "PAN Card")
+    job = queue.claim("w1", {})
+    queue.complete(job['id'], {'pan': "ABCDE1234F"})
+    done = queue.get(submitted['job_key'])
+    assert done['state'] == 'done' and done['result'] == {'pan': "ABCDE1234F"}
+    payload = queue._connection().execute("SELECT payload FROM jobs WHERE id = ?", (job['id'],)).fetchone()[0]
+    assert payload is None
+
+def test_failed_attempts_back_off_then_fail(queue):
+    submitted = queue.submit(b"one", "1.pdf", "application/pdf", "PAN Card")
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        set_job(queue, submitted['job_key'], run_after=0)
+        job = queue.claim("w1", {})
+        assert job['attempts'] == attempt
+        queue.fail(job['id'], job['attempts'], "unreadable")
+        if attempt < MAX_ATTEMPTS:
+            # Not claimable until its backoff has passed
+            assert queue.claim("w1", {}) is None
+    failed = queue.get(submitted['job_key'])
+    assert failed['state'] == 'failed' and failed['error'] == "unreadable"
+
+def test_failed_job_is_retried_only_on_request(queue):
+    submitted = queue.submit(b"one", "1.pdf", "application/pdf", "PAN Card")
+    set_job(queue, submitted['job_key'], state='failed', payload=None, attempts=MAX_ATTEMPTS)
+    assert queue.submit(b"one", "1.pdf", "application/pdf", "PAN Card")['state'] == 'failed'
+
+    retried = queue.submit(b"one", "1.pdf", "application/pdf", "PAN Card", retry_failed=True)
+    assert retried['state'] == 'pending' and retried['attempts'] == 0
+    job = queue.claim("w1", {})
+    assert job['payload'] == b"one"
+
+def test_lost_worker_job_is_reclaimed_after_backoff(queue):
+    submitted = queue.submit(b"one", "1.pdf", "application/pdf", "PAN Card")
+    job = queue.claim("w1", {})
+    set_job(queue, submitted['job_key'], lease_expires=time.time() - 1)
+    # Reclaimed, but held back by the retry delay
+    assert queue.claim("w2", {}) is None
+    reclaimed = queue.get(submitted['job_key'])
+    assert reclaimed['state'] == 'pending' and reclaimed['error'] == 'worker lost'
+    run_after = queue._connection().execute("SELECT run_after FROM jobs WHERE id = ?", (job['id'],)).fetchone()[0]
+    assert run_after >= time.time() + RETRY_DELAY - 1
+
+def test_lost_worker_on_last_attempt_fails_job(queue):
+    submitted = queue.submit(b"one", "1.pdf", "application/pdf", "PAN Card")
+    queue.claim("w1", {})
+    set_job(queue, submitted['job_key'], attempts=MAX_ATTEMPTS, lease_expires=time.time() - 1)
+    assert queue.claim("w2", {}) is None
+    assert queue.get(submitted['job_key'])['state'] == 'failed'
+
+def test_prune_removes_old_finished_jobs(queue):
+    old = queue.submit(b"old", "1.pdf", "application/pdf", "PAN Card")
+    recent = queue.submit(b"new", "2.pdf", "application/pdf", "PAN Card")
+    pending = queue.submit(b"pending", "3.pdf", "application/pdf", "PAN Card")
+    set_job(queue, old['job_key'], state='done', updated_at=time.time() - 48 * 3600)
+    set_job(queue, recent['job_key'], state='done')
+    set_job(queue, pending['job_key'], updated_at=time.time() - 48 * 3600)
+    assert queue.prune(retention_hours=24) == 1
+    assert queue.get(old['job_key']) is None
+    assert queue.get(recent['job_key']) and queue.get(pending['job_key'])
+
+def test_workers_alive(queue, monkeypatch):
+    assert not queue.workers_alive()
+    queue.heartbeat("w1")
+    assert queue.workers_alive()
+    monkeypatch.setattr(extraction_queue, 'WORKER_TIMEOUT', -1)
+    assert not queue.workers_alive()
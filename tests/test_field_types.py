@@ -0,0 +1,32 @@
+from datetime import datetime
+import pytest
+from amounts import LAKH
+from field_types import parse_date, typed_fields
+
+@pytest.mark.parametrize("text", ["05/04/2024", "05-04-2024", "05.04.2024", "2024-04-05", "2024-04-05T00:00:00"])
+def test_parse_date(text):
+    assert parse_date(text) == datetime(2024, 4, 5)
+
+def test_parse_date_rejects():
+    assert parse_date("31/02/2024") is None
+    assert parse_date(None) is None
+
+def test_typed_fields():
+    typed = typed_fields({
+        'basic_info': {'date_of_incorporation': "01/04/2020"},
+        'directors': [{'dob': "15/08/1980"}],
+        'form_data': {
+            'proposed_facility_amount_0': "25",
+            'existing_facility_limit_0': "1 cr",
+            'proposed_facility_purpose_0': "Working capital",
+            'collateral_value_0': "not known"
+        }
+    })
+    assert typed['dates'] == {
+        'date_of_incorporation': datetime(2020, 4, 1),
+        'director_dob_0': datetime(1980, 8, 15)
+    }
+    assert typed['amounts'] == {
+        'proposed_facility_amount_0': 25 * LAKH * 100,
+        'existing_facility_limit_0': 100 * LAKH * 100
+    }
@@ -0,0 +1,67 @@
+import pytest
+from pymongo import UpdateOne
+import migrations
+from migrations import run_migration
+from upload_buffers import content_hash
+
+def mark_migration(database, document, dry_run=False):
+    return {'applications': [UpdateOne({'_id': document['_id']}, {'$inc': {'migrated': 1}})]}
+
+@pytest.fixture
+def database(memory_database, monkeypatch):
+    monkeypatch.setitem(migrations.MIGRATIONS, 'mark', ('applications', {}, None, mark_migration))
+    memory_database.db.applications.insert_many([{'application_number': f"MSMEHO{i:07d}"} for i in range(10)])
+    return memory_database
+
+def run(database, name='mark', **kwargs):
+    return run_migration(database, name, batch_size=3, docs_per_second=float('inf'), **kwargs)
+
+def migrated(database):
+    return [doc.get('migrated', 0) for doc in database.db.applications.find({}).sort('_id')]
+
+def test_runs_every_document_once(database):
+    assert run(database) == {'documents': 10, 'requests': 10}
+    assert migrated(database) == [1] * 10
+    assert database.get_migration_checkpoint('mark')['done']
+    assert [record['documents'] for record in database.db.migration_batches.find({})] == [3, 3, 3, 1]
+
+def test_resumes_after_last_checkpointed_batch(database, monkeypatch):
+    apply_migration = database.apply_migration
+    calls = []
+    def failing_third_batch(*args):
+        calls.append(args)
+        if len(calls) == 3:
+            raise ConnectionError("connection lost")
+        return apply_migration(*args)
+    monkeypatch.setattr(database, 'apply_migration', failing_third_batch)
+    with pytest.raises(ConnectionError):
+        run(database)
+    checkpoint = database.get_migration_checkpoint('mark')
+    assert checkpoint['documents'] == 6 and not checkpoint['done']
+
+    assert run(database) == {'documents': 10, 'requests': 4}
+    assert migrated(database) == [1] * 10
+
+def test_completed_migration_is_skipped(database):
+    run(database)
+    assert run(database) == {'documents': 0, 'requests': 0}
+    assert migrated(database) == [1] * 10
+    # --restart ignores the checkpoint
+    assert run(database, restart=True)['documents'] == 10
+
+def test_dry_run_writes_nothing(database):
+    assert run(database, dry_run=True) == {'documents': 10, 'requests': 10}
+    assert migrated(database) == [0] * 10
+    assert database.get_migration_checkpoint('mark') is None
+    assert database.db.migration_batches.count_documents({}) == 0
+
+def test_file_hashes(memory_database, monkeypatch):
+    file_id = memory_database.fs.put(b"scanned pan card", filename="pan.png", metadata={})
+    # A dry run counts the file without reading it
+    monkeypatch.setattr(memory_database.fs, 'get', lambda file_id: pytest.fail("file read in a dry run"))
+    assert run(memory_database, 'file_hashes', dry_run=True) == {'documents': 1, 'requests': 1}
+    monkeypatch.undo()
+
+    run(memory_database, 'file_hashes')
+    stored = memory_database.db.fs.files.find_one({'_id': file_id})
+    assert stored['metadata']['sha256'] == content_hash(b"scanned pan card")
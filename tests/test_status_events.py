@@ -0,0 +1,58 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+
+@pytest.fixture
+def applications(memory_database):
+    for i in range(3):
+        memory_database.save_application({
+            'application_number': f"MSMEHO{i:07d}",
+            'status': 'Submitted',
+            'basic_info': {'enterprise_name': f"Enterprise {i}"},
+            'form_data': {'loan_branch': "Pune Camp"}
+        })
+    return list(memory_database.db.applications.find({}, {'application_number': 1, 'status': 1}))
+
+def statuses(db, collection):
+    return {doc['_id']: doc['status'] for doc in db[collection].find({}, {'status': 1})}
+
+def test_bulk_transition_logs_events_and_updates_summaries(memory_database, applications):
+    db = memory_database.db
+    assert memory_database.update_statuses(applications[:2], 'Under Review', "Checked", "Officer A") == 2
+
+    events = list(db.status_events.find({}))
+    assert sorted(event['application_number'] for event in events) == ["MSMEHO0000000", "MSMEHO0000001"]
+    assert {(e['from_status'], e['status'], e['remarks'], e['changed_by']) for e in events} == {
+        ('Submitted', 'Under Review', "Checked", "Officer A")}
+    # Applications and summaries agree, and the third application is untouched
+    assert statuses(db, 'applications') == statuses(db, 'application_summaries')
+    assert sorted(statuses(db, 'applications').values()) == ['Submitted', 'Under Review', 'Under Review']
+
+def test_history_is_newest_first(memory_database, applications):
+    memory_database.update_statuses(applications[:1], 'Under Review')
+    current = memory_database.db.applications.find_one({'_id': applications[0]['_id']})
+    # Timestamps are stored to the millisecond
+    time.sleep(0.01)
+    memory_database.update_statuses([current], 'Approved', "Sanctioned")
+    history = memory_database.get_status_events("MSMEHO0000000")
+    assert [(event['from_status'], event['status']) for event in history] == [
+        ('Under Review', 'Approved'), ('Submitted', 'Under Review')]
+
+def test_later_transition_is_not_overwritten(memory_database, applications):
+    db = memory_database.db
+    later = datetime.now() + timedelta(minutes=5)
+    db.applications.update_one({'_id': applications[0]['_id']},
+                               {'$set': {'status': 'Approved', 'status_changed_at': later}})
+    assert memory_database.update_statuses(applications[:2], 'Rejected') == 1
+    assert db.applications.find_one({'_id': applications[0]['_id']})['status'] == 'Approved'
+    # The event is still logged
+    assert db.status_events.count_documents({}) == 2
+
+def test_empty_transition(memory_database):
+    assert memory_database.update_statuses([], 'Approved') == 0
+
+def test_delete_removes_status_history(memory_database, applications):
+    memory_database.update_statuses(applications, 'Under Review')
+    memory_database.delete_application(str(applications[0]['_id']))
+    assert memory_database.get_status_events("MSMEHO0000000") == []
+    assert memory_database.db.status_events.count_documents({}) == 2
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from bson import ObjectId
+from storage_gc import find_orphaned_files, find_orphaned_chunks, find_duplicate_files, sweep, GRIDFS_CHUNK_SIZE
+
+OLD = datetime.utcnow() - timedelta(days=3)
+
+def add_file(db, application_number, upload_date=OLD, **metadata):
+    file_id = ObjectId()
+    db.fs.files.insert_one({'_id': file_id, 'length': 10, 'uploadDate': upload_date,
+                            'metadata': dict(metadata, application_number=application_number)})
+    db.fs.chunks.insert_one({'files_id': file_id, 'n': 0})
+    return file_id
+
+@pytest.fixture
+def db(memory_database):
+    memory_database.db.applications.insert_one({'application_number': "MSMEHO0000001"})
+    return memory_database.db
+
+def test_orphaned_files(db):
+    kept = add_file(db, "MSMEHO0000001")
+    unsaved = add_file(db, "MSMEHO0000099")
+    draft = add_file(db, "MSMEHO0000098", upload_date=datetime.utcnow())
+    sidecar = add_file(db, "MSMEHO0000001", sidecar_of=ObjectId())
+    found = {item['_id']: item['reason'] for item in find_orphaned_files(db, batch_size=2)}
+    assert found == {unsaved: "no application", sidecar: "parent document deleted"}
+    assert kept not in found and draft not in found
+
+def test_duplicate_uploads_keep_the_oldest(db):
+    first = add_file(db, "MSMEHO0000001", document_type="PAN Card", sha256="abc")
+    second = add_file(db, "MSMEHO0000001", document_type="PAN Card", sha256="abc")
+    add_file(db, "MSMEHO0000001", document_type="Udyam Certificate", sha256="abc")
+    assert [item['_id'] for item in find_duplicate_files(db)] == [max(first, second)]
+
+def test_orphaned_chunks_respect_grace_period(db):
+    orphan = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(hours=5))
+    in_progress = ObjectId()
+    db.fs.chunks.insert_many([{'files_id': orphan, 'n': n} for n in range(2)] +
+                             [{'files_id': in_progress, 'n': 0}])
+    add_file(db, "MSMEHO0000001")
+    found = list(find_orphaned_chunks(db, grace_hours=1))
+    assert [item['_id'] for item in found] == [orphan]
+    assert found[0]['length'] == 2 * GRIDFS_CHUNK_SIZE
+
+def test_sweep_reports_then_purges(memory_database, db):
+    add_file(db, "MSMEHO0000001")
+    add_file(db, "MSMEHO0000099")
+    assert sweep(memory_database) == {'no application': {'files': 1, 'bytes': 10}, 'purged': 0}
+    assert db.fs.files.count_documents({}) == 2
+
+    report = sweep(memory_database, purge=True, files_per_second=float('inf'))
+    assert report['purged'] == 1
+    assert db.fs.files.count_documents({}) == 1
+    assert db.fs.chunks.count_documents({}) == 1
+
+def test_delete_application_removes_its_files(memory_database, db):
+    application_id = db.applications.find_one({})['_id']
+    add_file(db, "MSMEHO0000001")
+    add_file(db, "MSMEHO0000001", sidecar_of=ObjectId())
+    other = add_file(db, "MSMEHO0000002")
+    memory_database.delete_application(str(application_id))
+    assert db.applications.count_documents({}) == 0
+    assert [f['_id'] for f in db.fs.files.find({})] == [other]
+    assert db.fs.chunks.count_documents({}) == 1
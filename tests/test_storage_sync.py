@@ -0,0 +1,90 @@
+import io
+from datetime import datetime, timedelta
+import pytest
+from storage_sync import sync
+
+@pytest.fixture
+def local(embedded_database):
+    embedded_database.save_application({
+        'application_number': "MSMEHO0000001",
+        'status': 'Submitted',
+        'basic_info': {'enterprise_name': "Balaji Traders", 'pan': "ABCDE1234F"},
+        'form_data': {'loan_branch': "Pune Camp", 'proposed_facility_amount_0': "25"}
+    })
+    return embedded_database
+
+def only_application(database):
+    return database.get_application({'application_number': "MSMEHO0000001"})
+
+def save_document(local):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 40), "red").save(buffer, format="PNG")
+    return local.save_document(buffer.getvalue(), {
+        'filename': "pan.png", 'content_type': 'image/png', 'document_type': "PAN Card",
+        'application_number': "MSMEHO0000001", 'section': "Directors"
+    })
+
+def test_round_trip(local, memory_database):
+    local.update_statuses([only_application(local)], 'Under Review', "Checked")
+    file_id = save_document(local)
+
+    counts = sync(local, memory_database)
+    assert counts['applications'] == 1 and counts['status_events'] == 1
+    # The document and its preview
+    assert counts['documents'] == 2
+
+    db = memory_database.db
+    central = db.applications.find_one({})
+    assert central['_id'] == only_application(local)['_id'] and central['status'] == 'Under Review'
+    summary = db.application_summaries.find_one({})
+    assert summary['status'] == 'Under Review' and summary['loan_branch'] == "Pune Camp"
+    assert db.blocking_keys.count_documents({'key': 'pan:ABCDE1234F'}) == 1
+    assert memory_database.get_status_events("MSMEHO0000001")[0]['remarks'] == "Checked"
+    assert memory_database.get_document(file_id).read() == local.get_document(file_id).read()
+
+    # Nothing left to copy
+    assert sync(local, memory_database) == {'applications': 0, 'status_events': 0, 'documents': 0, 'deletions': 0}
+
+def test_local_changes_are_resent(local, memory_database):
+    sync(local, memory_database)
+    local.update_application(str(only_application(local)['_id']), {'form_data': {'loan_branch': "Nagpur"}})
+    assert sync(local, memory_database)['applications'] == 1
+    assert memory_database.db.applications.find_one({})['form_data'] == {'loan_branch': "Nagpur"}
+
+def test_newer_central_status_is_kept(local, memory_database):
+    sync(local, memory_database)
+    later = datetime.now() + timedelta(minutes=5)
+    memory_database.db.applications.update_one({}, {'$set': {'status': 'Approved', 'status_changed_at': later}})
+    local.update_statuses([only_application(local)], 'Rejected')
+    sync(local, memory_database)
+    assert memory_database.db.applications.find_one({})['status'] == 'Approved'
+
+def test_deletions_replayed_centrally(local, memory_database):
+    save_document(local)
+    sync(local, memory_database)
+    local.delete_application(str(only_application(local)['_id']))
+    assert sync(local, memory_database)['deletions'] == 1
+    db = memory_database.db
+    assert db.applications.count_documents({}) == 0
+    assert db.application_summaries.count_documents({}) == 0
+    assert db.fs.files.count_documents({}) == 0
+    assert local.pending_deletions() == []
+
+def test_deletion_of_never_synced_application_is_cleared(local, memory_database):
+    local.delete_application(str(only_application(local)['_id']))
+    assert sync(local, memory_database)['deletions'] == 1
+    assert local.pending_deletions() == []
+
+def test_failed_central_delete_stays_pending(local, memory_database, monkeypatch):
+    sync(local, memory_database)
+    application_id = only_application(local)['_id']
+    local.delete_application(str(application_id))
+    # The breaker is open: the guarded delete returns its fallback
+    monkeypatch.setattr(memory_database.breaker, 'allow', lambda: False)
+    assert sync(local, memory_database)['deletions'] == 0
+    assert local.pending_deletions() == [application_id]
+
+    monkeypatch.undo()
+    assert sync(local, memory_database)['deletions'] == 1
+    assert memory_database.db.applications.count_documents({}) == 0
@@ -0,0 +1,73 @@
+# upload_buffers.py
+
+import io
+import hashlib
+
+def upload_buffer(file):
+    """
+    Return the single read-only buffer for an uploaded file.
+
+    The same memoryview is handed to the hasher, the PDF and image decoders
+    and the GridFS writer, so an upload is held in memory only once.
+
+    Args:
+    file: A Streamlit UploadedFile (or any object with getvalue())
+
+    Returns:
+    memoryview: Read-only view of the upload contents
+    """
+    buffer = getattr(file, '_upload_buffer', None)
+    if buffer is None:
+        # getvalue() returns the bytes object backing the upload without
+        # copying it, and slicing a memoryview of it never copies either
+        buffer = memoryview(file.getvalue())
+        file._upload_buffer = buffer
+    return buffer
+
+def content_hash(buffer):
+    """SHA-256 hex digest of an upload"""
+    return hashlib.sha256(buffer).hexdigest()
+
+class BufferReader(io.RawIOBase):
+    """
+    Seekable file object over a memoryview.
+
+    Decoders and GridFS read from it in pieces, so the whole buffer is
+    never copied into a second bytes object.
+    """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._buffer = memoryview(buffer)
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        size = min(len(target), len(self._buffer) - self._position)
+        if size <= 0:
+            return 0
+        target[:size] = self._buffer[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self._buffer) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+
+    def tell(self):
+        return self._position
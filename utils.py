@@ -1,6 +1,22 @@
 # utils.py
 
 import streamlit as st
+from database import get_database
+from upload_buffers import upload_buffer, content_hash
+from application_numbers import ensure_application_number, ApplicationNumberUnavailable
+
+def upload_hash(file):
+    """
+    SHA-256 of an upload, hashed once per uploaded file.
+
+    The uploader hands back the same file on every rerun; its digest is
+    kept in session state under the uploader's file id and size.
+    """
+    hashes = st.session_state.setdefault('upload_hashes', {})
+    cache_key = (getattr(file, 'file_id', None) or file.name, file.size)
+    if cache_key not in hashes:
+        hashes[cache_key] = content_hash(upload_buffer(file))
+    return hashes[cache_key]
 
 def colorful_document_upload(label, key, color, section="Other"):
     """
@@ -43,25 +59,134 @@ def colorful_document_upload(label, key, color, section="Other"):
     
     if file:
         st.success(f"{label} uploaded successfully!")
+
+        sha256 = upload_hash(file)
+        if st.session_state.documents.get(key, {}).get('sha256') == sha256:
+            # Already stored on an earlier rerun
+            return file
+        try:
+            application_number = ensure_application_number()
+        except ApplicationNumberUnavailable:
+            # Stored on a later rerun, once a number can be issued
+            st.warning(f"{label} will be saved when the database is reachable again; keep the file selected")
+            return file
+        # One read-only buffer per upload, shared with extraction and GridFS
+        buffer = upload_buffer(file)
         
         # Save document with section information
         metadata = {
             'filename': file.name,
             'document_type': label,
             'section': section,
-            'content_type': file.type
+            'content_type': file.type,
+            'application_number': application_number
         }
-        db = Database()
-        if db.save_document(file.getvalue(), metadata):
+        db = get_database()
+        file_id = db.save_document(buffer, metadata)
+        if file_id:
             st.session_state.documents[key] = {
+                'file_id': file_id,
                 'filename': file.name,
                 'document_type': label,
-                'section': section
+                'section': section,
+                'sha256': sha256
             }
         
         return file
     return None
 
+def bundle_document_upload(auto_fill_field):
+    """
+    Single entry point to upload all documents at once.
+
+    Accepts a zip archive or several files, routes each file to its
+    document type, extracts them in parallel (through the extraction
+    queue when its workers are running), auto-fills the form and stores
+    every file in one pass.
+
+    Args:
+    auto_fill_field (callable): Fills a form field from an extracted value
+    """
+    from bundle_upload import expand_uploads, process_bundle, queue_bundle
+    from extraction_queue import get_queue
+
+    files = st.file_uploader(
+        "Upload a zip file or select all documents (Udyam, GST, PAN, Aadhaar, Bank Statement)",
+        type=["zip", "pdf", "png", "jpg", "jpeg"],
+        accept_multiple_files=True,
+        key="file_uploader_bundle"
+    )
+    if not files:
+        return
+
+    # Files stay in the uploader across reruns; only process a new selection
+    signature = tuple(sorted(upload_hash(file) for file in files))
+    if st.session_state.get('bundle_signature') == signature:
+        return
+    try:
+        # Before extracting, so a bundle is never read without being stored
+        application_number = ensure_application_number()
+    except ApplicationNumberUnavailable:
+        st.warning("The documents will be read and saved when the database is reachable again; keep them selected")
+        return
+
+    # Unpack and hash the bundle once; reruns polling the queue reuse it
+    expanded = st.session_state.get('bundle_files')
+    if expanded is None or expanded[0] != signature:
+        expanded = (signature, expand_uploads(files, digest=upload_hash))
+        st.session_state.bundle_files = expanded
+    bundled = expanded[1]
+
+    if get_queue().workers_alive():
+        # Failed jobs are retried once per new selection, not on every poll
+        results, unfinished = queue_bundle(bundled, retry_failed=st.session_state.get('bundle_queued') != signature)
+        st.session_state.bundle_queued = signature
+        if results is None:
+            st.info("Reading the documents; the form fills in when they are done")
+            st.session_state.setdefault('pending_extractions', set()).update(unfinished)
+            st.session_state.extraction_pending = True
+            return
+    else:
+        with st.spinner("Extracting data from all documents..."):
+            results = process_bundle(bundled)
+
+    items = []
+    for result in results:
+        file, document_type = result['file'], result['document_type'] or "Other Document"
+        data = result['data']
+        if data and "error" not in data:
+            for key, value in data.items():
+                auto_fill_field(key, value, document_type)
+            st.success(f"{file.name}: {document_type} data extracted and filled")
+        elif data:
+            st.error(f"{file.name}: {data['error']}")
+        else:
+            st.warning(f"{file.name}: could not tell the document type; stored as Other Document")
+        if result['director_index'] is not None:
+            # Show a director card for every card that was filled in
+            st.session_state.num_directors = max(st.session_state.get('num_directors', 1),
+                                                 result['director_index'] + 1)
+        items.append((upload_buffer(file), {
+            'filename': file.name,
+            'document_type': document_type,
+            'section': "Bundle Upload",
+            'content_type': file.type,
+            'application_number': application_number
+        }))
+
+    db = get_database()
+    for result, file_id in zip(results, db.save_documents(items)):
+        if file_id:
+            st.session_state.documents[f"bundle_{result['sha256'][:12]}"] = {
+                'file_id': file_id,
+                'filename': result['file'].name,
+                'document_type': result['document_type'] or "Other Document",
+                'section': "Bundle Upload",
+                'sha256': result['sha256']
+            }
+    st.session_state.bundle_signature = signature
+    st.session_state.pop('bundle_files', None)
+
 def save_progress(section_name, data):
     """
     Saves the progress of a section.
@@ -81,4 +206,31 @@ def save_progress(section_name, data):
     #     json.dump(data, f)
 
 
-# You can add more utility functions here as needed
\ No newline at end of file
+# You can add more utility functions here as needed
+
+def summary_pdf_download(application_number, key):
+    """
+    Offer the summary PDF of a saved application for download.
+
+    The PDF is only rendered when the saved version has no cached copy.
+
+    Args:
+    application_number (str): The application to summarise
+    key (str): Suffix for the widget keys
+    """
+    from application_pdf import get_application_pdf, PDF_CONTENT_TYPE
+    if st.button("Prepare PDF Summary", key=f"prepare_summary_{key}"):
+        database = get_database()
+        application = database.get_application({'application_number': application_number})
+        if not application:
+            st.info("Save the application to download its summary")
+            return
+        with st.spinner("Preparing the application summary..."):
+            pdf = get_application_pdf(database, application)
+        st.download_button(
+            label="Download PDF Summary",
+            data=pdf,
+            file_name=f"{application_number}.pdf",
+            mime=PDF_CONTENT_TYPE,
+            key=f"download_summary_{key}"
+        )